@@ -9,6 +9,7 @@ install_requires: list[str] = [
     "pylogconf",
     "yt-dlp",
     "browsercookie",
+    "pyyaml",
 ]
 build_requires: list[str] = config.shared.PBUILD
 test_requires: list[str] = config.shared.PTEST
@@ -16,4 +17,5 @@ requires = install_requires + build_requires + test_requires
 
 scripts: dict[str, str] = {
     "pytubekit": "pytubekit.main:main",
+    "pytubekit-client": "pytubekit.client:main",
 }
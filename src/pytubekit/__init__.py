@@ -1,5 +1,15 @@
 """
 Initialize the module
 """
+from typing import Any
 
 LOGGER_NAME = "pytubekit"
+
+
+def __getattr__(name: str) -> Any:
+    # pytubekit.Client is imported on first use so that importing the package
+    # (as pytubekit-client does) stays cheap
+    if name == "Client":
+        from pytubekit.api import Client  # pylint: disable=import-outside-toplevel
+        return Client
+    raise AttributeError(f"module [{__name__}] has no attribute [{name}]")
@@ -0,0 +1,526 @@
+"""
+api.py
+
+The library API: pytubekit.Client.
+
+Everything the command line endpoints do is available here with explicit
+parameters instead of the pytconf Config classes, and with results returned as
+iterators and dataclasses instead of printed. A Client owns its service object,
+page size, quota budget and cache, so several clients (for example for several
+accounts) can run concurrently in one process. A single Client, like the service
+object it holds, must only be used from one thread at a time.
+
+    client = Client(dry_run=True)
+    for playlist in client.playlists():
+        print(playlist.title, playlist.item_count)
+    result = client.cleanup(["Queue"])
+    print(result.found, result.plan.quota_cost())
+"""
+import fnmatch
+import functools
+import logging
+import os
+import re
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from pytubekit.availability import AvailabilityCache, check_availability
+from pytubekit.cache import Cache
+from pytubekit.columnar import COLUMNAR_FORMATS, CSV, ITEM_COLUMNS, ColumnarWriter, item_rows
+from pytubekit.constants import CHAIN, DAILY_QUOTA, MAX_PAGE_SIZE, MAX_PLAYLIST_ITEMS
+from pytubekit.crawler import ChannelCrawl, WatermarkStore, crawl, list_subscriptions
+from pytubekit.journal import PlanFile, execute_plan_file
+from pytubekit.metadata import MetadataCache, fetch_metadata, needs_metadata, parse_sort_keys, sort_items
+from pytubekit.planner import Plan, plan_add, plan_cleanup, plan_merge, plan_overflow, plan_spill, plan_subtract, plan_sync
+from pytubekit.progress import Progress
+from pytubekit.records import PlaylistItem
+from pytubekit.seen import SeenSet
+from pytubekit.sources import ApiSource, ItemSource, uploads_playlist_id
+from pytubekit.streams import NONE
+from pytubekit.util import (
+    apply_plan,
+    build_youtube,
+    get_video_info,
+    get_video_metadata,
+    insert_playlist,
+    log_cleanup,
+    read_video_ids_from_files,
+    retry_execute,
+    write_dump,
+)
+
+
+def natural_key(title: str) -> list[Any]:
+    """ sorts titles with numbers in them by value (Archive 2 before Archive 10) """
+    # split on a capturing group: text and numbers alternate, text first
+    return [int(part) if i % 2 else part for i, part in enumerate(re.split(r"(\d+)", title))]
+
+
+@dataclass(frozen=True)
+class Playlist:
+    id: str
+    title: str
+    item_count: int
+    raw: dict[str, Any] = field(repr=False, compare=False)
+
+    @classmethod
+    def from_resource(cls, resource: dict[str, Any]) -> "Playlist":
+        return cls(
+            id=resource["id"],
+            title=resource["snippet"]["title"],
+            item_count=resource.get("contentDetails", {}).get("itemCount", 0),
+            raw=resource,
+        )
+
+
+@dataclass(frozen=True)
+class PlanResult:
+    """ what a mutating operation planned and how many of the planned operations it carried out """
+    plan: Plan
+    done: int
+    executed: bool
+
+
+@dataclass(frozen=True)
+class CleanupResult(PlanResult):
+    seen: int = 0
+    # "duplicates", "deleted", "private" -> number of items found
+    found: dict[str, int] = field(default_factory=dict)
+
+
+def default_progress(total: int, label: str) -> Progress:
+    return Progress(total=total, label=label)
+
+
+class Client:  # pylint: disable=too-many-public-methods
+    def __init__(
+        self,
+        youtube: Any = None,
+        *,
+        base_url: str | None = None,
+        client_factory: Callable[[], Any] | None = None,
+        page_size: int = MAX_PAGE_SIZE,
+        cache: Cache | None = None,
+        budget: int = DAILY_QUOTA,
+        dry_run: bool = False,
+        insert_window: int = 1,
+        progress_factory: Callable[[int, str], Progress] = default_progress,
+        source: ItemSource | None = None,
+    ) -> None:
+        """
+        youtube is the service object to use; when None one is built on first use by client_factory
+        or, without one, for the real API (or the API server at base_url). client_factory also builds
+        the extra service objects of the insert pipeline (insert_window > 1). The cache, when not
+        given, is a new disabled one: every read goes to the API. source is where playlists and items
+        are read from (see sources.py), by default the API through the service object; do not share a
+        cache between clients with different sources.
+        """
+        if client_factory is None:
+            def build() -> Any:
+                return build_youtube(base_url)
+            client_factory = build
+        self._youtube = youtube
+        self.client_factory = client_factory
+        self.page_size = page_size
+        self.cache = cache if cache is not None else Cache()
+        self.budget = budget
+        self.dry_run = dry_run
+        self.insert_window = insert_window
+        self.progress_factory = progress_factory
+        if source is None:
+            def get_youtube() -> Any:
+                return self.youtube
+            source = ApiSource(get_youtube, page_size)
+        self.source = source
+
+    @property
+    def youtube(self) -> Any:
+        if self._youtube is None:
+            self._youtube = self.client_factory()
+        return self._youtube
+
+    # reading
+
+    def raw_playlists(self) -> list[dict[str, Any]]:
+        return self.cache.get_playlists(self.source.list_playlists)
+
+    def playlists(self) -> Iterator[Playlist]:
+        for resource in self.raw_playlists():
+            yield Playlist.from_resource(resource)
+
+    def playlist_ids(self, names: list[str]) -> list[str]:
+        """ raises KeyError for a name with no playlist """
+        name_to_id = {resource["snippet"]["title"]: resource["id"] for resource in self.raw_playlists()}
+        return [name_to_id[name] for name in names]
+
+    def records(self, playlist_ids: list[str], raw: bool = False) -> list[PlaylistItem]:
+        """
+        the items of the playlists as compact records; with raw each record also holds its resource,
+        and since the cache only holds records without them such reads always go to the source
+        """
+        items: list[PlaylistItem] = []
+        for playlist_id in playlist_ids:
+            if raw:
+                items.extend(self.source.list_records(playlist_id, keep_raw=True))
+            else:
+                items.extend(self.cache.get_items(playlist_id, functools.partial(self.source.list_records, playlist_id)))
+        return items
+
+    def raw_items(self, playlist_ids: list[str]) -> list[dict[str, Any]]:
+        """ the resources of the items of the playlists (for full output) """
+        return [item.raw for item in self.records(playlist_ids, raw=True) if item.raw is not None]
+
+    def items(self, name: str | None = None, playlist_id: str | None = None, raw: bool = False) -> Iterator[PlaylistItem]:
+        """ the items of the playlist given by name or by id (with their resources if raw) """
+        if name is not None:
+            playlist_id = self.playlist_ids([name])[0]
+        if playlist_id is None:
+            raise ValueError("give a playlist name or a playlist id")
+        yield from self.records([playlist_id], raw)
+
+    def video_ids(self, names: list[str]) -> set[str]:
+        return {item.video_id for item in self.records(self.playlist_ids(names))}
+
+    def video_ids_from(self, playlists: list[str], files: list[str]) -> set[str]:
+        """ the union of the videos of the named playlists and of the video id files """
+        ids: set[str] = set()
+        if playlists:
+            ids.update(self.video_ids(playlists))
+        if files:
+            ids.update(read_video_ids_from_files(files))
+        return ids
+
+    def diff(
+        self,
+        a_playlists: list[str],
+        b_playlists: list[str],
+        a_files: list[str] | None = None,
+        b_files: list[str] | None = None,
+        reverse: bool = False,
+    ) -> list[str]:
+        """ sorted A-B (or A&B when reverse) where A and B are unions of playlists and files """
+        logger = logging.getLogger()
+        ids_a = self.video_ids_from(a_playlists, a_files or [])
+        ids_b = self.video_ids_from(b_playlists, b_files or [])
+        result = sorted(ids_a & ids_b) if reverse else sorted(ids_a - ids_b)
+        logger.info(f"A has {len(ids_a)}, B has {len(ids_b)}, result has {len(result)}")
+        return result
+
+    def search(self, query: str, names: list[str]) -> Iterator[PlaylistItem]:
+        """ items of the named playlists whose title or channel contains query (ignoring case) """
+        query = query.lower()
+        for item in self.records(self.playlist_ids(names)):
+            if query in item.title.lower() or query in item.channel.lower():
+                yield item
+
+    def find_video(self, video_id: str) -> Iterator[Playlist]:
+        """ the playlists holding video_id """
+        for playlist in self.playlists():
+            if any(item.video_id == video_id for item in self.items(playlist_id=playlist.id)):
+                yield playlist
+
+    def stats(self, names: list[str] | None = None) -> list[tuple[str, int]]:
+        """ (title, item count) of the named playlists (counted from their items) or of all playlists """
+        if names:
+            return [
+                (name, len(self.records([playlist_id])))
+                for name, playlist_id in zip(names, self.playlist_ids(names))
+            ]
+        # counted from the items when the source does not know the size of a playlist
+        return [
+            (playlist.title, playlist.item_count if "itemCount" in playlist.raw.get("contentDetails", {})
+             else len(self.records([playlist.id])))
+            for playlist in self.playlists()
+        ]
+
+    def snapshot(self) -> dict[str, tuple[str, list[str]]]:
+        """ title -> (playlist id, video ids) of every playlist, the input of HistoryStore.save() """
+        return {
+            playlist.title: (playlist.id, [item.video_id for item in self.items(playlist_id=playlist.id)])
+            for playlist in self.playlists()
+        }
+
+    def dump(
+        self,
+        folder: str,
+        full: bool = False,
+        output_format: str = CSV,
+        jsonl: bool = False,
+        compression: str = NONE,
+    ) -> list[str]:
+        """ one file of video ids (or items, if full) per playlist, or with a columnar format one table of all items """
+        def get_items(playlist_id: str) -> list[dict[str, Any]]:
+            return self.raw_items([playlist_id])
+
+        def get_records(playlist_id: str) -> list[PlaylistItem]:
+            return self.records([playlist_id])
+        if output_format not in COLUMNAR_FORMATS:
+            return write_dump(folder, self.raw_playlists(), get_items if full else get_records, full, jsonl, compression)
+        path = os.path.join(folder, f"dump.{output_format}")
+        with ColumnarWriter(path, output_format, ITEM_COLUMNS) as writer:
+            for row in item_rows(self.raw_playlists(), get_items):
+                writer.write(row)
+        return [path]
+
+    def video_info(self, video_id: str) -> dict[str, Any]:
+        return get_video_info(self.youtube, video_id)
+
+    @staticmethod
+    def video_metadata(video_id: str) -> dict[str, Any] | None:
+        """ extensive metadata from yt-dlp (no API quota), None when it can not be fetched """
+        return get_video_metadata(video_id)
+
+    def channel_id(self, watch_later: bool = False) -> str:
+        """ the id of the channel of the account, or the id of its Watch Later playlist """
+        response = retry_execute(self.youtube.channels().list(part="id", mine=True))
+        channel_id = response["items"][0]["id"]
+        if watch_later:
+            return channel_id[0] + "L" + channel_id[2:]
+        return channel_id
+
+    def left_to_see(self, playlist_id: str, seen: SeenSet) -> Iterator[PlaylistItem]:
+        """ the items of the playlist (a channel id stands for its uploads) whose videos are not in seen, in order """
+        for item in self.items(playlist_id=uploads_playlist_id(playlist_id)):
+            if item.video_id not in seen:
+                yield item
+
+    def crawl_uploads(
+        self,
+        channel_ids: list[str] | None = None,
+        store: WatermarkStore | None = None,
+        *,
+        workers: int = 4,
+        initial_pages: int = 1,
+    ) -> list[ChannelCrawl]:
+        """
+        the uploads of the channels (of the subscriptions of the account when none are given) which are
+        newer than their watermarks in store (see crawler.py); the caller saves the store
+        """
+        if not channel_ids:
+            channel_ids = list_subscriptions(self.youtube, self.page_size)
+        return crawl(
+            self.client_factory,
+            channel_ids,
+            store if store is not None else WatermarkStore(),
+            workers=workers,
+            page_size=self.page_size,
+            initial_pages=initial_pages,
+            progress=self.progress_factory(len(channel_ids), "crawl"),
+        )
+
+    # writing
+
+    def check_writable(self, plan: Plan) -> None:
+        if not self.dry_run and not self.source.writable and any(operation.item_id == "" for operation in plan.operations):
+            raise ValueError("items read through yt-dlp have no playlist item ids, read them through the API to change them")
+
+    def apply(self, plan: Plan, dedup: bool = False) -> PlanResult:
+        """ report the plan and execute it unless the client is a dry run one """
+        self.check_writable(plan)
+        done = apply_plan(
+            # a dry run makes no calls, so it needs no service object (create_playlist)
+            None if self.dry_run else self.youtube,
+            plan,
+            execute=not self.dry_run,
+            budget=self.budget,
+            window=self.insert_window,
+            client_factory=self.client_factory,
+            dedup=dedup,
+            page_size=self.page_size,
+            cache=self.cache,
+            progress_factory=self.progress_factory,
+        )
+        return PlanResult(plan, done, not self.dry_run)
+
+    def apply_resumable(self, plan: Plan, path: str) -> PlanResult:
+        """ like apply, with the plan kept in a file at path while it is executed, so it can be resumed (see journal.py) """
+        self.check_writable(plan)
+        plan.report(self.budget)
+        if self.dry_run:
+            logging.getLogger().info(f"dry run: not executing plan [{plan.label}]")
+            return PlanResult(plan, 0, False)
+        PlanFile(path).write(plan)
+        return self.resume(path)
+
+    def resume(self, path: str) -> PlanResult:
+        """ execute what is left of the plan in the file at path """
+        plan_file = PlanFile(path)
+        plan, done = plan_file.read()
+        if self.dry_run:
+            logging.getLogger().info(f"dry run: not resuming plan [{plan.label}], {len(plan.operations) - len(done)} operations left")
+            return PlanResult(plan, 0, False)
+        executed = execute_plan_file(self.youtube, plan_file, cache=self.cache, progress_factory=self.progress_factory)
+        return PlanResult(plan, executed, True)
+
+    def cleanup(
+        self,
+        names: list[str] | None = None,
+        *,
+        dedup: bool = True,
+        deleted: bool = True,
+        privatized: bool = True,
+        availability: bool = False,
+        region: str | None = None,
+        availability_cache: AvailabilityCache | None = None,
+    ) -> CleanupResult:
+        """
+        clean up the named playlists (all playlists when names is empty); with availability the videos are
+        also checked with videos.list (see availability.py), which finds more unavailable videos than titles do
+        """
+        if names:
+            playlist_ids = self.playlist_ids(names)
+        else:
+            playlist_ids = [playlist.id for playlist in self.playlists()]
+        items = self.records(playlist_ids)
+        states = None
+        if availability:
+            states = check_availability(
+                self.youtube,
+                [item.video_id for item in items],
+                region=region,
+                cache=availability_cache,
+                batch_size=self.page_size,
+            )
+        plan, found = plan_cleanup(
+            items, dedup=dedup, check_deleted=deleted, check_privatized=privatized, availability=states,
+        )
+        log_cleanup(plan, found, len(items), dedup)
+        result = self.apply(plan)
+        return CleanupResult(result.plan, result.done, result.executed, seen=len(items), found=found)
+
+    def subtract(self, what: list[str], from_: list[str]) -> PlanResult:
+        """ remove from the from_ playlists every video which is in the what playlists """
+        what_video_ids = self.video_ids(what)
+        from_items = self.records(self.playlist_ids(from_))
+        return self.apply(plan_subtract(what_video_ids, from_items))
+
+    def clear(self, name: str) -> PlanResult:
+        playlist_id = self.playlist_ids([name])[0]
+        items = self.records([playlist_id])
+        plan = Plan("clear")
+        plan.add_snapshot(playlist_id, items, name)
+        for item in items:
+            plan.delete(playlist_id, item.id, item.video_id)
+        return self.apply(plan)
+
+    def merge(self, sources: list[str], destination: str, dedup: bool = False) -> PlanResult:
+        """ append the videos of the sources to destination (skipping ones it already has if dedup) """
+        all_ids = self.playlist_ids(sources + [destination])
+        destination_id = all_ids[-1]
+        source_items = self.records(all_ids[:-1])
+        if dedup:
+            plan = plan_merge(destination_id, self.records([destination_id]), source_items, dedup=True)
+        else:
+            # counted from the playlists listing, so that the simulated size and the full playlist check hold
+            counts = {resource["id"]: resource.get("contentDetails", {}).get("itemCount", 0) for resource in self.raw_playlists()}
+            plan = plan_merge(destination_id, [], source_items, dedup=False, dest_count=counts[destination_id])
+        plan.titles[destination_id] = destination
+        return self.apply(plan, dedup=dedup)
+
+    def sort(self, name: str, key: str = "title", metadata_cache: MetadataCache | None = None) -> PlanResult:
+        """
+        delete and re-add all items of the playlist ordered by key, one or more comma separated keys of
+        SORT_KEYS or METADATA_KEYS (see metadata.py); metadata is fetched with videos.list, 50 videos a call
+        """
+        keys = parse_sort_keys(key)
+        playlist_id = self.playlist_ids([name])[0]
+        items = self.records([playlist_id])
+        metadata = None
+        if needs_metadata(keys):
+            metadata = fetch_metadata(
+                self.youtube,
+                [item.video_id for item in items],
+                cache=metadata_cache,
+                batch_size=self.page_size,
+            )
+        plan = Plan("sort")
+        plan.add_snapshot(playlist_id, items, name)
+        for item in items:
+            plan.delete(playlist_id, item.id, item.video_id)
+        for item in sort_items(items, keys, metadata):
+            plan.insert(playlist_id, item.video_id)
+        return self.apply(plan)
+
+    def overflow(self, source: str, destination: str) -> PlanResult:
+        """ move videos from source to destination until destination holds MAX_PLAYLIST_ITEMS """
+        logger = logging.getLogger()
+        source_id, destination_id = self.playlist_ids([source, destination])
+        destination_items = self.records([destination_id])
+        available = MAX_PLAYLIST_ITEMS - len(destination_items)
+        logger.info(f"destination has {len(destination_items)} items, {available} slots available")
+        if available <= 0:
+            logger.info("destination playlist is full, nothing to move")
+        source_items = self.records([source_id]) if available > 0 else []
+        plan = plan_overflow(source_id, source_items, destination_id, destination_items, available)
+        plan.titles.update({source_id: source, destination_id: destination})
+        return self.apply(plan, dedup=True)
+
+    def spill(
+        self,
+        source: str,
+        destinations: list[str],
+        pattern: str | None = None,
+        packing: str = CHAIN,
+        plan_path: str | None = None,
+    ) -> PlanResult:
+        """
+        move the videos of source into a chain of destinations: the names given, then the other playlists
+        whose titles match the glob pattern, in natural order (Archive 2 before Archive 10). The destinations
+        are counted from one playlists listing, never fetched, and the moves are packed locally (see
+        planner.pack). With plan_path the plan is executed resumably, and an unfinished plan left there by an
+        earlier run is resumed instead of planning again.
+        """
+        if plan_path is not None and PlanFile(plan_path).exists():
+            logging.getLogger().info(f"found the unfinished plan [{plan_path}], resuming it")
+            return self.resume(plan_path)
+        playlists = {playlist.title: playlist for playlist in self.playlists()}
+        names = list(destinations)
+        if pattern is not None:
+            matches = [title for title in playlists if fnmatch.fnmatchcase(title, pattern) and title not in names and title != source]
+            names.extend(sorted(matches, key=natural_key))
+        if not names:
+            raise ValueError("no destination playlists")
+        for name in [source] + names:
+            if name not in playlists:
+                raise ValueError(f"no playlist named [{name}]")
+        source_id = playlists[source].id
+        chain = [(playlists[name].id, playlists[name].item_count) for name in names]
+        plan = plan_spill(source_id, self.records([source_id]), chain, packing)
+        plan.titles.update({playlists[name].id: name for name in [source] + names})
+        if plan_path is None:
+            return self.apply(plan)
+        return self.apply_resumable(plan, plan_path)
+
+    def add_videos(self, name: str, video_ids: list[str]) -> PlanResult:
+        """ append video_ids to the playlist, skipping the ones it already holds """
+        playlist_id = self.playlist_ids([name])[0]
+        plan = plan_add(playlist_id, self.records([playlist_id]), video_ids)
+        plan.titles[playlist_id] = name
+        return self.apply(plan, dedup=True)
+
+    def sync(self, name: str, video_ids: list[str]) -> PlanResult:
+        """ make the playlist hold exactly video_ids in that order with the fewest writes """
+        playlist_id = self.playlist_ids([name])[0]
+        plan = plan_sync(playlist_id, self.records([playlist_id]), video_ids)
+        plan.titles[playlist_id] = name
+        return self.apply(plan)
+
+    def rename(self, name: str, new_name: str) -> PlanResult:
+        plan = Plan("rename")
+        plan.rename_playlist(self.playlist_ids([name])[0], new_name)
+        return self.apply(plan)
+
+    def delete_playlist(self, name: str) -> PlanResult:
+        plan = Plan("delete playlist")
+        plan.delete_playlist(self.playlist_ids([name])[0])
+        return self.apply(plan)
+
+    def create_playlist(self, title: str, description: str = "", privacy: str = "private") -> str | None:
+        """ the id of the new playlist, None on a dry run """
+        if self.dry_run:
+            plan = Plan("create")
+            plan.create_playlist(title, description, privacy)
+            self.apply(plan)
+            return None
+        return insert_playlist(self.youtube, title, description, privacy, cache=self.cache)
@@ -0,0 +1,143 @@
+"""
+availability.py
+
+Which videos of a playlist can actually be watched.
+
+A playlist item only says a video is gone when YouTube has replaced its title
+with "Deleted video" or "Private video". Videos which are blocked in a region,
+rejected after upload (copyright strikes, terms of use) or removed together
+with their channel keep their old title, yet are unavailable all the same.
+This module asks videos.list about the videos themselves, 50 ids per request
+(one quota unit), and classifies each one by what comes back:
+
+    missing   videos.list did not return it (deleted, terminated account, removed)
+    private   status.privacyStatus is private
+    rejected  status.uploadStatus is rejected, deleted or failed
+    blocked   contentDetails.regionRestriction excludes the region asked about
+    available none of the above
+
+What videos.list returned is kept in a JSON file for a TTL, so running cleanup
+again soon after costs nothing for videos already checked.
+"""
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+from pytubekit.constants import AVAILABLE, BLOCKED, MAX_PAGE_SIZE, MISSING, PRIVATE, REJECTED
+from pytubekit.fileio import write_atomically
+from pytubekit.util import retry_execute
+
+UNAVAILABLE_UPLOAD_STATUSES = {"rejected", "deleted", "failed"}
+
+
+def classify(resource: dict[str, Any] | None, region: str | None = None) -> str:
+    """ the availability of a video given its videos.list resource (None when it was not returned) """
+    if resource is None:
+        return MISSING
+    status = resource.get("status", {})
+    if status.get("privacyStatus") == PRIVATE:
+        return PRIVATE
+    if status.get("uploadStatus") in UNAVAILABLE_UPLOAD_STATUSES:
+        return REJECTED
+    restriction = resource.get("contentDetails", {}).get("regionRestriction")
+    if region is not None and restriction is not None:
+        if region in restriction.get("blocked", []):
+            return BLOCKED
+        if "allowed" in restriction and region not in restriction["allowed"]:
+            return BLOCKED
+    return AVAILABLE
+
+
+def trim(resource: dict[str, Any]) -> dict[str, Any]:
+    """ the parts of a video resource which classify() looks at """
+    trimmed: dict[str, Any] = {"status": resource.get("status", {})}
+    restriction = resource.get("contentDetails", {}).get("regionRestriction")
+    if restriction is not None:
+        trimmed["contentDetails"] = {"regionRestriction": restriction}
+    return trimmed
+
+
+class AvailabilityCache:
+    """ video id -> (time checked, trimmed resource or None), persisted in a JSON file; path None keeps it in memory """
+    def __init__(self, path: str | None = None, ttl: float = 7 * 24 * 3600) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.entries: dict[str, tuple[float, dict[str, Any] | None]] = {}
+        if path is not None and os.path.isfile(path):
+            with open(path) as f:
+                self.entries = {video_id: (entry[0], entry[1]) for video_id, entry in json.load(f).items()}
+
+    def get(self, video_id: str, now: float) -> tuple[bool, dict[str, Any] | None]:
+        """ whether a fresh entry exists, and the resource it holds """
+        entry = self.entries.get(video_id)
+        if entry is None or now - entry[0] >= self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def put(self, video_id: str, resource: dict[str, Any] | None, now: float) -> None:
+        self.entries[video_id] = (now, resource)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        now = time.time()
+        fresh = {video_id: list(entry) for video_id, entry in self.entries.items() if now - entry[0] < self.ttl}
+        write_atomically(self.path, json.dumps(fresh).encode())
+
+
+def fetch_videos(
+    youtube: Any,
+    video_ids: list[str],
+    *,
+    part: str,
+    trim_resource: Callable[[dict[str, Any]], dict[str, Any]],
+    cache: AvailabilityCache,
+    batch_size: int = MAX_PAGE_SIZE,
+) -> dict[str, dict[str, Any] | None]:
+    """
+    video id -> trimmed videos.list resource (None when it was not returned), asking videos.list in
+    batches of batch_size only about videos the cache has no fresh entry for
+    """
+    logger = logging.getLogger()
+    now = time.time()
+    resources: dict[str, dict[str, Any] | None] = {}
+    unknown: list[str] = []
+    for video_id in dict.fromkeys(video_ids):
+        fresh, resource = cache.get(video_id, now)
+        if fresh:
+            resources[video_id] = resource
+        else:
+            unknown.append(video_id)
+    logger.info(f"fetching [{part}] of [{len(unknown)}] videos, [{len(resources)}] cached")
+    for start in range(0, len(unknown), batch_size):
+        batch = unknown[start:start + batch_size]
+        response = retry_execute(youtube.videos().list(part=part, id=",".join(batch)))
+        returned = {resource["id"]: trim_resource(resource) for resource in response.get("items", [])}
+        for video_id in batch:
+            resources[video_id] = returned.get(video_id)
+            cache.put(video_id, resources[video_id], now)
+    cache.save()
+    return resources
+
+
+def check_availability(
+    youtube: Any,
+    video_ids: list[str],
+    *,
+    region: str | None = None,
+    cache: AvailabilityCache | None = None,
+    batch_size: int = MAX_PAGE_SIZE,
+) -> dict[str, str]:
+    """ video id -> availability, asking videos.list only about videos the cache has no fresh entry for """
+    resources = fetch_videos(
+        youtube,
+        video_ids,
+        part="status,contentDetails",
+        trim_resource=trim,
+        cache=cache if cache is not None else AvailabilityCache(),
+        batch_size=batch_size,
+    )
+    return {video_id: classify(resource, region) for video_id, resource in resources.items()}
@@ -0,0 +1,108 @@
+"""
+batch.py
+
+Batch script mode: run many endpoint invocations in one process.
+
+A script is either YAML (files ending in .yaml or .yml) or line based. A line
+based script has one invocation per line, written as on the command line
+without the program name; blank lines and lines starting with # are ignored.
+A YAML script is a list whose entries are such a line, a list of arguments, or
+a mapping {"command": name, "args": {flag: value}}.
+
+All steps share one service object and one cache of the playlist catalog and
+playlist items, so a playlist read by several steps is fetched once. Every write
+invalidates the playlist it touched, so a step never sees items that an earlier
+step changed.
+"""
+import logging
+import shlex
+import time
+from typing import Any
+
+import yaml
+
+from pytubekit.cache import CACHE
+from pytubekit.session import NOT_IN_SESSION, Session
+
+
+def flag_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ",".join(str(v) for v in value)
+    if value is None:
+        return "None"
+    return str(value)
+
+
+def parse_step(entry: Any) -> list[str]:
+    if isinstance(entry, str):
+        return shlex.split(entry)
+    if isinstance(entry, list):
+        return [str(arg) for arg in entry]
+    if isinstance(entry, dict) and "command" in entry:
+        args = [str(entry["command"])]
+        for flag, value in (entry.get("args") or {}).items():
+            args.extend([f"--{flag}", flag_value(value)])
+        return args
+    raise ValueError(f"can not parse script step [{entry}]")
+
+
+def parse_lines(text: str) -> list[list[str]]:
+    steps = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            steps.append(shlex.split(line))
+    return steps
+
+
+def parse_yaml(text: str) -> list[list[str]]:
+    data = yaml.safe_load(text) or []
+    if not isinstance(data, list):
+        raise TypeError("a YAML script must be a list of steps")
+    return [parse_step(entry) for entry in data]
+
+
+def read_script(path: str) -> list[list[str]]:
+    with open(path) as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        return parse_yaml(text)
+    return parse_lines(text)
+
+
+def run_steps(steps: list[list[str]], keep_going: bool) -> int:
+    """ run the steps in order; returns the exit code of the first failing step (0 if none failed) """
+    logger = logging.getLogger()
+    for step in steps:
+        if step and step[0] in NOT_IN_SESSION:
+            raise ValueError(f"[{step[0]}] can not be used in a script")
+    session = Session()
+    # inside the serve daemon the cache is already on and belongs to the daemon
+    own_cache = not CACHE.enabled
+    if own_cache:
+        CACHE.enable()
+    result = 0
+    try:
+        for number, step in enumerate(steps, start=1):
+            logger.info(f"step {number}/{len(steps)}: {shlex.join(step)}")
+            start = time.perf_counter()
+            try:
+                code = session.invoke(step)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception(f"step {number} raised")
+                code = 1
+            logger.info(f"step {number}/{len(steps)} exited with {code} after {time.perf_counter() - start:.2f}s")
+            if code != 0:
+                result = result or code
+                if not keep_going:
+                    logger.error(f"step {number} failed, stopping")
+                    break
+        stats = CACHE.stats()
+        hits, misses = stats["hits"], stats["misses"]
+        logger.info(f"cache: {hits} hits, {misses} fetches")
+    finally:
+        if own_cache:
+            CACHE.disable()
+    return result
@@ -0,0 +1,310 @@
+"""
+benchmark.py
+
+Offline benchmark suite.
+
+A synthetic account (or one loaded from a recorded fixture file) is served to the
+real googleapiclient service object through googleapiclient.http.HttpMockSequence,
+so pagination, response parsing, cleanup, set operations and planning all run
+through pytubekit.Client exactly as the command line endpoints do, but without
+network or quota. Every benchmark is timed
+(best of N runs) and the API calls and quota it would have spent are counted per
+method by the tracer. Results are written as JSON and can be compared against a
+baseline file to catch regressions.
+
+A fixture file is JSON of the form:
+{"playlists": [playlist resources], "items": {"playlist id": [playlistItem resources]}}
+"""
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+import googleapiclient.discovery
+from googleapiclient.http import HttpMockSequence
+
+from pytubekit.api import Client
+from pytubekit.cache import Cache
+from pytubekit.constants import API_SERVICE_NAME, API_VERSION, DELETED_TITLE, ITEMS_TOKEN, NEXT_PAGE_TOKEN, PRIVATE_TITLE
+from pytubekit.metadata import parse_sort_keys, sort_items
+from pytubekit.planner import plan_merge
+from pytubekit.records import PlaylistItem
+from pytubekit.tracing import TRACER
+from pytubekit.util import collect_ids_from_files, compute_local_diff, find_dump_duplicates, read_all_dump_files
+
+PAGE_SIZE = 50
+Response = tuple[dict[str, str], str]
+Account = dict[str, Any]
+
+
+class ResponseQueue(deque):
+    """ HttpMockSequence pops responses with pop(0), which is quadratic on a list """
+    def pop(self, index: int = -1) -> Any:  # type: ignore[override]
+        if index == 0:
+            return self.popleft()
+        return super().pop()
+
+
+def make_video_id(n: int) -> str:
+    return f"v{n:010d}"
+
+
+def synthetic_account(playlists: int, items: int, seed: int = 0) -> Account:
+    """ playlists with up to items entries each, drawn from a shared pool so that they overlap """
+    rng = random.Random(seed)
+    pool = max(playlists * items // 2, 1)
+    account: Account = {"playlists": [], "items": {}}
+    for p in range(playlists):
+        playlist_id = f"PL{p:08d}"
+        count = rng.randint(items // 2, items)
+        account["playlists"].append({
+            "kind": "youtube#playlist",
+            "id": playlist_id,
+            "snippet": {"title": f"Playlist {p}"},
+            "contentDetails": {"itemCount": count},
+        })
+        playlist_items = []
+        for position in range(count):
+            roll = rng.random()
+            title = DELETED_TITLE if roll < 0.01 else PRIVATE_TITLE if roll < 0.02 else f"Video {position}"
+            playlist_items.append({
+                "kind": "youtube#playlistItem",
+                "id": f"{playlist_id}_{position}",
+                "snippet": {
+                    "playlistId": playlist_id,
+                    "position": position,
+                    "title": title,
+                    "publishedAt": f"2024-01-01T00:00:{position % 60:02d}Z",
+                    "videoOwnerChannelTitle": f"Channel {rng.randrange(100)}",
+                    "resourceId": {"kind": "youtube#video", "videoId": make_video_id(rng.randrange(pool))},
+                },
+            })
+        account["items"][playlist_id] = playlist_items
+    return account
+
+
+def load_fixture(path: str) -> Account:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def page_responses(resources: list[dict[str, Any]]) -> list[Response]:
+    responses: list[Response] = []
+    for start in range(0, max(len(resources), 1), PAGE_SIZE):
+        page: dict[str, Any] = {ITEMS_TOKEN: resources[start:start + PAGE_SIZE]}
+        if start + PAGE_SIZE < len(resources):
+            page[NEXT_PAGE_TOKEN] = f"token{start + PAGE_SIZE}"
+        responses.append(({"status": "200"}, json.dumps(page)))
+    return responses
+
+
+def listing_responses(account: Account) -> list[Response]:
+    return page_responses(account["playlists"])
+
+
+def items_responses(account: Account, ids: list[str]) -> list[Response]:
+    responses: list[Response] = []
+    for playlist_id in ids:
+        responses.extend(page_responses(account["items"][playlist_id]))
+    return responses
+
+
+def build_mock_youtube(responses: list[Response]) -> Any:
+    return googleapiclient.discovery.build(
+        serviceName=API_SERVICE_NAME,
+        version=API_VERSION,
+        http=HttpMockSequence(ResponseQueue(responses)),
+        static_discovery=True,
+    )
+
+
+def build_mock_client(responses: list[Response]) -> Client:
+    """
+    a dry run client of the mocked service, with a cache of its own (disabled): under serve or run
+    the process wide one is on and holds real listings
+    """
+    return Client(build_mock_youtube(responses), page_size=PAGE_SIZE, cache=Cache(), dry_run=True)
+
+
+def all_items(account: Account) -> list[dict[str, Any]]:
+    return [item for items in account["items"].values() for item in items]
+
+
+def all_records(account: Account, ids: list[str]) -> list[PlaylistItem]:
+    return [PlaylistItem.from_resource(item) for playlist_id in ids for item in account["items"][playlist_id]]
+
+
+def playlist_ids(account: Account) -> list[str]:
+    return [playlist["id"] for playlist in account["playlists"]]
+
+
+def playlist_titles(account: Account, ids: list[str]) -> list[str]:
+    titles = {playlist["id"]: playlist["snippet"]["title"] for playlist in account["playlists"]}
+    return [titles[playlist_id] for playlist_id in ids]
+
+
+def write_dump_folder(account: Account, folder: str, ids: list[str]) -> None:
+    for playlist_id, title in zip(ids, playlist_titles(account, ids)):
+        with open(os.path.join(folder, title), "w") as f:
+            for item in account["items"][playlist_id]:
+                print(item["snippet"]["resourceId"]["videoId"], file=f)
+
+
+def bench_dump(account: Account, work: str) -> Callable[[], None]:
+    client = build_mock_client(listing_responses(account) + items_responses(account, playlist_ids(account)))
+    folder = os.path.join(work, "dump")
+    os.makedirs(folder, exist_ok=True)
+
+    def run() -> None:
+        client.dump(folder)
+    return run
+
+
+def bench_cleanup(account: Account, _work: str) -> Callable[[], None]:
+    client = build_mock_client(listing_responses(account) + items_responses(account, playlist_ids(account)))
+
+    def run() -> None:
+        client.cleanup()
+    return run
+
+
+def bench_subtract(account: Account, _work: str) -> Callable[[], None]:
+    ids = playlist_ids(account)
+    half = max(len(ids) // 2, 1)
+    what_ids, from_ids = ids[:half], ids[half:]
+    responses = listing_responses(account) + items_responses(account, what_ids)
+    responses += listing_responses(account) + items_responses(account, from_ids)
+    client = build_mock_client(responses)
+
+    def run() -> None:
+        client.subtract(playlist_titles(account, what_ids), playlist_titles(account, from_ids))
+    return run
+
+
+def bench_merge_planning(account: Account, _work: str) -> Callable[[], None]:
+    ids = playlist_ids(account)
+    destination_id = ids[0]
+    dest_items = all_records(account, ids[:1])
+    source_items = all_records(account, ids[1:])
+
+    def run() -> None:
+        plan_merge(destination_id, dest_items, source_items, dedup=True).simulate()
+    return run
+
+
+def bench_local_diff(account: Account, work: str) -> Callable[[], None]:
+    ids = playlist_ids(account)
+    half = max(len(ids) // 2, 1)
+    folder_a = os.path.join(work, "a")
+    folder_b = os.path.join(work, "b")
+    for folder, folder_ids in ((folder_a, ids[:half]), (folder_b, ids[half:])):
+        os.makedirs(folder, exist_ok=True)
+        write_dump_folder(account, folder, folder_ids)
+
+    def run() -> None:
+        compute_local_diff(folder_a, folder_b, reverse=False)
+    return run
+
+
+def bench_local_dedup(account: Account, work: str) -> Callable[[], None]:
+    folder = os.path.join(work, "all")
+    os.makedirs(folder, exist_ok=True)
+    write_dump_folder(account, folder, playlist_ids(account))
+
+    def run() -> None:
+        find_dump_duplicates(read_all_dump_files(folder))
+    return run
+
+
+def bench_collect_ids(account: Account, work: str) -> Callable[[], None]:
+    path = os.path.join(work, "links.txt")
+    with open(path, "w") as f:
+        for item in all_items(account):
+            video_id = item["snippet"]["resourceId"]["videoId"]
+            print(f"see https://www.youtube.com/watch?v={video_id} and youtu.be/{video_id}", file=f)
+
+    def run() -> None:
+        collect_ids_from_files([path])
+    return run
+
+
+def bench_sort_planning(account: Account, _work: str) -> Callable[[], None]:
+    items = all_records(account, playlist_ids(account))
+    rng = random.Random(0)
+    metadata: dict[str, dict[str, Any] | None] = {
+        item.video_id: {"duration": rng.randrange(3600), "upload_date": "", "views": rng.randrange(10 ** 6), "likes": None}
+        for item in items
+    }
+    keys = parse_sort_keys("views:desc,duration,title")
+
+    def run() -> None:
+        sort_items(items, keys, metadata)
+    return run
+
+
+# each benchmark prepares its inputs (untimed) and returns the function to time
+BENCHMARKS: dict[str, Callable[[Account, str], Callable[[], None]]] = {
+    "dump": bench_dump,
+    "cleanup": bench_cleanup,
+    "subtract": bench_subtract,
+    "merge_planning": bench_merge_planning,
+    "local_diff": bench_local_diff,
+    "local_dedup": bench_local_dedup,
+    "collect_ids": bench_collect_ids,
+    "sort_planning": bench_sort_planning,
+}
+
+
+def run_benchmarks(account: Account, repeat: int, names: list[str] | None = None) -> dict[str, Any]:
+    logger = logging.getLogger()
+    results: dict[str, Any] = {}
+    # the benchmarked code logs every item at info level, which would dominate the timings
+    previous_level = logger.level
+    for name, prepare in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        best = float("inf")
+        calls: dict[str, int] = {}
+        quota = 0
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as work:
+                function = prepare(account, work)
+                TRACER.collect()
+                logger.setLevel(logging.WARNING)
+                start = time.perf_counter()
+                try:
+                    function()
+                finally:
+                    elapsed = time.perf_counter() - start
+                    logger.setLevel(previous_level)
+                    TRACER.enabled = False
+                best = min(best, elapsed)
+                calls = {method: sum(stats.calls_by_status.values()) for method, stats in sorted(TRACER.stats.items())}
+                quota = TRACER.total_quota()
+        results[name] = {"seconds": round(best, 6), "calls": calls, "quota": quota}
+        logger.info(f"benchmark [{name}]: {best:.4f}s, {sum(calls.values())} calls, {quota} quota units")
+    return results
+
+
+def compare_to_baseline(results: dict[str, Any], baseline: dict[str, Any], tolerance: int) -> list[str]:
+    """ return a description of every regression (slower beyond tolerance percent, or more calls/quota) """
+    regressions: list[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        seconds, base_seconds = result["seconds"], base["seconds"]
+        if seconds > base_seconds * (1 + tolerance / 100):
+            regressions.append(f"{name}: {seconds:.4f}s > {base_seconds:.4f}s (+{tolerance}%)")
+        quota, base_quota = result["quota"], base["quota"]
+        if quota > base_quota:
+            regressions.append(f"{name}: quota {quota} > {base_quota}")
+        calls, base_calls = sum(result["calls"].values()), sum(base["calls"].values())
+        if calls > base_calls:
+            regressions.append(f"{name}: calls {calls} > {base_calls}")
+    return regressions
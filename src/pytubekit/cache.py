@@ -0,0 +1,118 @@
+"""
+cache.py
+
+In-process cache of the service object, the playlist catalog and playlist items.
+
+It is only enabled by long lived processes that run many endpoints (the serve
+daemon and the run batch mode); a normal invocation always talks to the API.
+Entries expire after a TTL, and every write made through util invalidates the
+playlist it touched (and the catalog, whose item counts change), so later steps
+never see stale data that this process made stale itself.
+"""
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from pytubekit.records import get_item_id
+
+# resources, or item records (see records.py)
+Items = list[Any]
+
+
+class Cache:
+    """ does nothing until enabled by enable() """
+    def __init__(self) -> None:
+        self.enabled = False
+        # seconds an entry stays valid, None for forever
+        self.ttl: float | None = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.playlists: tuple[float, Items] | None = None
+        self.items: dict[str, tuple[float, Items]] = {}
+        # playlist item id -> playlist id, for invalidation by item id
+        self.item_playlist: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def enable(self, ttl: float | None = None) -> None:
+        self.clear()
+        self.ttl = ttl
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.clear()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.playlists = None
+            self.items = {}
+            self.item_playlist = {}
+            self.hits = 0
+            self.misses = 0
+        self.local = threading.local()
+
+    def fresh(self, fetched_at: float) -> bool:
+        return self.ttl is None or time.monotonic() - fetched_at < self.ttl
+
+    def get_youtube(self, build: Callable[[], Any]) -> Any:
+        """ one service object per thread, since they are not thread safe """
+        if not self.enabled:
+            return build()
+        if not hasattr(self.local, "youtube"):
+            self.local.youtube = build()
+        return self.local.youtube
+
+    def get_playlists(self, fetch: Callable[[], Items]) -> Items:
+        if not self.enabled:
+            return fetch()
+        with self.lock:
+            if self.playlists is not None and self.fresh(self.playlists[0]):
+                self.hits += 1
+                return list(self.playlists[1])
+            self.misses += 1
+        playlists = fetch()
+        with self.lock:
+            self.playlists = (time.monotonic(), playlists)
+        return list(playlists)
+
+    def get_items(self, playlist_id: str, fetch: Callable[[], Items]) -> Items:
+        if not self.enabled:
+            return fetch()
+        with self.lock:
+            entry = self.items.get(playlist_id)
+            if entry is not None and self.fresh(entry[0]):
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+        items = fetch()
+        with self.lock:
+            self.items[playlist_id] = (time.monotonic(), items)
+            for item in items:
+                self.item_playlist[get_item_id(item)] = playlist_id
+        return list(items)
+
+    def invalidate_playlist(self, playlist_id: str) -> None:
+        """ the items of playlist_id changed (so did its item count in the catalog) """
+        with self.lock:
+            self.items.pop(playlist_id, None)
+            self.playlists = None
+
+    def invalidate_item(self, item_id: str) -> None:
+        with self.lock:
+            playlist_id = self.item_playlist.pop(item_id, None)
+            if playlist_id is not None:
+                self.items.pop(playlist_id, None)
+            self.playlists = None
+
+    def invalidate_catalog(self) -> None:
+        with self.lock:
+            self.playlists = None
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"playlists": len(self.items), "hits": self.hits, "misses": self.misses}
+
+
+CACHE = Cache()
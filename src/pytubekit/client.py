@@ -0,0 +1,48 @@
+"""
+client.py
+
+Thin client for the serve daemon.
+
+pytubekit-client COMMAND [ARGS]... sends the invocation to the daemon listening
+on $PYTUBEKIT_SOCKET (or the default socket), streams its output to stdout and
+stderr and exits with its exit code. It only imports the standard library so
+that it starts in milliseconds.
+"""
+import json
+import os
+import socket
+import sys
+from typing import IO
+
+from pytubekit.constants import SERVE_SOCKET, SERVE_SOCKET_ENV
+
+
+def call(socket_path: str, args: list[str], stdout: IO[str], stderr: IO[str], cwd: str | None = None) -> int:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        request = {"args": args, "cwd": cwd if cwd is not None else os.getcwd()}
+        sock.sendall((json.dumps(request) + "\n").encode())
+        with sock.makefile("r", encoding="utf-8") as f:
+            for line in f:
+                frame = json.loads(line)
+                if "exit" in frame:
+                    return frame["exit"]
+                stream = stdout if frame["stream"] == "stdout" else stderr
+                stream.write(frame["data"])
+                stream.flush()
+    print("pytubekit-client: the daemon closed the connection", file=stderr)
+    return 1
+
+
+def main() -> None:
+    socket_path = os.environ.get(SERVE_SOCKET_ENV, SERVE_SOCKET)
+    try:
+        code = call(socket_path, sys.argv[1:], sys.stdout, sys.stderr)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"pytubekit-client: no daemon on [{socket_path}], start one with: pytubekit serve", file=sys.stderr)
+        code = 2
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+columnar.py
+
+Typed columnar output (Parquet or Arrow IPC) for add_data, export_csv and dump.
+
+CSV output holds every value as a string, so whatever reads it parses all of it
+again. Here counts, durations and dimensions are written as integers, dates as
+dates and timestamps, flags as booleans and tags, categories and caption
+languages as lists, in row groups of BATCH_SIZE rows; Parquet also compresses
+every column. Needs pyarrow, which is optional: pip install pyarrow.
+
+A columnar file can not be appended to, so a writer writes a temporary file next
+to the output and moves it into place when it is closed, also when the run is
+interrupted by an exception. To resume an earlier run, its rows are copied into
+the new file first.
+"""
+import datetime
+import os
+import tempfile
+from collections.abc import Callable, Iterator
+from types import TracebackType
+from typing import Any, Self
+
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+OUTPUT_FORMATS = [CSV, PARQUET, ARROW]
+COLUMNAR_FORMATS = [PARQUET, ARROW]
+
+BATCH_SIZE = 10000
+
+# metadata columns by type; the rest are strings (see METADATA_FIELDNAMES in util.py for the order)
+INT_COLUMNS = {
+    "duration", "view_count", "like_count", "comment_count", "age_limit", "width", "height", "channel_follower_count",
+}
+FLOAT_COLUMNS = {"average_rating", "fps"}
+BOOL_COLUMNS = {"is_live", "was_live", "playable_in_embed"}
+DATE_COLUMNS = {"upload_date"}
+# written joined by ", " in CSV (none of these can contain a comma)
+LIST_COLUMNS = {"categories", "tags", "subtitles_available", "automatic_captions_available"}
+TIMESTAMP_COLUMNS = {"published_at", "video_published_at"}
+ITEM_COLUMNS = [
+    "playlist_id", "playlist_title", "position", "video_id", "title", "channel", "channel_id",
+    "published_at", "video_published_at",
+]
+EXPORT_COLUMNS = ["position", "video_id", "title", "channel"]
+
+
+def import_pyarrow() -> Any:
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ValueError("columnar output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def get_schema(columns: list[str]) -> Any:
+    pa = import_pyarrow()
+    fields = []
+    for column in columns:
+        if column in INT_COLUMNS or column == "position":
+            kind = pa.int64()
+        elif column in FLOAT_COLUMNS:
+            kind = pa.float64()
+        elif column in BOOL_COLUMNS:
+            kind = pa.bool_()
+        elif column in DATE_COLUMNS:
+            kind = pa.date32()
+        elif column in LIST_COLUMNS:
+            kind = pa.list_(pa.string())
+        elif column in TIMESTAMP_COLUMNS:
+            kind = pa.timestamp("s", tz="UTC")
+        else:
+            kind = pa.string()
+        fields.append(pa.field(column, kind))
+    return pa.schema(fields)
+
+
+def to_int(value: Any) -> int:
+    return int(float(value))
+
+
+def to_bool(value: Any) -> bool:
+    return value if isinstance(value, bool) else value == "True"
+
+
+def to_date(value: Any) -> datetime.date:
+    return datetime.datetime.strptime(str(value), "%Y%m%d").date()
+
+
+def to_list(value: Any) -> list[str]:
+    return value if isinstance(value, list) else str(value).split(", ")
+
+
+def to_timestamp(value: Any) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(str(value))
+
+
+CONVERTERS: dict[str, Callable[[Any], Any]] = {
+    **{column: to_int for column in INT_COLUMNS | {"position"}},
+    **{column: float for column in FLOAT_COLUMNS},
+    **{column: to_bool for column in BOOL_COLUMNS},
+    **{column: to_date for column in DATE_COLUMNS},
+    **{column: to_list for column in LIST_COLUMNS},
+    **{column: to_timestamp for column in TIMESTAMP_COLUMNS},
+}
+
+
+def convert(column: str, value: Any) -> Any:
+    """ a value as yt-dlp, the API or a CSV file has it -> the python value of its column type ("" is null) """
+    if value is None or value == "":
+        return None
+    return CONVERTERS.get(column, str)(value)
+
+
+class ColumnarWriter:
+    """ writes rows (dicts) in row groups of batch_size; use as a context manager """
+    def __init__(self, path: str, output_format: str, columns: list[str], batch_size: int = BATCH_SIZE) -> None:
+        pa = import_pyarrow()
+        self.path = path
+        self.columns = columns
+        self.schema = get_schema(columns)
+        self.batch_size = batch_size
+        self.rows: list[dict[str, Any]] = []
+        self.count = 0
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, self.temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp")
+        os.close(fd)
+        if output_format == PARQUET:
+            self.writer = pa.parquet.ParquetWriter(self.temp_path, self.schema, compression="zstd")
+        elif output_format == ARROW:
+            self.writer = pa.ipc.new_file(self.temp_path, self.schema)
+        else:
+            os.unlink(self.temp_path)
+            raise ValueError(f"[{output_format}] is not a columnar format")
+
+    def write(self, row: dict[str, Any]) -> None:
+        self.rows.append({column: convert(column, row.get(column)) for column in self.columns})
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def write_table(self, table: Any) -> None:
+        """ copy rows already converted, for example those of an earlier run """
+        self.flush()
+        for batch in table.cast(self.schema).to_batches(self.batch_size):
+            self.writer.write_batch(batch)
+            self.count += batch.num_rows
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        pa = import_pyarrow()
+        self.writer.write_batch(pa.RecordBatch.from_pylist(self.rows, schema=self.schema))
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+        os.replace(self.temp_path, self.path)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def read_table(path: str) -> Any:
+    """ a Parquet or Arrow IPC file as a pyarrow Table """
+    pa = import_pyarrow()
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic == b"PAR1":
+        return pa.parquet.read_table(path)
+    with pa.ipc.open_file(path) as reader:
+        return reader.read_all()
+
+
+def item_rows(
+    playlists: list[dict[str, Any]],
+    get_items: Callable[[str], list[dict[str, Any]]],
+) -> Iterator[dict[str, Any]]:
+    """ one row per item of every playlist resource, for a columnar dump """
+    for playlist in playlists:
+        for item in get_items(playlist["id"]):
+            snippet = item["snippet"]
+            yield {
+                "playlist_id": playlist["id"],
+                "playlist_title": playlist["snippet"]["title"],
+                "position": snippet.get("position"),
+                "video_id": snippet["resourceId"]["videoId"],
+                "title": snippet.get("title"),
+                "channel": snippet.get("videoOwnerChannelTitle"),
+                "channel_id": snippet.get("videoOwnerChannelId"),
+                "published_at": snippet.get("publishedAt"),
+                "video_published_at": item.get("contentDetails", {}).get("videoPublishedAt"),
+            }
@@ -3,6 +3,10 @@ All configurations
 """
 from pytconf import Config, ParamCreator
 
+from pytubekit.columnar import OUTPUT_FORMATS
+from pytubekit.constants import CHAIN, DAILY_QUOTA, PACKINGS, ROUND_ROBIN, SERVE_SOCKET, SHARD_POLICIES
+from pytubekit.streams import COMPRESSIONS, NONE
+
 
 class ConfigPagination(Config):
     """ Pagination parameters """
@@ -27,6 +31,175 @@ class ConfigDump(Config):
         help_string="Which folder to dump to",
         default=".",
     )
+    dump_jsonl = ParamCreator.create_bool(
+        help_string="With --full, write one compact JSON item per line instead of indented JSON",
+        default=False,
+    )
+    dump_compression = ParamCreator.create_choice(
+        choice_list=COMPRESSIONS,
+        help_string="Compress dump files (gzip or zstd, which needs zstandard)",
+        default=NONE,
+    )
+
+
+class ConfigHistory(Config):
+    """ Where the snapshot history is stored """
+    history_store = ParamCreator.create_str(
+        help_string="Folder of the snapshot history store",
+        default="~/.pytubekit/history",
+    )
+
+
+class ConfigHistorySave(Config):
+    """ Parameters for saving snapshots """
+    history_import_folders = ParamCreator.create_list_str(
+        help_string="Import these dump folders (each one snapshot) instead of reading the account",
+        default=[],
+    )
+
+
+class ConfigHistoryShow(Config):
+    """ Parameters for showing a snapshot """
+    history_date = ParamCreator.create_str_or_none(
+        help_string="Show the playlists as of this time (epoch seconds, YYYY-MM-DD or ISO time; default latest)",
+        default=None,
+    )
+    history_playlists = ParamCreator.create_list_str(
+        help_string="Only these playlists (omit for all)",
+        default=[],
+    )
+    history_output_folder = ParamCreator.create_str_or_none(
+        help_string="Write the snapshot as a dump folder here instead of printing it",
+        default=None,
+    )
+
+
+class ConfigHistoryChanges(Config):
+    """ Parameters for the change feed """
+    history_from = ParamCreator.create_str_or_none(
+        help_string="Older time (default: the snapshot before the newer one)",
+        default=None,
+    )
+    history_to = ParamCreator.create_str_or_none(
+        help_string="Newer time (default: the latest snapshot)",
+        default=None,
+    )
+
+
+class ConfigHistoryTimeline(Config):
+    """ Parameters for the membership timeline """
+    history_video = ParamCreator.create_str(
+        help_string="Video ID to follow",
+    )
+
+
+class ConfigItemSource(Config):
+    """ Where playlists and their items are read from """
+    item_source = ParamCreator.create_choice(
+        choice_list=["api", "ytdlp"],
+        help_string="api = YouTube Data API (costs quota), ytdlp = yt-dlp flat extraction (no quota, read only, lists WL)",
+        default="api",
+    )
+    ytdlp_cookies_from_browser = ParamCreator.create_str_or_none(
+        help_string="Browser to take the cookies of the account from for ytdlp (e.g. firefox, chrome; omit for .netrc)",
+        default=None,
+    )
+    ytdlp_cookie_file = ParamCreator.create_str_or_none(
+        help_string="cookies.txt file of the account for ytdlp (omit for .netrc)",
+        default=None,
+    )
+
+
+class ConfigDownload(Config):
+    """ Parameters for downloading with yt-dlp """
+    download_workers = ParamCreator.create_int(
+        help_string="How many videos to download at a time",
+        default=4,
+    )
+    download_fragments = ParamCreator.create_int(
+        help_string="How many fragments of each video to download at a time",
+        default=4,
+    )
+    download_per_host = ParamCreator.create_int_or_none(
+        help_string="How many downloads from one media host (CDN server) at a time (omit for --download-workers)",
+        default=None,
+    )
+    download_rate_limit = ParamCreator.create_int_or_none(
+        help_string="Bandwidth limit in bytes per second for all downloads together (omit for none)",
+        default=None,
+    )
+    download_archive = ParamCreator.create_str(
+        help_string="File listing the videos already downloaded, which are skipped",
+        default="~/.pytubekit/download_archive.txt",
+    )
+    download_queue = ParamCreator.create_str(
+        help_string="File keeping the videos not downloaded yet, resumed by the next run",
+        default="~/.pytubekit/download_queue.jsonl",
+    )
+
+
+class ConfigCrawl(Config):
+    """ Parameters for crawling channel uploads """
+    crawl_channels = ParamCreator.create_list_str(
+        help_string="Channel ids (UC...) to crawl (omit for the channels the account is subscribed to)",
+        default=[],
+    )
+    crawl_channels_file = ParamCreator.create_str_or_none(
+        help_string="File with more channel ids to crawl, one per line",
+        default=None,
+    )
+    crawl_state = ParamCreator.create_str(
+        help_string="File keeping the newest upload seen of every channel",
+        default="~/.pytubekit/crawl_state.json",
+    )
+    crawl_workers = ParamCreator.create_int(
+        help_string="How many channels to crawl at a time",
+        default=8,
+    )
+    crawl_initial_pages = ParamCreator.create_int(
+        help_string="How many pages of uploads to read of a channel crawled for the first time",
+        default=1,
+    )
+    crawl_output = ParamCreator.create_str_or_none(
+        help_string="Append the ids of new uploads to this file (omit to print them)",
+        default=None,
+    )
+
+
+class ConfigSeen(Config):
+    """ Where the set of seen videos is stored """
+    seen_store = ParamCreator.create_str(
+        help_string="Folder of the seen set",
+        default="~/.pytubekit/seen",
+    )
+
+
+class ConfigSeenAdd(Config):
+    """ Parameters for adding to the seen set """
+    seen_add_paths = ParamCreator.create_list_str(
+        help_string="Dump folders or files of seen videos (files already added and unchanged are skipped)",
+        default=[],
+    )
+    seen_add_playlists = ParamCreator.create_list_str(
+        help_string="Playlists of seen videos (e.g. watch history)",
+        default=[],
+    )
+
+
+class ConfigLeftToSee(Config):
+    """ Parameters for left_to_see """
+    left_playlist_name = ParamCreator.create_str_or_none(
+        help_string="Name of the playlist to filter",
+        default=None,
+    )
+    left_playlist_id = ParamCreator.create_str_or_none(
+        help_string="Id of the playlist to filter, or of a channel (UC...) to filter its uploads",
+        default=None,
+    )
+    left_output = ParamCreator.create_str_or_none(
+        help_string="Write the ids of the videos left to see to this file (omit to print them)",
+        default=None,
+    )
 
 
 class ConfigSubtract(Config):
@@ -76,11 +249,19 @@ class ConfigCleanupPlaylists(Config):
 class ConfigDelete(Config):
     """ Configs for doing delete """
     do_delete = ParamCreator.create_bool(
-        help_string="Really delete?",
+        help_string="Really delete/modify? (False = dry run: plan and report only)",
         default=True,
     )
 
 
+class ConfigQuota(Config):
+    """ Quota budget used when planning changes """
+    quota_budget = ParamCreator.create_int(
+        help_string="Quota units available per day (to estimate how many days a plan needs)",
+        default=10000,
+    )
+
+
 class ConfigCleanup(Config):
     """ Parameters for cleanup """
     dedup = ParamCreator.create_bool(
@@ -95,6 +276,22 @@ class ConfigCleanup(Config):
         help_string="Really delete privatized?",
         default=True,
     )
+    availability = ParamCreator.create_bool(
+        help_string="Check every video with videos.list (1 unit per 50 videos) instead of trusting titles?",
+        default=False,
+    )
+    availability_region = ParamCreator.create_str_or_none(
+        help_string="Region code (e.g. US) whose region blocked videos count as unavailable (omit to ignore regions)",
+        default=None,
+    )
+    availability_cache = ParamCreator.create_str(
+        help_string="File keeping availability checks between runs",
+        default="~/.pytubekit/availability.json",
+    )
+    availability_ttl = ParamCreator.create_int(
+        help_string="Seconds an availability check is reused",
+        default=7 * 24 * 3600,
+    )
 
 
 class ConfigDiff(Config):
@@ -135,6 +332,53 @@ class ConfigAddData(Config):
     )
 
 
+class ConfigQueue(Config):
+    """ Where the add_data work queue is stored """
+    queue_file = ParamCreator.create_str(
+        help_string="SQLite database of the work queue (on a filesystem shared by the workers)",
+        default="~/.pytubekit/add_data_queue.sqlite",
+    )
+    queue_lease = ParamCreator.create_int(
+        help_string="Seconds a claimed batch stays with a worker which stopped sending heartbeats",
+        default=300,
+    )
+
+
+class ConfigQueueFill(Config):
+    """ Parameters for queue_fill """
+    queue_input_files = ParamCreator.create_list_str(
+        help_string="Paths to text files with video IDs (one per line)",
+    )
+    queue_batch_size = ParamCreator.create_int(
+        help_string="Video IDs per batch (what a worker claims at once)",
+        default=50,
+    )
+
+
+class ConfigQueueWork(Config):
+    """ Parameters for queue_work """
+    queue_worker = ParamCreator.create_str_or_none(
+        help_string="Name of the worker in the queue (default: host:pid)",
+        default=None,
+    )
+
+
+class ConfigQueueMerge(Config):
+    """ Parameters for queue_merge """
+    queue_output = ParamCreator.create_str(
+        help_string="Path to write the metadata of all the queued IDs to",
+    )
+
+
+class ConfigOutputFormat(Config):
+    """ Format of tabular output """
+    output_format = ParamCreator.create_choice(
+        choice_list=OUTPUT_FORMATS,
+        help_string="csv = the usual text output, parquet / arrow = one typed table (needs pyarrow)",
+        default="csv",
+    )
+
+
 class ConfigOverflow(Config):
     """ Overflow parameters """
     source = ParamCreator.create_str(
@@ -145,6 +389,30 @@ class ConfigOverflow(Config):
     )
 
 
+class ConfigSpill(Config):
+    """ Parameters for overflow_chain """
+    spill_source = ParamCreator.create_str(
+        help_string="Source playlist name",
+    )
+    spill_destinations = ParamCreator.create_list_str(
+        help_string="Destination playlist names, filled in this order",
+        default=[],
+    )
+    spill_destination_glob = ParamCreator.create_str_or_none(
+        help_string="Glob of more destination playlist names (e.g. Archive*), in natural order",
+        default=None,
+    )
+    spill_packing = ParamCreator.create_choice(
+        choice_list=PACKINGS,
+        help_string="chain fills the destinations in order, keeping the source order along them; balance levels their fill",
+        default=CHAIN,
+    )
+    spill_plan = ParamCreator.create_str(
+        help_string="File keeping the plan while it runs; an unfinished plan there is resumed",
+        default="~/.pytubekit/overflow_plan.json",
+    )
+
+
 class ConfigClear(Config):
     """ Playlist to clear """
     clear_name = ParamCreator.create_str(
@@ -172,9 +440,18 @@ class ConfigSort(Config):
         help_string="Name of playlist to sort",
     )
     sort_key = ParamCreator.create_str(
-        help_string="Sort key: title, channel, or date",
+        help_string="Comma separated sort keys, each with an optional :asc or :desc suffix "
+                    "(title, channel, date, duration, upload_date, views, likes)",
         default="title",
     )
+    sort_metadata_cache = ParamCreator.create_str(
+        help_string="File keeping the videos.list metadata of sorts between runs",
+        default="~/.pytubekit/metadata.json",
+    )
+    sort_metadata_ttl = ParamCreator.create_int(
+        help_string="Seconds fetched metadata is reused",
+        default=24 * 3600,
+    )
 
 
 class ConfigSearch(Config):
@@ -224,6 +501,16 @@ class ConfigAddFileToPlaylist(Config):
     )
 
 
+class ConfigSync(Config):
+    """ Make a playlist match a list of video IDs """
+    sync_file = ParamCreator.create_str(
+        help_string="Path to text file with the wanted video IDs in order (one per line, e.g. a dump file)",
+    )
+    sync_playlist_name = ParamCreator.create_str(
+        help_string="Name of playlist to sync",
+    )
+
+
 class ConfigCreatePlaylist(Config):
     """ Create playlist parameters """
     create_name = ParamCreator.create_str(help_string="Name for the new playlist")
@@ -271,6 +558,230 @@ class ConfigLocalDiff(Config):
     )
 
 
+class ConfigSketch(Config):
+    """ Sketch statistics parameters """
+    sketch_paths = ParamCreator.create_list_str(
+        help_string="Dump folders or files to count over",
+    )
+    sketch_overlap_paths = ParamCreator.create_list_str(
+        help_string="Dump folders or files to estimate the overlap with (omit for none)",
+        default=[],
+    )
+    sketch_videos = ParamCreator.create_list_str(
+        help_string="Video IDs to estimate the number of occurrences of",
+        default=[],
+    )
+    sketch_candidates = ParamCreator.create_str_or_none(
+        help_string="Dump folder or file whose video IDs are ranked by occurrences (omit for no ranking)",
+        default=None,
+    )
+    sketch_top = ParamCreator.create_int(
+        help_string="How many of the most repeated candidates to show",
+        default=10,
+    )
+    sketch_exact = ParamCreator.create_bool(
+        help_string="Also compute the exact values, for checking the estimates",
+        default=False,
+    )
+
+
+class ConfigInsert(Config):
+    """ Insert pipeline parameters """
+    insert_window = ParamCreator.create_int(
+        help_string="How many inserts to keep in flight at once (1 = serial)",
+        default=8,
+    )
+
+
+class ConfigBenchmark(Config):
+    """ Offline benchmark parameters """
+    benchmark_playlists = ParamCreator.create_int(
+        help_string="Number of synthetic playlists",
+        default=10,
+    )
+    benchmark_items = ParamCreator.create_int(
+        help_string="Maximum number of items per synthetic playlist",
+        default=500,
+    )
+    benchmark_seed = ParamCreator.create_int(
+        help_string="Random seed for the synthetic account",
+        default=0,
+    )
+    benchmark_fixture = ParamCreator.create_str_or_none(
+        help_string="JSON file with recorded playlists/items to replay instead of a synthetic account",
+        default=None,
+    )
+    benchmark_repeat = ParamCreator.create_int(
+        help_string="Runs per benchmark (the best time is kept)",
+        default=3,
+    )
+    benchmark_names = ParamCreator.create_list_str(
+        help_string="Benchmarks to run (omit for all)",
+        default=[],
+    )
+    benchmark_output = ParamCreator.create_str_or_none(
+        help_string="Path to write the JSON results to",
+        default=None,
+    )
+    benchmark_baseline = ParamCreator.create_str_or_none(
+        help_string="JSON results of a previous run to compare against",
+        default=None,
+    )
+    benchmark_tolerance = ParamCreator.create_int(
+        help_string="Allowed slowdown against the baseline, in percent",
+        default=20,
+    )
+
+
+class ConfigFakeApi(Config):
+    """ Local fake API server parameters """
+    fake_api_host = ParamCreator.create_str(
+        help_string="Address to listen on",
+        default="127.0.0.1",
+    )
+    fake_api_port = ParamCreator.create_int(
+        help_string="Port to listen on",
+        default=8080,
+    )
+    fake_api_playlists = ParamCreator.create_int(
+        help_string="Number of synthetic playlists",
+        default=10,
+    )
+    fake_api_items = ParamCreator.create_int(
+        help_string="Maximum number of items per synthetic playlist",
+        default=500,
+    )
+    fake_api_seed = ParamCreator.create_int(
+        help_string="Random seed for the synthetic account, latencies and faults",
+        default=0,
+    )
+    fake_api_fixture = ParamCreator.create_str_or_none(
+        help_string="JSON file with playlists/items to serve instead of a synthetic account",
+        default=None,
+    )
+    fake_api_quota = ParamCreator.create_int(
+        help_string="Daily quota units before quotaExceeded is returned",
+        default=10000,
+    )
+    fake_api_latency = ParamCreator.create_choice(
+        choice_list=["none", "constant", "uniform", "exponential", "lognormal"],
+        help_string="Latency distribution of every call",
+        default="none",
+    )
+    fake_api_latency_ms = ParamCreator.create_int(
+        help_string="Mean (median for lognormal) latency in milliseconds",
+        default=100,
+    )
+    fake_api_403_rate = ParamCreator.create_int(
+        help_string="Injected 403 rateLimitExceeded responses per 1000 calls",
+        default=0,
+    )
+    fake_api_429_rate = ParamCreator.create_int(
+        help_string="Injected 429 responses per 1000 calls",
+        default=0,
+    )
+    fake_api_500_rate = ParamCreator.create_int(
+        help_string="Injected 500 responses per 1000 calls",
+        default=0,
+    )
+    fake_api_503_rate = ParamCreator.create_int(
+        help_string="Injected 503 responses per 1000 calls",
+        default=0,
+    )
+
+
+class ConfigRun(Config):
+    """ Batch script parameters """
+    run_script = ParamCreator.create_existing_file(
+        help_string="Script of invocations (YAML if it ends in .yaml/.yml, else one per line)",
+    )
+    run_keep_going = ParamCreator.create_bool(
+        help_string="Keep running the next steps after a step fails",
+        default=False,
+    )
+
+
+class ConfigServe(Config):
+    """ serve daemon parameters """
+    serve_socket = ParamCreator.create_str(
+        help_string="Unix socket to listen on (the client reads $PYTUBEKIT_SOCKET)",
+        default=SERVE_SOCKET,
+    )
+    serve_cache_ttl = ParamCreator.create_int(
+        help_string="Seconds cached playlists and items stay valid (0 = until changed by this daemon)",
+        default=300,
+    )
+
+
+class ConfigApi(Config):
+    """ API endpoint parameters (accepted by every command) """
+    api_base_url = ParamCreator.create_str_or_none(
+        help_string="Base URL of the API (e.g. a local fake_api server); no OAuth is done when set",
+        default=None,
+    )
+
+
+class ConfigShards(Config):
+    """ Quota shards (accepted by every command) """
+    shards = ParamCreator.create_list_str(
+        help_string="Folders of Google Cloud projects, each with a client_secret.json (and the token.json authorized for it)",
+        default=[],
+    )
+    shard_policy = ParamCreator.create_choice(
+        choice_list=SHARD_POLICIES,
+        help_string="Which shard takes the next call: round_robin (in turn) or least_used (fewest units today)",
+        default=ROUND_ROBIN,
+    )
+    shard_quota = ParamCreator.create_int(
+        help_string="Quota units per shard per day",
+        default=DAILY_QUOTA,
+    )
+    shard_ledgers = ParamCreator.create_str(
+        help_string="Folder keeping the units each shard spent today",
+        default="~/.pytubekit/ledgers",
+    )
+
+
+class ConfigTrace(Config):
+    """ Tracing parameters (accepted by every command) """
+    trace_file = ParamCreator.create_str_or_none(
+        help_string="Path to write a JSONL trace of every API call to",
+        default=None,
+    )
+    trace_prometheus_file = ParamCreator.create_str_or_none(
+        help_string="Path to write a Prometheus textfile with per-method metrics to",
+        default=None,
+    )
+
+
+class ConfigProfile(Config):
+    """ Profiling parameters (accepted by every command) """
+    profile = ParamCreator.create_choice(
+        choice_list=["none", "cprofile", "sampling", "tracemalloc"],
+        help_string="Profile the command: cprofile, sampling (pyinstrument if installed) or tracemalloc",
+        default="none",
+    )
+    profile_file = ParamCreator.create_str(
+        help_string="Path to write the profile stats to",
+        default="pytubekit.prof",
+    )
+    profile_top = ParamCreator.create_int(
+        help_string="How many entries to show in the profile summary",
+        default=20,
+    )
+
+
+class ConfigProgress(Config):
+    """ Progress reporting parameters (accepted by every command) """
+    progress_interval = ParamCreator.create_int(
+        help_string="Seconds between progress reports",
+        default=5,
+    )
+    progress_fd = ParamCreator.create_int_or_none(
+        help_string="File descriptor to write a JSON-lines progress stream to",
+        default=None,
+    )
+
 
 class ConfigPrint(Config):
     """ How to dump things """
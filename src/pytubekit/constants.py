@@ -1,6 +1,8 @@
 """
 constants.py
 """
+import os
+import tempfile
 
 SCOPES = [
     "https://www.googleapis.com/auth/youtube",
@@ -16,3 +18,42 @@ ITEMS_TOKEN = "items"
 DELETED_TITLE = "Deleted video"
 PRIVATE_TITLE = "Private video"
 MAX_PLAYLIST_ITEMS = 5000
+# availability of a video as classified by availability.py
+AVAILABLE = "available"
+MISSING = "missing"
+PRIVATE = "private"
+REJECTED = "rejected"
+BLOCKED = "blocked"
+# how planner.plan_spill() packs videos into several destinations
+CHAIN = "chain"
+BALANCE = "balance"
+PACKINGS = [CHAIN, BALANCE]
+# how shards.ShardSet picks the project of the next call
+ROUND_ROBIN = "round_robin"
+LEAST_USED = "least_used"
+SHARD_POLICIES = [ROUND_ROBIN, LEAST_USED]
+# the largest page the list methods return
+MAX_PAGE_SIZE = 50
+# quota units charged per API method (https://developers.google.com/youtube/v3/determine_quota_cost)
+READ_QUOTA_COST = 1
+WRITE_QUOTA_COST = 50
+QUOTA_COSTS = {
+    "youtube.playlists.list": READ_QUOTA_COST,
+    "youtube.playlists.insert": WRITE_QUOTA_COST,
+    "youtube.playlists.update": WRITE_QUOTA_COST,
+    "youtube.playlists.delete": WRITE_QUOTA_COST,
+    "youtube.playlistItems.list": READ_QUOTA_COST,
+    "youtube.playlistItems.insert": WRITE_QUOTA_COST,
+    "youtube.playlistItems.update": WRITE_QUOTA_COST,
+    "youtube.playlistItems.delete": WRITE_QUOTA_COST,
+    "youtube.videos.list": READ_QUOTA_COST,
+    "youtube.channels.list": READ_QUOTA_COST,
+    "youtube.subscriptions.list": READ_QUOTA_COST,
+    "youtube.search.list": 100,
+}
+DAILY_QUOTA = 10000
+# reason of the error the API answers a position in a playlist which is not sorted manually with
+MANUAL_SORT_REQUIRED = "manualSortRequired"
+# unix socket of the serve daemon (the client also honors the PYTUBEKIT_SOCKET environment variable)
+SERVE_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir()), "pytubekit.sock")
+SERVE_SOCKET_ENV = "PYTUBEKIT_SOCKET"
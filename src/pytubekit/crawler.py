@@ -0,0 +1,176 @@
+"""
+crawler.py
+
+New uploads of many channels, for about one API call per channel per day.
+
+Every channel has an uploads playlist (its id with UC replaced by UU) which
+lists its videos newest first, so no channels.list call is needed to find it.
+For each channel a watermark is kept: the newest video seen in the last crawl
+and when it was published. A crawl pages through the uploads playlist only until
+it meets the watermark video, or a video published before it (the watermark
+video may have been deleted since), so a channel with fewer than a page of new
+uploads costs one playlistItems.list call. A channel crawled for the first time
+has no watermark and only its latest initial_pages pages are read.
+
+Channels are crawled concurrently, each worker thread with its own service
+object. The watermarks are saved after the new uploads have been handed back,
+so a crawl interrupted in between reports some uploads again rather than never.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from googleapiclient.errors import HttpError
+
+from pytubekit.constants import MAX_PAGE_SIZE
+from pytubekit.fileio import write_atomically
+from pytubekit.progress import Progress
+from pytubekit.sources import uploads_playlist_id
+from pytubekit.util import PagedRequest
+
+NOT_FOUND = 404
+
+
+@dataclass(frozen=True)
+class Watermark:
+    video_id: str
+    published_at: str
+    title: str = ""
+
+
+@dataclass(frozen=True)
+class Upload:
+    channel_id: str
+    video_id: str
+    title: str
+    published_at: str
+
+
+@dataclass
+class ChannelCrawl:
+    channel_id: str
+    uploads: list[Upload]
+    pages: int
+    # whether the watermark was reached (False on a first crawl or when a channel uploaded a lot)
+    caught_up: bool
+
+
+class WatermarkStore:
+    """ channel id -> Watermark, persisted in a JSON file; path None keeps it in memory """
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path
+        self.watermarks: dict[str, Watermark] = {}
+        if path is not None and os.path.isfile(path):
+            with open(path) as f:
+                self.watermarks = {channel_id: Watermark(**data) for channel_id, data in json.load(f).items()}
+
+    def get(self, channel_id: str) -> Watermark | None:
+        return self.watermarks.get(channel_id)
+
+    def put(self, channel_id: str, watermark: Watermark) -> None:
+        self.watermarks[channel_id] = watermark
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {channel_id: asdict(watermark) for channel_id, watermark in sorted(self.watermarks.items())}
+        write_atomically(self.path, json.dumps(data, indent=1).encode())
+
+
+def get_published_at(item: dict[str, Any]) -> str:
+    """ when the video of an uploads playlist item was published (RFC 3339, compares as a string) """
+    return item.get("contentDetails", {}).get("videoPublishedAt") or item["snippet"].get("publishedAt", "")
+
+
+def list_subscriptions(youtube: Any, page_size: int = MAX_PAGE_SIZE) -> list[str]:
+    """ the channel ids the account is subscribed to """
+    request = PagedRequest(
+        f=youtube.subscriptions().list,
+        kwargs={"part": "snippet", "mine": True, "maxResults": page_size},
+    )
+    return [item["snippet"]["resourceId"]["channelId"] for item in request.get_all_items()]
+
+
+def crawl_channel(
+    youtube: Any,
+    channel_id: str,
+    watermark: Watermark | None,
+    page_size: int = MAX_PAGE_SIZE,
+    initial_pages: int = 1,
+) -> ChannelCrawl:
+    """ the uploads of the channel newer than its watermark, newest first """
+    request = PagedRequest(
+        f=youtube.playlistItems().list,
+        kwargs={"part": "snippet,contentDetails", "playlistId": uploads_playlist_id(channel_id), "maxResults": page_size},
+    )
+    uploads: list[Upload] = []
+    pages = 0
+    while True:
+        over, response = request.get_next_page()
+        pages += 1
+        for item in response.get("items", []):
+            video_id = item["snippet"]["resourceId"]["videoId"]
+            published_at = get_published_at(item)
+            if watermark is not None and (video_id == watermark.video_id or published_at < watermark.published_at):
+                return ChannelCrawl(channel_id, uploads, pages, caught_up=True)
+            uploads.append(Upload(channel_id, video_id, item["snippet"].get("title", ""), published_at))
+        if over or (watermark is None and pages >= initial_pages):
+            return ChannelCrawl(channel_id, uploads, pages, caught_up=False)
+
+
+def crawl(
+    client_factory: Callable[[], Any],
+    channel_ids: list[str],
+    store: WatermarkStore,
+    *,
+    workers: int = 4,
+    page_size: int = MAX_PAGE_SIZE,
+    initial_pages: int = 1,
+    progress: Progress | None = None,
+) -> list[ChannelCrawl]:
+    """
+    crawl the channels on workers threads (each with a service object from client_factory) and move
+    their watermarks; channels without an uploads playlist are skipped. Call store.save() once the
+    uploads are taken care of.
+    """
+    logger = logging.getLogger()
+    local = threading.local()
+
+    def crawl_one(channel_id: str) -> ChannelCrawl:
+        if not hasattr(local, "youtube"):
+            local.youtube = client_factory()
+        return crawl_channel(local.youtube, channel_id, store.get(channel_id), page_size, initial_pages)
+
+    results: list[ChannelCrawl] = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(crawl_one, channel_id): channel_id for channel_id in dict.fromkeys(channel_ids)}
+        for future in as_completed(futures):
+            channel_id = futures[future]
+            try:
+                result = future.result()
+            except HttpError as e:
+                if e.resp.status != NOT_FOUND:
+                    raise
+                logger.warning(f"channel [{channel_id}] has no uploads playlist, skipping it")
+                continue
+            finally:
+                if progress is not None:
+                    progress.advance()
+            if result.uploads:
+                newest = result.uploads[0]
+                store.put(channel_id, Watermark(newest.video_id, newest.published_at, newest.title))
+            results.append(result)
+    # as_completed order is arbitrary, report channels in the order given
+    order = {channel_id: i for i, channel_id in enumerate(channel_ids)}
+    results.sort(key=lambda result: order[result.channel_id])
+    pages = sum(result.pages for result in results)
+    new = sum(len(result.uploads) for result in results)
+    logger.info(f"crawled [{len(results)}] channels in [{pages}] calls and {time.perf_counter() - start:.1f}s, [{new}] new uploads")
+    return results
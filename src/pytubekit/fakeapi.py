@@ -0,0 +1,565 @@
+"""
+fakeapi.py
+
+A local stand-in for the YouTube Data API v3.
+
+Implements list/insert/update/delete of playlists and playlistItems, and list of
+videos and channels, over HTTP with the same URL layout, pagination tokens, etags
+(including If-None-Match / 304) and error bodies as the real API, so the real
+client can be pointed at it with the global --api-base-url option. The server
+charges per-method quota against a daily limit (answering quotaExceeded once it is
+spent), a separate one per API key (the key query parameter) so that several
+Google Cloud projects can be emulated (see shards.py), sleeps according to a configurable latency distribution and injects
+403/429/5xx faults at configurable rates.
+
+Accounts are held in a compact form (tuples, rendered to resources on demand) so
+that synthetic accounts with millions of items fit in memory.
+
+GET /fake/stats returns the quota, calls and faults so far; POST /fake/reset
+resets them (a new quota day).
+"""
+import base64
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+from pytubekit.constants import DAILY_QUOTA, DELETED_TITLE, MANUAL_SORT_REQUIRED, MAX_PLAYLIST_ITEMS, PRIVATE_TITLE
+from pytubekit.tracing import get_quota_cost
+
+API_PREFIX = "/youtube/v3/"
+MAX_RESULTS = 50
+DEFAULT_MAX_RESULTS = 5
+
+# item record: [item id, video id, title, channel title, published at]
+Item = list[str]
+
+
+class FakeApiError(Exception):
+    def __init__(self, status: int, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.message = message
+
+    def body(self) -> dict[str, Any]:
+        return {
+            "error": {
+                "code": self.status,
+                "message": self.message,
+                "errors": [{"message": self.message, "domain": "youtube.api", "reason": self.reason}],
+            },
+        }
+
+
+def make_etag(data: Any) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:27]
+
+
+def encode_page_token(key: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{key}:{offset}".encode()).decode()
+
+
+def decode_page_token(token: str, key: str) -> int:
+    try:
+        token_key, offset = base64.urlsafe_b64decode(token.encode()).decode().rsplit(":", 1)
+        if token_key == key:
+            return int(offset)
+    except ValueError:
+        pass
+    raise FakeApiError(400, "invalidPageToken", "The request specifies an invalid page token.")
+
+
+class FakePlaylist:
+    def __init__(self, playlist_id: str, title: str, description: str = "", privacy: str = "private") -> None:
+        self.playlist_id = playlist_id
+        self.title = title
+        self.description = description
+        self.privacy = privacy
+        # a playlist sorted by YouTube (date added, popularity...) takes no positions in inserts and updates
+        self.manual_sort = True
+        self.items: list[Item] = []
+
+
+def check_position(playlist: FakePlaylist, position: int | None) -> None:
+    """ like the API, refuse positions in playlists which are not sorted manually; a position past the end appends """
+    if position is None:
+        return
+    if not playlist.manual_sort:
+        raise FakeApiError(400, MANUAL_SORT_REQUIRED, "The playlist does not use manual sorting.")
+    if position < 0:
+        raise FakeApiError(400, "invalidPlaylistItemPosition", f"Invalid position [{position}]")
+
+
+class FakeAccount:
+    def __init__(self, channel_id: str = "UCfakechannel0000000000", channel_title: str = "Fake Channel") -> None:
+        self.channel_id = channel_id
+        self.channel_title = channel_title
+        self.playlists: dict[str, FakePlaylist] = {}
+        # item id -> playlist id
+        self.item_index: dict[str, str] = {}
+        # video id -> (title, channel title, privacy status); deleted videos are absent
+        self.videos: dict[str, tuple[str, str, str]] = {}
+        # channel ids the account is subscribed to (their uploads playlists are ordinary playlists with UU ids)
+        self.subscriptions: list[str] = []
+        self.next_id = 0
+
+    def new_id(self, prefix: str) -> str:
+        self.next_id += 1
+        return f"{prefix}{self.next_id:016d}"
+
+    def add_playlist(self, title: str, description: str = "", privacy: str = "private", playlist_id: str | None = None) -> FakePlaylist:
+        playlist = FakePlaylist(playlist_id or self.new_id("PL"), title, description, privacy)
+        self.playlists[playlist.playlist_id] = playlist
+        return playlist
+
+    def add_item(
+        self,
+        playlist: FakePlaylist,
+        video_id: str,
+        position: int | None = None,
+        item_id: str | None = None,
+        published_at: str = "2024-01-01T00:00:00Z",
+    ) -> Item:
+        if video_id in self.videos:
+            title, channel, privacy = self.videos[video_id]
+            if privacy == "private":
+                title = PRIVATE_TITLE
+        else:
+            title, channel = DELETED_TITLE, ""
+        item = [item_id or self.new_id("PLI"), video_id, title, channel, published_at]
+        if position is None or position >= len(playlist.items):
+            playlist.items.append(item)
+        else:
+            playlist.items.insert(max(position, 0), item)
+        self.item_index[item[0]] = playlist.playlist_id
+        return item
+
+    @classmethod
+    def synthetic(cls, playlists: int, items: int, seed: int = 0) -> "FakeAccount":
+        """ playlists with up to items entries each, drawn from a shared pool of videos so that they overlap """
+        rng = random.Random(seed)
+        account = cls()
+        pool = max(playlists * items // 2, 1)
+        for p in range(playlists):
+            playlist = account.add_playlist(f"Playlist {p}", playlist_id=f"PL{p:08d}")
+            for position in range(rng.randint(items // 2, items)):
+                video_id = f"v{rng.randrange(pool):010d}"
+                if video_id not in account.videos:
+                    roll = rng.random()
+                    if roll >= 0.01:
+                        privacy = "private" if roll < 0.02 else "public"
+                        account.videos[video_id] = (f"Video {video_id}", f"Channel {rng.randrange(100)}", privacy)
+                account.add_item(playlist, video_id, item_id=f"{playlist.playlist_id}_{position}")
+        return account
+
+    @classmethod
+    def from_fixture(cls, data: dict[str, Any]) -> "FakeAccount":
+        """ load the {"playlists": [...], "items": {playlist id: [...]}} fixture format of the benchmarks """
+        account = cls()
+        for resource in data["playlists"]:
+            snippet = resource.get("snippet", {})
+            privacy = resource.get("status", {}).get("privacyStatus", "private")
+            account.add_playlist(snippet.get("title", ""), snippet.get("description", ""), privacy, resource["id"])
+        for playlist_id, resources in data["items"].items():
+            playlist = account.playlists[playlist_id]
+            for resource in resources:
+                snippet = resource["snippet"]
+                video_id = snippet["resourceId"]["videoId"]
+                title = snippet.get("title", "")
+                if title != DELETED_TITLE and video_id not in account.videos:
+                    privacy = "private" if title == PRIVATE_TITLE else "public"
+                    account.videos[video_id] = (title, snippet.get("videoOwnerChannelTitle", ""), privacy)
+                account.add_item(playlist, video_id, item_id=resource["id"])
+        return account
+
+
+class FakeYouTube:
+    """ The API logic, independent of HTTP """
+    def __init__(
+        self,
+        account: FakeAccount,
+        quota_limit: int = DAILY_QUOTA,
+        latency: str = "none",
+        latency_ms: int = 100,
+        fault_rates: dict[int, int] | None = None,
+        seed: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.account = account
+        self.quota_limit = quota_limit
+        self.latency = latency
+        self.latency_ms = latency_ms
+        # status -> rate per 1000 requests
+        self.fault_rates = fault_rates or {}
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.quota: dict[str, int] = {}
+        # API key -> units spent ("" for calls without a key)
+        self.projects: dict[str, int] = {}
+        self.calls: dict[str, int] = {}
+        self.faults: dict[int, int] = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.quota = {}
+            self.projects = {}
+            self.calls = {}
+            self.faults = {}
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "quota": dict(self.quota),
+                "quota_used": sum(self.quota.values()),
+                "quota_limit": self.quota_limit,
+                "projects": dict(self.projects),
+                "calls": dict(self.calls),
+                "faults": {str(status): count for status, count in self.faults.items()},
+            }
+
+    def delay(self) -> float:
+        mean = self.latency_ms / 1000
+        with self.lock:
+            if self.latency == "constant":
+                return mean
+            if self.latency == "uniform":
+                return self.rng.uniform(0, 2 * mean)
+            if self.latency == "exponential":
+                return self.rng.expovariate(1 / mean) if mean > 0 else 0.0
+            if self.latency == "lognormal":
+                return mean * self.rng.lognormvariate(0, 0.5)
+        return 0.0
+
+    def pick_fault(self) -> FakeApiError | None:
+        with self.lock:
+            roll = self.rng.randrange(1000)
+        for status, rate in sorted(self.fault_rates.items()):
+            if roll < rate:
+                if status == 403:
+                    return FakeApiError(403, "rateLimitExceeded", "The request cannot be completed because you have exceeded your quota.")
+                if status == 429:
+                    return FakeApiError(429, "rateLimitExceeded", "Too many requests.")
+                return FakeApiError(status, "backendError", "Backend Error")
+            roll -= rate
+        return None
+
+    def charge(self, method: str, project: str = "") -> None:
+        cost = get_quota_cost(method)
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if self.projects.get(project, 0) + cost > self.quota_limit:
+                raise FakeApiError(403, "quotaExceeded", "The request cannot be completed because you have exceeded your quota.")
+            self.quota[method] = self.quota.get(method, 0) + cost
+            self.projects[project] = self.projects.get(project, 0) + cost
+
+    def handle(self, http_method: str, resource: str, query: dict[str, str], body: Any) -> dict[str, Any] | None:
+        """ serve one call; returns the response body (None for a 204) """
+        operation = {"GET": "list", "POST": "insert", "PUT": "update", "DELETE": "delete"}.get(http_method)
+        handler = getattr(self, f"{resource}_{operation}", None)
+        if operation is None or handler is None:
+            raise FakeApiError(404, "notFound", f"Unknown method {http_method} {resource}")
+        method = f"youtube.{resource}.{operation}"
+        wait = self.delay()
+        if wait > 0:
+            self.sleep(wait)
+        fault = self.pick_fault()
+        if fault is not None:
+            with self.lock:
+                self.faults[fault.status] = self.faults.get(fault.status, 0) + 1
+            raise fault
+        self.charge(method, query.get("key", ""))
+        parts = set(query.get("part", "snippet").split(","))
+        with self.lock:
+            return handler(query, body, parts)
+
+    # rendering
+
+    def render_playlist(self, playlist: FakePlaylist, parts: set[str]) -> dict[str, Any]:
+        resource: dict[str, Any] = {"kind": "youtube#playlist", "id": playlist.playlist_id}
+        if "snippet" in parts:
+            resource["snippet"] = {
+                "channelId": self.account.channel_id,
+                "channelTitle": self.account.channel_title,
+                "title": playlist.title,
+                "description": playlist.description,
+            }
+        if "contentDetails" in parts:
+            resource["contentDetails"] = {"itemCount": len(playlist.items)}
+        if "status" in parts:
+            resource["status"] = {"privacyStatus": playlist.privacy}
+        resource["etag"] = make_etag(resource)
+        return resource
+
+    def render_item(self, playlist: FakePlaylist, position: int, item: Item, parts: set[str]) -> dict[str, Any]:
+        item_id, video_id, title, channel, published_at = item
+        resource: dict[str, Any] = {"kind": "youtube#playlistItem", "id": item_id}
+        if "snippet" in parts:
+            resource["snippet"] = {
+                "publishedAt": published_at,
+                "channelId": self.account.channel_id,
+                "title": title,
+                "description": "",
+                "channelTitle": self.account.channel_title,
+                "playlistId": playlist.playlist_id,
+                "position": position,
+                "resourceId": {"kind": "youtube#video", "videoId": video_id},
+            }
+            if channel:
+                resource["snippet"]["videoOwnerChannelTitle"] = channel
+        if "contentDetails" in parts:
+            resource["contentDetails"] = {"videoId": video_id, "videoPublishedAt": published_at}
+        if "status" in parts:
+            video = self.account.videos.get(video_id)
+            resource["status"] = {"privacyStatus": video[2] if video else "privacyStatusUnspecified"}
+        resource["etag"] = make_etag(resource)
+        return resource
+
+    def render_video(self, video_id: str, parts: set[str]) -> dict[str, Any]:
+        title, channel, privacy = self.account.videos[video_id]
+        # deterministic per video so repeated lists agree
+        digest = int(hashlib.sha1(video_id.encode()).hexdigest(), 16)
+        resource: dict[str, Any] = {"kind": "youtube#video", "id": video_id}
+        if "snippet" in parts:
+            resource["snippet"] = {
+                "publishedAt": f"20{10 + digest % 15}-01-01T00:00:00Z",
+                "title": title,
+                "channelTitle": channel,
+            }
+        if "contentDetails" in parts:
+            resource["contentDetails"] = {"duration": f"PT{digest % 60}M{digest % 59}S"}
+        if "statistics" in parts:
+            resource["statistics"] = {"viewCount": str(digest % 10 ** 7), "likeCount": str(digest % 10 ** 5)}
+        if "status" in parts:
+            resource["status"] = {"privacyStatus": privacy, "uploadStatus": "processed"}
+        resource["etag"] = make_etag(resource)
+        return resource
+
+    def page(self, kind: str, key: str, count: int, query: dict[str, str], render: Callable[[int], dict[str, Any]]) -> dict[str, Any]:
+        max_results = min(int(query.get("maxResults", DEFAULT_MAX_RESULTS)), MAX_RESULTS)
+        start = decode_page_token(query["pageToken"], key) if "pageToken" in query else 0
+        end = min(start + max_results, count)
+        items = [render(i) for i in range(start, end)]
+        response: dict[str, Any] = {
+            "kind": kind,
+            "pageInfo": {"totalResults": count, "resultsPerPage": max_results},
+            "items": items,
+        }
+        if end < count:
+            response["nextPageToken"] = encode_page_token(key, end)
+        if start > 0:
+            response["prevPageToken"] = encode_page_token(key, max(start - max_results, 0))
+        response["etag"] = make_etag([item["etag"] for item in items] + [count, start])
+        return response
+
+    def find_playlist(self, playlist_id: str) -> FakePlaylist:
+        if playlist_id not in self.account.playlists:
+            raise FakeApiError(404, "playlistNotFound", f"The playlist identified with the request [{playlist_id}] cannot be found.")
+        return self.account.playlists[playlist_id]
+
+    def find_item(self, item_id: str) -> tuple[FakePlaylist, int]:
+        if item_id not in self.account.item_index:
+            raise FakeApiError(404, "playlistItemNotFound", f"Playlist item not found: [{item_id}]")
+        playlist = self.account.playlists[self.account.item_index[item_id]]
+        index = next(i for i, item in enumerate(playlist.items) if item[0] == item_id)
+        return playlist, index
+
+    # playlists
+
+    def playlists_list(self, query: dict[str, str], _body: Any, parts: set[str]) -> dict[str, Any]:
+        if "id" in query:
+            playlists = [self.account.playlists[i] for i in query["id"].split(",") if i in self.account.playlists]
+        elif query.get("mine") == "true" or query.get("channelId") == self.account.channel_id:
+            playlists = list(self.account.playlists.values())
+        else:
+            playlists = []
+        return self.page("youtube#playlistListResponse", "playlists", len(playlists), query,
+                         lambda i: self.render_playlist(playlists[i], parts))
+
+    def playlists_insert(self, _query: dict[str, str], body: Any, parts: set[str]) -> dict[str, Any]:
+        snippet = body.get("snippet", {})
+        if not snippet.get("title"):
+            raise FakeApiError(400, "playlistTitleRequired", "The request must specify a playlist title.")
+        privacy = body.get("status", {}).get("privacyStatus", "public")
+        playlist = self.account.add_playlist(snippet["title"], snippet.get("description", ""), privacy)
+        return self.render_playlist(playlist, parts)
+
+    def playlists_update(self, _query: dict[str, str], body: Any, parts: set[str]) -> dict[str, Any]:
+        playlist = self.find_playlist(body.get("id", ""))
+        snippet = body.get("snippet", {})
+        playlist.title = snippet.get("title", playlist.title)
+        playlist.description = snippet.get("description", playlist.description)
+        playlist.privacy = body.get("status", {}).get("privacyStatus", playlist.privacy)
+        return self.render_playlist(playlist, parts)
+
+    def playlists_delete(self, query: dict[str, str], _body: Any, _parts: set[str]) -> None:
+        playlist = self.find_playlist(query.get("id", ""))
+        for item in playlist.items:
+            del self.account.item_index[item[0]]
+        del self.account.playlists[playlist.playlist_id]
+
+    # playlistItems
+
+    def playlistItems_list(self, query: dict[str, str], _body: Any, parts: set[str]) -> dict[str, Any]:  # pylint: disable=invalid-name
+        if "id" in query:
+            found = [self.find_item(item_id) for item_id in query["id"].split(",")]
+            return self.page("youtube#playlistItemListResponse", "playlistItems/id", len(found), query,
+                             lambda i: self.render_item(found[i][0], found[i][1], found[i][0].items[found[i][1]], parts))
+        playlist = self.find_playlist(query.get("playlistId", ""))
+        items = playlist.items
+        return self.page("youtube#playlistItemListResponse", f"playlistItems/{playlist.playlist_id}", len(items), query,
+                         lambda i: self.render_item(playlist, i, items[i], parts))
+
+    def playlistItems_insert(self, _query: dict[str, str], body: Any, parts: set[str]) -> dict[str, Any]:  # pylint: disable=invalid-name
+        snippet = body.get("snippet", {})
+        playlist = self.find_playlist(snippet.get("playlistId", ""))
+        video_id = snippet.get("resourceId", {}).get("videoId")
+        if not video_id:
+            raise FakeApiError(400, "videoRequired", "The request must specify a video.")
+        if video_id not in self.account.videos:
+            raise FakeApiError(404, "videoNotFound", f"Video not found: [{video_id}]")
+        if len(playlist.items) >= MAX_PLAYLIST_ITEMS:
+            raise FakeApiError(403, "playlistContainsMaximumNumberOfVideos", "The playlist already contains the maximum allowed number of items.")
+        position = snippet.get("position")
+        check_position(playlist, position)
+        item = self.account.add_item(playlist, video_id, position)
+        return self.render_item(playlist, playlist.items.index(item), item, parts)
+
+    def playlistItems_update(self, _query: dict[str, str], body: Any, parts: set[str]) -> dict[str, Any]:  # pylint: disable=invalid-name
+        playlist, index = self.find_item(body.get("id", ""))
+        position = body.get("snippet", {}).get("position")
+        check_position(playlist, position)
+        item = playlist.items.pop(index)
+        if position is None:
+            position = index
+        position = min(max(position, 0), len(playlist.items))
+        playlist.items.insert(position, item)
+        return self.render_item(playlist, position, item, parts)
+
+    def playlistItems_delete(self, query: dict[str, str], _body: Any, _parts: set[str]) -> None:  # pylint: disable=invalid-name
+        playlist, index = self.find_item(query.get("id", ""))
+        item = playlist.items.pop(index)
+        del self.account.item_index[item[0]]
+
+    # videos / channels
+
+    def videos_list(self, query: dict[str, str], _body: Any, parts: set[str]) -> dict[str, Any]:
+        ids = [video_id for video_id in query.get("id", "").split(",") if video_id]
+        if len(ids) > MAX_RESULTS:
+            raise FakeApiError(400, "invalidFilters", "Too many video ids (max 50).")
+        # like the API, private videos (of other channels) are left out, as if they did not exist
+        found = [video_id for video_id in ids if video_id in self.account.videos and self.account.videos[video_id][2] != "private"]
+        return self.page("youtube#videoListResponse", "videos", len(found), {"maxResults": str(MAX_RESULTS)},
+                         lambda i: self.render_video(found[i], parts))
+
+    def subscriptions_list(self, query: dict[str, str], _body: Any, _parts: set[str]) -> dict[str, Any]:
+        channel_ids = self.account.subscriptions if query.get("mine") == "true" else []
+
+        def render(i: int) -> dict[str, Any]:
+            channel_id = channel_ids[i]
+            resource: dict[str, Any] = {
+                "kind": "youtube#subscription",
+                "id": f"SUB{channel_id}",
+                "snippet": {"title": channel_id, "resourceId": {"kind": "youtube#channel", "channelId": channel_id}},
+            }
+            resource["etag"] = make_etag(resource)
+            return resource
+        return self.page("youtube#subscriptionListResponse", "subscriptions", len(channel_ids), query, render)
+
+    def channels_list(self, query: dict[str, str], _body: Any, parts: set[str]) -> dict[str, Any]:
+        account = self.account
+        mine = query.get("mine") == "true" or account.channel_id in query.get("id", "").split(",")
+        resource: dict[str, Any] = {"kind": "youtube#channel", "id": account.channel_id}
+        if "snippet" in parts:
+            resource["snippet"] = {"title": account.channel_title, "description": ""}
+        if "contentDetails" in parts:
+            resource["contentDetails"] = {"relatedPlaylists": {"uploads": "UU" + account.channel_id[2:], "likes": "LL"}}
+        if "statistics" in parts:
+            resource["statistics"] = {"videoCount": "0", "subscriberCount": "0", "viewCount": "0"}
+        resource["etag"] = make_etag(resource)
+        channels = [resource] if mine else []
+        return self.page("youtube#channelListResponse", "channels", len(channels), query, lambda i: channels[i])
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    server: "FakeApiServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        logging.getLogger().debug(format, *args)
+
+    def send_json(self, status: int, data: Any, etag: str | None = None) -> None:
+        payload = b"" if data is None else json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def dispatch(self, http_method: str) -> None:
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        api = self.server.api
+        if url.path == "/fake/stats":
+            self.send_json(200, api.stats())
+            return
+        if url.path == "/fake/reset":
+            api.reset()
+            self.send_json(200, api.stats())
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        try:
+            if not url.path.startswith(API_PREFIX):
+                raise FakeApiError(404, "notFound", f"Unknown path [{url.path}]")
+            data = api.handle(http_method, url.path[len(API_PREFIX):], query, body)
+        except FakeApiError as e:
+            self.send_json(e.status, e.body())
+            return
+        if data is None:
+            self.send_json(204, None)
+            return
+        etag = data["etag"]
+        if http_method == "GET" and self.headers.get("If-None-Match") == etag:
+            self.send_json(304, None, etag)
+            return
+        self.send_json(200, data, etag)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self.dispatch("POST")
+
+    def do_PUT(self) -> None:  # pylint: disable=invalid-name
+        self.dispatch("PUT")
+
+    def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+        self.dispatch("DELETE")
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, api: FakeYouTube, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), FakeApiHandler)
+        self.api = api
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/"
+
+    def start(self) -> threading.Thread:
+        """ serve from a background thread (for tests); stop with shutdown() """
+        thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,26 @@
+"""
+fileio.py
+
+Writing the state files of pytubekit.
+
+History manifests and chunks, sketches, plan journals, seen sets, crawl
+watermarks, availability caches, download queues and OAuth tokens are all
+replaced whole: the data goes to a temporary file in the same
+folder which is then renamed over the old one, so a crash or a concurrent
+reader never sees a partial file.
+"""
+import os
+import tempfile
+
+
+def write_atomically(path: str, data: bytes) -> None:
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
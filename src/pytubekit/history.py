@@ -0,0 +1,217 @@
+"""
+history.py
+
+A content addressed, deduplicated store of playlist snapshots.
+
+Instead of one complete dump folder per run, every snapshot is kept as a small
+manifest listing, for each playlist, the chunks its video ids were cut into.
+Chunks are stored once under the sha256 of their content, so a playlist that did
+not change between snapshots costs nothing but its manifest entry, and one that
+changed a little only costs the chunks around the change: chunk boundaries are
+chosen by the content (after every id whose hash hits a mask) and not by
+position, so an insertion or deletion does not shift every chunk after it.
+
+Layout of a store:
+
+    objects/ab/cdef...            one video id per line
+    manifests/TIME-DIGEST.json    {"time": ..., "playlists": {title: {"id": ..., "count": ..., "chunks": [...]}}}
+
+Objects are written before the manifest that refers to them and both are written
+atomically, so an interrupted save leaves no broken snapshot behind.
+"""
+import bisect
+import datetime
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from pytubekit.fileio import write_atomically
+
+# a chunk ends after an id whose hash has these bits set (about 64 ids per chunk)...
+CHUNK_MASK = 0x3F
+# ...or when it reaches this many ids
+MAX_CHUNK = 256
+
+ADDED = "+"
+REMOVED = "-"
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    time: int
+    name: str
+
+
+@dataclass(frozen=True)
+class Change:
+    playlist: str
+    video_id: str
+    kind: str
+
+
+@dataclass(frozen=True)
+class SaveResult:
+    snapshot: Snapshot
+    chunks: int
+    new_chunks: int
+
+
+def chunk_ids(video_ids: list[str]) -> list[list[str]]:
+    chunks: list[list[str]] = []
+    current: list[str] = []
+    for video_id in video_ids:
+        current.append(video_id)
+        boundary = int.from_bytes(hashlib.blake2b(video_id.encode(), digest_size=4).digest(), "big") & CHUNK_MASK
+        if boundary == CHUNK_MASK or len(current) >= MAX_CHUNK:
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def sorted_merge_changes(playlist: str, before: list[str], after: list[str]) -> Iterator[Change]:
+    """ videos removed from and added to the playlist, counting repeats, by one merge of the sorted lists """
+    old = sorted(before)
+    new = sorted(after)
+    i = j = 0
+    while i < len(old) or j < len(new):
+        if j == len(new) or (i < len(old) and old[i] < new[j]):
+            yield Change(playlist, old[i], REMOVED)
+            i += 1
+        elif i == len(old) or new[j] < old[i]:
+            yield Change(playlist, new[j], ADDED)
+            j += 1
+        else:
+            i += 1
+            j += 1
+
+
+def parse_time(value: str) -> int:
+    """ seconds since the epoch, or an ISO date (meaning the end of that day) or date and time, in local time """
+    if value.isdigit():
+        return int(value)
+    if len(value) == 10:
+        day = datetime.date.fromisoformat(value)
+        end = datetime.datetime.combine(day, datetime.time.max)
+        return int(end.timestamp())
+    return int(datetime.datetime.fromisoformat(value).timestamp())
+
+
+def format_time(value: int) -> str:
+    return datetime.datetime.fromtimestamp(value).isoformat(sep=" ", timespec="seconds")
+
+
+class HistoryStore:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.manifests = os.path.join(root, "manifests")
+        # chunk contents never change, so they are kept once read
+        self.chunk_cache: dict[str, list[str]] = {}
+
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def put_chunk(self, video_ids: list[str]) -> tuple[str, bool]:
+        """ store a chunk; returns its digest and whether it was new """
+        data = "".join(f"{video_id}\n" for video_id in video_ids).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        write_atomically(path, data)
+        return digest, True
+
+    def get_chunk(self, digest: str) -> list[str]:
+        if digest not in self.chunk_cache:
+            with open(self.chunk_path(digest)) as f:
+                self.chunk_cache[digest] = f.read().split()
+        return self.chunk_cache[digest]
+
+    def save(self, time: int, playlists: dict[str, tuple[str, list[str]]]) -> SaveResult:
+        """ store a snapshot of playlists (title -> (playlist id, video ids)) taken at time """
+        entries = {}
+        chunks = 0
+        new_chunks = 0
+        for title, (playlist_id, video_ids) in sorted(playlists.items()):
+            digests = []
+            for chunk in chunk_ids(video_ids):
+                digest, new = self.put_chunk(chunk)
+                digests.append(digest)
+                chunks += 1
+                new_chunks += new
+            entries[title] = {"id": playlist_id, "count": len(video_ids), "chunks": digests}
+        data = json.dumps({"time": time, "playlists": entries}, indent=1, sort_keys=True).encode()
+        name = f"{time:012d}-{hashlib.sha256(data).hexdigest()[:12]}"
+        write_atomically(os.path.join(self.manifests, f"{name}.json"), data)
+        return SaveResult(Snapshot(time, name), chunks, new_chunks)
+
+    def snapshots(self) -> list[Snapshot]:
+        """ all snapshots, oldest first """
+        if not os.path.isdir(self.manifests):
+            return []
+        names = sorted(filename[:-len(".json")] for filename in os.listdir(self.manifests) if filename.endswith(".json"))
+        return [Snapshot(int(name.split("-")[0]), name) for name in names]
+
+    def manifest(self, snapshot: Snapshot) -> dict[str, dict]:
+        with open(os.path.join(self.manifests, f"{snapshot.name}.json")) as f:
+            return json.load(f)["playlists"]
+
+    def load(self, snapshot: Snapshot, titles: list[str] | None = None) -> dict[str, list[str]]:
+        """ title -> video ids of the snapshot (only of titles, if given) """
+        result: dict[str, list[str]] = {}
+        for title, entry in self.manifest(snapshot).items():
+            if titles and title not in titles:
+                continue
+            result[title] = [video_id for digest in entry["chunks"] for video_id in self.get_chunk(digest)]
+        return result
+
+    def as_of(self, time: int) -> Snapshot | None:
+        """ the latest snapshot taken at or before time """
+        snapshots = self.snapshots()
+        index = bisect.bisect_right([snapshot.time for snapshot in snapshots], time)
+        return snapshots[index - 1] if index > 0 else None
+
+    def changes(self, before: Snapshot, after: Snapshot) -> Iterator[Change]:
+        """ what was removed and added between two snapshots; playlists with the same chunks are skipped unread """
+        old = self.manifest(before)
+        new = self.manifest(after)
+        for title in sorted(set(old) | set(new)):
+            old_chunks = old.get(title, {}).get("chunks", [])
+            new_chunks = new.get(title, {}).get("chunks", [])
+            if old_chunks == new_chunks:
+                continue
+            old_ids = [video_id for digest in old_chunks for video_id in self.get_chunk(digest)]
+            new_ids = [video_id for digest in new_chunks for video_id in self.get_chunk(digest)]
+            yield from sorted_merge_changes(title, old_ids, new_ids)
+
+    def timeline(self, video_id: str) -> Iterator[tuple[Snapshot, Change]]:
+        """ every snapshot in which video_id entered or left a playlist, with the change """
+        # a chunk is checked for the video once however many snapshots share it
+        holds: dict[str, bool] = {}
+        present: set[str] = set()
+        for snapshot in self.snapshots():
+            now: set[str] = set()
+            for title, entry in self.manifest(snapshot).items():
+                for digest in entry["chunks"]:
+                    if digest not in holds:
+                        holds[digest] = video_id in self.get_chunk(digest)
+                    if holds[digest]:
+                        now.add(title)
+                        break
+            for title in sorted(now - present):
+                yield snapshot, Change(title, video_id, ADDED)
+            for title in sorted(present - now):
+                yield snapshot, Change(title, video_id, REMOVED)
+            present = now
+
+
+def read_dump_folder_time(folder: str) -> int:
+    """ the time of a dump folder: its name when it is a $date substitution, else its modification time """
+    name = os.path.basename(os.path.normpath(folder))
+    if name.isdigit():
+        return int(name)
+    return int(os.path.getmtime(folder))
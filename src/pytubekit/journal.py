@@ -0,0 +1,100 @@
+"""
+journal.py
+
+Plans which survive interruptions.
+
+Moving thousands of videos between playlists takes days of quota, so such a
+plan is written to a file before it is executed and the index of every operation
+is appended to a journal next to it (the file name plus .done) as soon as the
+operation is done. A run stopped by a crash, ctrl-c or quotaExceeded is resumed
+by the next one from the first operation not done, without listing or planning
+anything again. An operation which was done but not journaled (the run stopped
+in between) is executed again: a delete then finds its item gone (404), which
+counts as done, and an insert adds its video once more.
+
+Both files are removed when the plan is complete.
+"""
+import json
+import logging
+import os
+from collections.abc import Callable
+from dataclasses import asdict
+from typing import Any
+
+from googleapiclient.errors import HttpError
+
+from pytubekit.cache import CACHE, Cache
+from pytubekit.fileio import write_atomically
+from pytubekit.planner import DELETE, Operation, Plan
+from pytubekit.progress import Progress, create_progress
+from pytubekit.util import execute_operation
+
+NOT_FOUND = 404
+JOURNAL_SUFFIX = ".done"
+
+
+class PlanFile:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def write(self, plan: Plan) -> None:
+        data = {
+            "label": plan.label,
+            "titles": plan.titles,
+            "operations": [asdict(operation) for operation in plan.operations],
+        }
+        write_atomically(self.path, json.dumps(data).encode())
+        if os.path.isfile(self.journal_path):
+            os.unlink(self.journal_path)
+
+    def read(self) -> tuple[Plan, set[int]]:
+        """ the plan and the indices of its operations done so far """
+        with open(self.path) as f:
+            data = json.load(f)
+        plan = Plan(data["label"])
+        plan.titles = data["titles"]
+        plan.operations = [Operation(**operation) for operation in data["operations"]]
+        done: set[int] = set()
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path) as f:
+                # a line cut short by the interruption is ignored
+                done = {int(line) for line in f if line.endswith("\n")}
+        return plan, done
+
+    def remove(self) -> None:
+        for path in (self.journal_path, self.path):
+            if os.path.isfile(path):
+                os.unlink(path)
+
+
+def execute_plan_file(
+    youtube: Any,
+    plan_file: PlanFile,
+    *,
+    cache: Cache = CACHE,
+    progress_factory: Callable[[int, str], Progress] = create_progress,
+) -> int:
+    """ execute the operations of the plan in plan_file not done yet, journaling each; returns how many were executed """
+    logger = logging.getLogger()
+    plan, done = plan_file.read()
+    pending = [i for i in range(len(plan.operations)) if i not in done]
+    if done:
+        logger.info(f"plan [{plan.label}]: resuming, {len(done)} operations done, {len(pending)} left")
+    progress = progress_factory(len(pending), plan.label)
+    with open(plan_file.journal_path, "a") as journal:
+        for i in pending:
+            operation = plan.operations[i]
+            try:
+                execute_operation(youtube, operation, cache)
+            except HttpError as e:
+                if operation.kind != DELETE or e.resp.status != NOT_FOUND:
+                    raise
+                logger.info(f"playlist item [{operation.item_id}] already deleted")
+            print(i, file=journal, flush=True)
+            progress.advance(quota=operation.cost())
+    plan_file.remove()
+    return len(pending)
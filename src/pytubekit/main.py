@@ -2,244 +2,194 @@
 main entry point to the program
 """
 import csv
+import json
 import logging
 import os
-from typing import Any
 import pathlib
-import re
 import string
+import sys
 import time
+from collections.abc import Callable
+from typing import Any
 
 import pylogconf.core
 from pygooglehelper import register_functions, ConfigRequest
 from pytconf import register_main, config_arg_parse_and_launch, register_endpoint
+from pytconf.config import get_pytconf
 
 from pytubekit.configs import ConfigPlaylist, ConfigPagination, ConfigCleanup, ConfigVideo, \
     ConfigPrint, ConfigDump, ConfigSubtract, ConfigDelete, ConfigDiff, ConfigAddData, ConfigOverflow, \
     ConfigCleanupPlaylists, ConfigClear, ConfigMerge, ConfigSort, ConfigSearch, \
     ConfigExportCsv, ConfigRename, ConfigCollectIds, ConfigAddFileToPlaylist, \
     ConfigCreatePlaylist, ConfigDeletePlaylist, ConfigFindVideo, \
-    ConfigLocalDumpFolder, ConfigLocalDiff, ConfigStatsFilter, ConfigChannelId
+    ConfigLocalDumpFolder, ConfigLocalDiff, ConfigStatsFilter, ConfigChannelId, ConfigQuota, \
+    ConfigBenchmark, ConfigFakeApi, ConfigInsert, ConfigServe, ConfigRun, ConfigSync, \
+    ConfigHistory, ConfigHistorySave, ConfigHistoryShow, ConfigHistoryChanges, ConfigHistoryTimeline, ConfigSketch, \
+    ConfigItemSource, ConfigDownload, ConfigOutputFormat, ConfigCrawl, ConfigSeen, ConfigSeenAdd, ConfigLeftToSee, \
+    ConfigSpill, ConfigShards, ConfigQueue, ConfigQueueFill, ConfigQueueWork, ConfigQueueMerge
+from pytubekit.api import Client
+from pytubekit.availability import AvailabilityCache
+from pytubekit.batch import read_script, run_steps
+from pytubekit.benchmark import synthetic_account, load_fixture, run_benchmarks, compare_to_baseline
+from pytubekit.cache import CACHE
+from pytubekit.columnar import COLUMNAR_FORMATS, EXPORT_COLUMNS, ColumnarWriter, read_table
+from pytubekit.crawler import WatermarkStore
+from pytubekit.fakeapi import FakeAccount, FakeYouTube, FakeApiServer
+from pytubekit.history import HistoryStore, Snapshot, parse_time, format_time, read_dump_folder_time
 from pytubekit.constants import SCOPES, MAX_PLAYLIST_ITEMS
+from pytubekit.metadata import MetadataCache, parse_sort_keys
+from pytubekit.seen import SeenSet
+from pytubekit.serve import run_daemon
+from pytubekit.sources import YTDLP_SOURCE, YtDlpSource
+from pytubekit.sketch import merged_sketch, exact_counts, list_dump_files
 from pytubekit.static import DESCRIPTION, APP_NAME, VERSION_STR
-from pytubekit.util import create_playlists_request, get_youtube, create_playlist_request, get_all_items, \
-    delete_playlist_item_by_id, get_playlist_ids_from_names, get_all_items_from_playlist_ids, \
-    get_video_info, pretty_print, get_youtube_channels, get_youtube_playlists, get_my_playlists_ids, \
-    read_video_ids_from_files, get_video_ids_from_playlist_names, \
-    get_items_from_playlist_names, get_video_metadata, METADATA_FIELDNAMES, \
-    add_video_to_playlist, get_playlist_item_count, log_progress, retry_execute, cleanup_items, \
-    read_all_dump_files, read_video_ids_from_path
+from pytubekit.profiling import profiled
+from pytubekit.progress import create_progress
+from pytubekit.tracing import traced
+from pytubekit.workqueue import WorkQueue, merge_queue, run_worker
+from pytubekit.util import get_youtube, get_cli_shard_set, pretty_print, get_youtube_channels, \
+    get_youtube_playlists, read_video_ids_from_files, read_video_ids_in_order, METADATA_FIELDNAMES, retry_execute, \
+    read_all_dump_files, compute_local_diff, find_dump_duplicates, collect_ids_from_files
 from pytubekit.youtube import youtube_dl_download_urls
 
 
+def make_client() -> Client:
+    """
+    a Client configured from the command line options; reading from the API it shares the process wide
+    cache (serve, run), which holds API resources only
+    """
+    source = None
+    if ConfigItemSource.item_source == YTDLP_SOURCE:
+        source = YtDlpSource(ConfigItemSource.ytdlp_cookies_from_browser, ConfigItemSource.ytdlp_cookie_file)
+    return Client(
+        client_factory=get_youtube,
+        page_size=ConfigPagination.page_size,
+        cache=CACHE if source is None else None,
+        # every shard brings its own daily quota
+        budget=ConfigQuota.quota_budget * max(len(ConfigShards.shards), 1),
+        dry_run=not ConfigDelete.do_delete,
+        insert_window=ConfigInsert.insert_window,
+        progress_factory=create_progress,
+        source=source,
+    )
+
+
 @register_endpoint(
     description="Show channel ID (or Watch Later playlist ID with --watch-later)",
     configs=[ConfigChannelId],
 )
 def get_channel_id() -> None:
-    youtube = get_youtube()
-    channels_obj = get_youtube_channels(youtube)
-    request = channels_obj.list(
-        part="id",
-        mine=True
-    )
-    response = retry_execute(request)
-    channel_id = response["items"][0]["id"]
-    if ConfigChannelId.watch_later:
-        print(channel_id[0] + "L" + channel_id[2:])
-    else:
-        print(channel_id)
+    print(make_client().channel_id(watch_later=ConfigChannelId.watch_later))
 
 
 @register_endpoint(
     description="List all entries in a playlist",
-    configs=[ConfigPagination, ConfigPlaylist, ConfigPrint],
+    configs=[ConfigPagination, ConfigPlaylist, ConfigPrint, ConfigItemSource],
 )
 def playlist() -> None:
-    youtube = get_youtube()
-    items = get_all_items(youtube)
-    for item in items:
+    for item in make_client().items(name=ConfigPlaylist.name, playlist_id=ConfigPlaylist.playlist_id, raw=ConfigPrint.full):
         if ConfigPrint.full:
-            pretty_print(item)
+            pretty_print(item.raw)
         else:
-            f_video_id = item["snippet"]["resourceId"]["videoId"]
-            print(f"{f_video_id}")
+            print(item.video_id)
 
 
 @register_endpoint(
     description="Dump all playlists",
-    configs=[ConfigPagination, ConfigPrint, ConfigDump],
+    configs=[ConfigPagination, ConfigPrint, ConfigDump, ConfigItemSource, ConfigOutputFormat],
 )
 def dump() -> None:
-    logger = logging.getLogger()
     sub_dict = {
         "date": int(time.time()),
         "home": os.path.expanduser("~"),
     }
     dump_folder = string.Template(ConfigDump.dump_folder).substitute(sub_dict)
     pathlib.Path(dump_folder).mkdir(parents=True, exist_ok=True)
-
-    youtube = get_youtube()
-    r = create_playlists_request(youtube)
-    items = r.get_all_items()
-    id_to_title = {}
-    for item in items:
-        f_id = item["id"]
-        f_title = item["snippet"]["title"]
-        id_to_title[f_id] = f_title
-    logger.info("got lists data")
-    for f_id, f_title in id_to_title.items():
-        filename = os.path.join(dump_folder, f_title)
-        logger.info(f"dumping [{f_title}] to [{filename}]")
-        with open(filename, "w") as f:
-            r = create_playlist_request(youtube, playlist_id=f_id)
-            items = r.get_all_items()
-            for item in items:
-                f_video_id = item["snippet"]["resourceId"]["videoId"]
-                if ConfigPrint.full:
-                    pretty_print(item, fp=f)
-                else:
-                    print(f"{f_video_id}", file=f)
+    make_client().dump(
+        dump_folder,
+        full=ConfigPrint.full,
+        output_format=ConfigOutputFormat.output_format,
+        jsonl=ConfigDump.dump_jsonl,
+        compression=ConfigDump.dump_compression,
+    )
 
 
 @register_endpoint(
     description="Clean up playlists (dedup, remove deleted, remove privatized)",
-    configs=[ConfigPagination, ConfigCleanupPlaylists, ConfigCleanup, ConfigDelete],
+    configs=[ConfigPagination, ConfigCleanupPlaylists, ConfigCleanup, ConfigDelete, ConfigQuota],
 )
 def cleanup() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
     if ConfigCleanupPlaylists.cleanup_names:
         logger.info(f"cleaning up [{ConfigCleanupPlaylists.cleanup_names}]...")
-        playlist_ids = get_playlist_ids_from_names(youtube, ConfigCleanupPlaylists.cleanup_names)
     else:
         logger.info("cleaning up all playlists...")
-        playlist_ids = get_my_playlists_ids(youtube)
-    items = get_all_items_from_playlist_ids(youtube, playlist_ids)
-    cleanup_items(
-        youtube, items,
+    result = make_client().cleanup(
+        ConfigCleanupPlaylists.cleanup_names,
         dedup=ConfigCleanup.dedup,
-        check_deleted=ConfigCleanup.deleted,
-        check_privatized=ConfigCleanup.privatized,
-        do_delete=ConfigDelete.do_delete,
+        deleted=ConfigCleanup.deleted,
+        privatized=ConfigCleanup.privatized,
+        availability=ConfigCleanup.availability,
+        region=ConfigCleanup.availability_region,
+        availability_cache=AvailabilityCache(
+            os.path.expanduser(ConfigCleanup.availability_cache), ConfigCleanup.availability_ttl,
+        ),
     )
+    logger.info(f"deleted {result.done} items")
 
 
 @register_endpoint(
     description="Remove videos from A playlists that exist in B playlists (A = A - B)",
-    configs=[ConfigPagination, ConfigSubtract, ConfigDelete],
+    configs=[ConfigPagination, ConfigSubtract, ConfigDelete, ConfigQuota],
 )
 def subtract() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
     logger.info(f"subtracting [{ConfigSubtract.subtract_what}] from [{ConfigSubtract.subtract_from}]...")
-    what_video_ids = get_video_ids_from_playlist_names(youtube, ConfigSubtract.subtract_what)
-    from_items = get_items_from_playlist_names(youtube, ConfigSubtract.subtract_from)
-    deleted = 0
-    wanted_to_delete = 0
-    total = len(from_items)
-    for i, item in enumerate(from_items, start=1):
-        log_progress(logger, i, total)
-        video_id = item["snippet"]["resourceId"]["videoId"]
-        if video_id in what_video_ids:
-            wanted_to_delete += 1
-            if ConfigDelete.do_delete:
-                delete_playlist_item_by_id(youtube, item["id"])
-                deleted += 1
-    logger.info(f"wanted_to_delete {wanted_to_delete} items")
-    logger.info(f"deleted {deleted} items")
+    result = make_client().subtract(ConfigSubtract.subtract_what, ConfigSubtract.subtract_from)
+    logger.info(f"wanted_to_delete {len(result.plan.operations)} items")
+    logger.info(f"deleted {result.done} items")
 
 
 @register_endpoint(
     description="Delete all items from a playlist",
-    configs=[ConfigPagination, ConfigClear, ConfigDelete],
+    configs=[ConfigPagination, ConfigClear, ConfigDelete, ConfigQuota],
 )
 def clear_playlist() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigClear.clear_name])[0]
-    items = get_all_items_from_playlist_ids(youtube, [playlist_id])
-    logger.info(f"playlist [{ConfigClear.clear_name}] has {len(items)} items")
-    deleted = 0
-    total = len(items)
-    for i, item in enumerate(items, start=1):
-        log_progress(logger, i, total)
-        if ConfigDelete.do_delete:
-            delete_playlist_item_by_id(youtube, item["id"])
-            deleted += 1
-    logger.info(f"deleted {deleted} items from [{ConfigClear.clear_name}]")
+    result = make_client().clear(ConfigClear.clear_name)
+    logger.info(f"deleted {result.done} items from [{ConfigClear.clear_name}]")
 
 
 @register_endpoint(
     description="Merge/copy playlists into a destination playlist",
-    configs=[ConfigPagination, ConfigMerge],
+    configs=[ConfigPagination, ConfigMerge, ConfigDelete, ConfigQuota, ConfigInsert],
 )
 def merge() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    all_names = ConfigMerge.merge_sources + [ConfigMerge.merge_destination]
-    all_ids = get_playlist_ids_from_names(youtube, all_names)
-    source_ids = all_ids[:-1]
-    destination_id = all_ids[-1]
-    seen: set[str] = set()
-    if ConfigMerge.merge_dedup:
-        dest_items = get_all_items_from_playlist_ids(youtube, [destination_id])
-        seen = {item["snippet"]["resourceId"]["videoId"] for item in dest_items}
-        logger.info(f"destination [{ConfigMerge.merge_destination}] already has {len(seen)} videos")
-    source_items = get_all_items_from_playlist_ids(youtube, source_ids)
-    logger.info(f"source playlists have {len(source_items)} items total")
-    added = 0
-    skipped = 0
-    total = len(source_items)
-    for i, item in enumerate(source_items, start=1):
-        log_progress(logger, i, total)
-        video_id = item["snippet"]["resourceId"]["videoId"]
-        if ConfigMerge.merge_dedup and video_id in seen:
-            skipped += 1
-            continue
-        add_video_to_playlist(youtube, destination_id, video_id)
-        if ConfigMerge.merge_dedup:
-            seen.add(video_id)
-        added += 1
+    result = make_client().merge(ConfigMerge.merge_sources, ConfigMerge.merge_destination, dedup=ConfigMerge.merge_dedup)
     if ConfigMerge.merge_dedup:
-        logger.info(f"added {added} videos, skipped {skipped} duplicates")
+        logger.info(f"added {result.done} videos")
     else:
-        logger.info(f"copied {added} videos")
-
-
-SORT_KEYS = {
-    "title": lambda item: item["snippet"].get("title", "").lower(),
-    "channel": lambda item: item["snippet"].get("videoOwnerChannelTitle", "").lower(),
-    "date": lambda item: item["snippet"].get("publishedAt", ""),
-}
+        logger.info(f"copied {result.done} videos")
 
 
 @register_endpoint(
-    description="Sort a playlist by title, channel, or date (deletes and re-adds all items)",
-    configs=[ConfigPagination, ConfigSort],
+    description="Sort a playlist by title, channel, date, duration, upload date, views or likes (deletes and re-adds all items)",
+    configs=[ConfigPagination, ConfigSort, ConfigDelete, ConfigQuota],
 )
 def sort_playlist() -> None:
     logger = logging.getLogger()
-    if ConfigSort.sort_key not in SORT_KEYS:
-        logger.error(f"invalid sort key [{ConfigSort.sort_key}], must be one of {list(SORT_KEYS.keys())}")
+    try:
+        parse_sort_keys(ConfigSort.sort_key)
+    except ValueError as e:
+        logger.error(e)
         return
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigSort.sort_playlist_name])[0]
-    items = get_all_items_from_playlist_ids(youtube, [playlist_id])
-    logger.info(f"playlist [{ConfigSort.sort_playlist_name}] has {len(items)} items")
-    sorted_items = sorted(items, key=SORT_KEYS[ConfigSort.sort_key])
-    total = len(items)
-    for i, item in enumerate(items, start=1):
-        delete_playlist_item_by_id(youtube, item["id"])
-        log_progress(logger, i, total)
-    logger.info(f"deleted {total} items")
-    added = 0
-    for item in sorted_items:
-        video_id = item["snippet"]["resourceId"]["videoId"]
-        add_video_to_playlist(youtube, playlist_id, video_id)
-        added += 1
-        log_progress(logger, added, total)
-    logger.info(f"re-added {added} items in sorted order (by {ConfigSort.sort_key})")
+    result = make_client().sort(
+        ConfigSort.sort_playlist_name,
+        ConfigSort.sort_key,
+        metadata_cache=MetadataCache(os.path.expanduser(ConfigSort.sort_metadata_cache), ConfigSort.sort_metadata_ttl),
+    )
+    logger.info(f"deleted and re-added {result.done // 2} items in sorted order (by {ConfigSort.sort_key})")
 
 
 @register_endpoint(
@@ -257,125 +207,90 @@ def search_playlist() -> None:
                     print(f"{filename}:{lineno}: {line}")
     else:
         # API mode: search YouTube playlists
-        youtube = get_youtube()
-        playlist_ids = get_playlist_ids_from_names(youtube, ConfigSearch.search_playlists)
-        items = get_all_items_from_playlist_ids(youtube, playlist_ids)
-        for item in items:
-            title = item["snippet"].get("title", "")
-            channel = item["snippet"].get("videoOwnerChannelTitle", "")
-            if query in title.lower() or query in channel.lower():
-                video_id = item["snippet"]["resourceId"]["videoId"]
-                print(f"{video_id}  {title}  [{channel}]")
+        for item in make_client().search(query, ConfigSearch.search_playlists):
+            print(f"{item.video_id}  {item.title}  [{item.channel}]")
 
 
 @register_endpoint(
     description="Export a playlist to CSV with video ID, title, channel, and position",
-    configs=[ConfigPagination, ConfigExportCsv],
+    configs=[ConfigPagination, ConfigExportCsv, ConfigOutputFormat],
 )
 def export_csv() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigExportCsv.export_playlist_name])[0]
-    items = get_all_items_from_playlist_ids(youtube, [playlist_id])
-    fieldnames = ["position", "video_id", "title", "channel"]
-    with open(str(ConfigExportCsv.export_csv_path), "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for position, item in enumerate(items, start=1):
-            writer.writerow({
-                "position": position,
-                "video_id": item["snippet"]["resourceId"]["videoId"],
-                "title": item["snippet"].get("title", ""),
-                "channel": item["snippet"].get("videoOwnerChannelTitle", ""),
-            })
+    items = list(make_client().items(name=ConfigExportCsv.export_playlist_name))
+    rows = [
+        {"position": position, "video_id": item.video_id, "title": item.title, "channel": item.channel}
+        for position, item in enumerate(items, start=1)
+    ]
+    if ConfigOutputFormat.output_format in COLUMNAR_FORMATS:
+        with ColumnarWriter(str(ConfigExportCsv.export_csv_path), ConfigOutputFormat.output_format, EXPORT_COLUMNS) as columnar_writer:
+            for row in rows:
+                columnar_writer.write(row)
+    else:
+        with open(str(ConfigExportCsv.export_csv_path), "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
     logger.info(f"exported {len(items)} items to [{ConfigExportCsv.export_csv_path}]")
 
 
 @register_endpoint(
     description="Rename a playlist",
-    configs=[ConfigRename],
+    configs=[ConfigRename, ConfigDelete, ConfigQuota],
 )
 def rename_playlist() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigRename.rename_playlist_name])[0]
-    request = youtube.playlists().update(
-        part="snippet",
-        body={
-            "id": playlist_id,
-            "snippet": {
-                "title": str(ConfigRename.rename_new_name),
-            },
-        },
-    )
-    retry_execute(request)
-    logger.info(f"renamed [{ConfigRename.rename_playlist_name}] to [{ConfigRename.rename_new_name}]")
+    if make_client().rename(ConfigRename.rename_playlist_name, str(ConfigRename.rename_new_name)).done:
+        logger.info(f"renamed [{ConfigRename.rename_playlist_name}] to [{ConfigRename.rename_new_name}]")
 
 
 @register_endpoint(
     description=f"Move videos from source playlist to destination playlist respecting the {MAX_PLAYLIST_ITEMS} limit",
-    configs=[ConfigPagination, ConfigOverflow, ConfigDelete],
+    configs=[ConfigPagination, ConfigOverflow, ConfigDelete, ConfigQuota, ConfigInsert],
 )
 def overflow() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    source_id, destination_id = get_playlist_ids_from_names(
-        youtube, [ConfigOverflow.source, ConfigOverflow.destination],
-    )
-    destination_count = get_playlist_item_count(youtube, destination_id)
-    available = MAX_PLAYLIST_ITEMS - destination_count
-    logger.info(f"destination has {destination_count} items, {available} slots available")
-    if available <= 0:
-        logger.info("destination playlist is full, nothing to move")
-        return
-    source_items = get_all_items_from_playlist_ids(youtube, [source_id])
-    logger.info(f"source has {len(source_items)} items")
-    moved = 0
-    to_move = min(available, len(source_items))
-    logger.info(f"would move {to_move} videos")
-    for item in source_items:
-        if moved >= available:
-            break
-        if ConfigDelete.do_delete:
-            video_id = item["snippet"]["resourceId"]["videoId"]
-            add_video_to_playlist(youtube, destination_id, video_id)
-            delete_playlist_item_by_id(youtube, item["id"])
-        moved += 1
-        log_progress(logger, moved, to_move)
-    if ConfigDelete.do_delete:
-        logger.info(f"moved {moved} videos from [{ConfigOverflow.source}] to [{ConfigOverflow.destination}]")
+    result = make_client().overflow(ConfigOverflow.source, ConfigOverflow.destination)
+    to_move = result.plan.counts().get("delete", 0)
+    if result.executed:
+        logger.info(f"moved {to_move} videos from [{ConfigOverflow.source}] to [{ConfigOverflow.destination}]")
     else:
-        logger.info(f"dry run: would move {moved} videos from [{ConfigOverflow.source}] to [{ConfigOverflow.destination}]")
+        logger.info(f"dry run: would move {to_move} videos from [{ConfigOverflow.source}] to [{ConfigOverflow.destination}]")
 
 
-def get_video_ids_from_sources(
-    youtube: Any,
-    playlists: list[str],
-    files: list[str],
-) -> set[str]:
-    ids: set[str] = set()
-    if playlists:
-        ids.update(get_video_ids_from_playlist_names(youtube, playlists))
-    if files:
-        ids.update(read_video_ids_from_files(files))
-    return ids
+@register_endpoint(
+    description="Move videos from a source playlist into a chain of destination playlists, resumably",
+    configs=[ConfigPagination, ConfigSpill, ConfigDelete, ConfigQuota],
+)
+def overflow_chain() -> None:
+    logger = logging.getLogger()
+    result = make_client().spill(
+        ConfigSpill.spill_source,
+        ConfigSpill.spill_destinations,
+        pattern=ConfigSpill.spill_destination_glob,
+        packing=ConfigSpill.spill_packing,
+        plan_path=os.path.expanduser(ConfigSpill.spill_plan),
+    )
+    moves = result.plan.counts().get("insert", 0)
+    if result.executed:
+        logger.info(f"executed [{result.done}] operations of a plan moving {moves} videos")
+    else:
+        logger.info(f"dry run: would move {moves} videos")
 
 
 @register_endpoint(
     description="Compute set difference (A-B) or intersection (A&B) between video ID sources",
-    configs=[ConfigPagination, ConfigDiff],
+    configs=[ConfigPagination, ConfigDiff, ConfigItemSource],
 )
 def diff() -> None:
     logger = logging.getLogger()
-    need_youtube = ConfigDiff.diff_a_playlists or ConfigDiff.diff_b_playlists
-    youtube = get_youtube() if need_youtube else None
-    ids_a = get_video_ids_from_sources(youtube, ConfigDiff.diff_a_playlists, ConfigDiff.diff_a_files)
-    ids_b = get_video_ids_from_sources(youtube, ConfigDiff.diff_b_playlists, ConfigDiff.diff_b_files)
-    if ConfigDiff.diff_reverse:
-        result_ids = sorted(ids_a & ids_b)
-    else:
-        result_ids = sorted(ids_a - ids_b)
-    logger.info(f"A has {len(ids_a)}, B has {len(ids_b)}, result has {len(result_ids)}")
+    result_ids = make_client().diff(
+        ConfigDiff.diff_a_playlists,
+        ConfigDiff.diff_b_playlists,
+        ConfigDiff.diff_a_files,
+        ConfigDiff.diff_b_files,
+        reverse=ConfigDiff.diff_reverse,
+    )
     if ConfigDiff.diff_output_file:
         with open(ConfigDiff.diff_output_file, "w") as f:
             for video_id in result_ids:
@@ -388,57 +303,123 @@ def diff() -> None:
 
 @register_endpoint(
     description="Fetch extensive metadata for video IDs and write to CSV (supports resume)",
-    configs=[ConfigAddData],
+    configs=[ConfigAddData, ConfigOutputFormat],
 )
 def add_data() -> None:
     logger = logging.getLogger()
     input_path = ConfigAddData.input_file
     output_path = ConfigAddData.output_csv
+    output_format = ConfigOutputFormat.output_format
     processed_ids: set[str] = set()
+    existing = None
     output_file_exists = os.path.exists(output_path)
     if output_file_exists:
         logger.info(f"Output file [{output_path}] found. Reading existing IDs to avoid re-processing.")
-        with open(output_path, encoding="utf-8", newline="") as f_out_read:
-            reader = csv.DictReader(f_out_read)
-            for row in reader:
-                if row and "video_id" in row:
-                    processed_ids.add(row["video_id"])
+        if output_format in COLUMNAR_FORMATS:
+            existing = read_table(output_path)
+            processed_ids.update(existing.column("video_id").to_pylist())
+        else:
+            with open(output_path, encoding="utf-8", newline="") as f_out_read:
+                reader = csv.DictReader(f_out_read)
+                for row in reader:
+                    if row and "video_id" in row:
+                        processed_ids.add(row["video_id"])
         logger.info(f"Found {len(processed_ids)} previously processed IDs.")
-    with open(input_path) as infile, open(output_path, "a", encoding="utf-8", newline="") as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=METADATA_FIELDNAMES)
-        if not output_file_exists:
-            writer.writeheader()
-            outfile.flush()
-        for line in infile:
-            video_id = line.strip()
-            if not video_id:
-                continue
-            if video_id in processed_ids:
-                logger.info(f"Skipping already processed ID: [{video_id}]")
-                continue
-            metadata = get_video_metadata(video_id)
-            if metadata:
-                writer.writerow(metadata)
-            else:
-                error_row = {field: "" for field in METADATA_FIELDNAMES}
-                error_row["video_id"] = video_id
-                error_row["title"] = "METADATA_NOT_FOUND"
-                writer.writerow(error_row)
-            outfile.flush()
+    video_ids = read_video_ids_in_order(input_path)
+    if output_format in COLUMNAR_FORMATS:
+        with ColumnarWriter(output_path, output_format, METADATA_FIELDNAMES) as columnar_writer:
+            if existing is not None:
+                columnar_writer.write_table(existing)
+            write_metadata(video_ids, processed_ids, columnar_writer.write)
+    else:
+        with open(output_path, "a", encoding="utf-8", newline="") as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=METADATA_FIELDNAMES)
+            if not output_file_exists:
+                writer.writeheader()
+                outfile.flush()
+
+            def write_row(row: dict[str, Any]) -> None:
+                writer.writerow(row)
+                outfile.flush()
+            write_metadata(video_ids, processed_ids, write_row)
     logger.info("Processing complete")
 
 
+def write_metadata(video_ids: list[str], processed_ids: set[str], write_row: Callable[[dict[str, Any]], None]) -> None:
+    logger = logging.getLogger()
+    progress = create_progress(len(video_ids), "add_data")
+    for video_id in video_ids:
+        progress.advance()
+        if video_id in processed_ids:
+            logger.info(f"Skipping already processed ID: [{video_id}]")
+            continue
+        write_row(metadata_row(video_id))
+
+
+def metadata_row(video_id: str) -> dict[str, Any]:
+    """ the metadata of a video, or a row saying it could not be fetched """
+    metadata = Client.video_metadata(video_id)
+    if metadata:
+        return metadata
+    error_row = {field: "" for field in METADATA_FIELDNAMES}
+    error_row["video_id"] = video_id
+    error_row["title"] = "METADATA_NOT_FOUND"
+    return error_row
+
+
+@register_endpoint(
+    description="Queue video IDs for add_data workers (IDs already queued are skipped)",
+    configs=[ConfigQueue, ConfigQueueFill],
+)
+def queue_fill() -> None:
+    logger = logging.getLogger()
+    video_ids: list[str] = []
+    for input_path in ConfigQueueFill.queue_input_files:
+        video_ids.extend(read_video_ids_in_order(input_path))
+    queue = WorkQueue(ConfigQueue.queue_file, ConfigQueue.queue_lease)
+    added = queue.fill(video_ids, ConfigQueueFill.queue_batch_size)
+    logger.info(f"queued {added} new video IDs of {len(video_ids)} in [{queue.path}]")
+
+
+@register_endpoint(
+    description="Fetch the metadata of queued video IDs, batch by batch, until the queue is done (run on any number of hosts)",
+    configs=[ConfigQueue, ConfigQueueWork],
+)
+def queue_work() -> None:
+    queue = WorkQueue(ConfigQueue.queue_file, ConfigQueue.queue_lease)
+    run_worker(queue, metadata_row, worker=ConfigQueueWork.queue_worker)
+
+
+@register_endpoint(
+    description="Show the batches of the work queue by state",
+    configs=[ConfigQueue],
+)
+def queue_status() -> None:
+    for key, value in WorkQueue(ConfigQueue.queue_file, ConfigQueue.queue_lease).status().items():
+        print(f"{key}: {value}")
+
+
+@register_endpoint(
+    description="Write the metadata of all the queued video IDs to one CSV, Parquet or Arrow file",
+    configs=[ConfigQueue, ConfigQueueMerge, ConfigOutputFormat],
+)
+def queue_merge() -> None:
+    logger = logging.getLogger()
+    queue = WorkQueue(ConfigQueue.queue_file, ConfigQueue.queue_lease)
+    status = queue.status()
+    batches, done = status["batches"], status["done"]
+    if done < batches:
+        logger.warning(f"{batches - done} of {batches} batches are not done yet, merging what is")
+    count = merge_queue(queue, ConfigQueueMerge.queue_output, ConfigOutputFormat.output_format)
+    logger.info(f"wrote {count} rows to [{ConfigQueueMerge.queue_output}]")
+
+
 @register_endpoint(
     description="Get info about a video",
     configs=[ConfigVideo],
 )
 def video_info() -> None:
-    youtube = get_youtube()
-    info = get_video_info(youtube, ConfigVideo.id)
-    pretty_print(info)
-
-
-YOUTUBE_ID_RE = re.compile(r"(?:youtu\.be/|youtube\.com/.*[?&]v=|^)([A-Za-z0-9_-]{11})(?:\s|$|&)")
+    pretty_print(make_client().video_info(ConfigVideo.id))
 
 
 @register_endpoint(
@@ -447,12 +428,7 @@ YOUTUBE_ID_RE = re.compile(r"(?:youtu\.be/|youtube\.com/.*[?&]v=|^)([A-Za-z0-9_-
 )
 def collect_ids() -> None:
     logger = logging.getLogger()
-    found: set[str] = set()
-    for file_path in ConfigCollectIds.collect_files:
-        with open(str(file_path), encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                for match in YOUTUBE_ID_RE.findall(line):
-                    found.add(match)
+    found = collect_ids_from_files([str(file_path) for file_path in ConfigCollectIds.collect_files])
     for video_id in sorted(found):
         print(video_id)
     logger.info(f"found {len(found)} unique video IDs")
@@ -460,64 +436,58 @@ def collect_ids() -> None:
 
 @register_endpoint(
     description="Add video IDs from a file to a playlist",
-    configs=[ConfigPagination, ConfigAddFileToPlaylist],
+    configs=[ConfigPagination, ConfigAddFileToPlaylist, ConfigDelete, ConfigQuota, ConfigInsert],
 )
 def add_file_to_playlist() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigAddFileToPlaylist.add_playlist])[0]
     video_ids = read_video_ids_from_files([str(ConfigAddFileToPlaylist.add_file)])
     logger.info(f"read {len(video_ids)} video IDs from [{ConfigAddFileToPlaylist.add_file}]")
-    added = 0
-    total = len(video_ids)
-    for video_id in sorted(video_ids):
-        add_video_to_playlist(youtube, playlist_id, video_id)
-        added += 1
-        log_progress(logger, added, total)
-    logger.info(f"added {added} videos to [{ConfigAddFileToPlaylist.add_playlist}]")
+    result = make_client().add_videos(ConfigAddFileToPlaylist.add_playlist, sorted(video_ids))
+    logger.info(f"skipping {len(video_ids) - len(result.plan.operations)} videos already in the playlist")
+    logger.info(f"added {result.done} videos to [{ConfigAddFileToPlaylist.add_playlist}]")
+
+
+@register_endpoint(
+    description="Make a playlist match a list of video IDs with the fewest deletes, inserts and moves",
+    configs=[ConfigPagination, ConfigSync, ConfigDelete, ConfigQuota],
+)
+def sync_playlist() -> None:
+    logger = logging.getLogger()
+    video_ids = read_video_ids_in_order(str(ConfigSync.sync_file))
+    logger.info(f"read {len(video_ids)} video IDs from [{ConfigSync.sync_file}]")
+    result = make_client().sync(ConfigSync.sync_playlist_name, video_ids)
+    logger.info(f"made {result.done} of {len(result.plan.operations)} changes to [{ConfigSync.sync_playlist_name}]")
 
 
 @register_endpoint(
     description="Create a new playlist",
-    configs=[ConfigCreatePlaylist],
+    configs=[ConfigCreatePlaylist, ConfigDelete, ConfigQuota],
 )
 def create_playlist() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    request = youtube.playlists().insert(
-        part="snippet,status",
-        body={
-            "snippet": {
-                "title": str(ConfigCreatePlaylist.create_name),
-                "description": str(ConfigCreatePlaylist.create_description),
-            },
-            "status": {
-                "privacyStatus": str(ConfigCreatePlaylist.create_privacy),
-            },
-        },
+    playlist_id = make_client().create_playlist(
+        str(ConfigCreatePlaylist.create_name),
+        str(ConfigCreatePlaylist.create_description),
+        str(ConfigCreatePlaylist.create_privacy),
     )
-    response = retry_execute(request)
-    playlist_id = response["id"]
-    logger.info(f"created playlist [{ConfigCreatePlaylist.create_name}] with id [{playlist_id}]")
-    print(playlist_id)
+    if playlist_id is not None:
+        logger.info(f"created playlist [{ConfigCreatePlaylist.create_name}] with id [{playlist_id}]")
+        print(playlist_id)
 
 
 @register_endpoint(
     description="Delete a playlist by name",
-    configs=[ConfigDeletePlaylist],
+    configs=[ConfigDeletePlaylist, ConfigDelete, ConfigQuota],
 )
 def delete_playlist() -> None:
     logger = logging.getLogger()
-    youtube = get_youtube()
-    playlist_id = get_playlist_ids_from_names(youtube, [ConfigDeletePlaylist.delete_playlist_name])[0]
-    request = youtube.playlists().delete(id=playlist_id)
-    retry_execute(request)
-    logger.info(f"deleted playlist [{ConfigDeletePlaylist.delete_playlist_name}] (id [{playlist_id}])")
+    if make_client().delete_playlist(ConfigDeletePlaylist.delete_playlist_name).done:
+        logger.info(f"deleted playlist [{ConfigDeletePlaylist.delete_playlist_name}]")
 
 
 @register_endpoint(
     description="Find which playlists (or dump files) contain a given video",
-    configs=[ConfigPagination, ConfigFindVideo, ConfigLocalDumpFolder],
+    configs=[ConfigPagination, ConfigFindVideo, ConfigLocalDumpFolder, ConfigItemSource],
 )
 def find_video() -> None:
     target = str(ConfigFindVideo.find_video_id)
@@ -529,17 +499,8 @@ def find_video() -> None:
                 print(filename)
     else:
         # API mode: search YouTube playlists
-        youtube = get_youtube()
-        r = create_playlists_request(youtube)
-        all_playlists = r.get_all_items()
-        for pl in all_playlists:
-            pl_id = pl["id"]
-            pl_title = pl["snippet"]["title"]
-            items = get_all_items_from_playlist_ids(youtube, [pl_id])
-            for item in items:
-                if item["snippet"]["resourceId"]["videoId"] == target:
-                    print(pl_title)
-                    break
+        for found in make_client().find_video(target):
+            print(found.title)
 
 
 def print_stats_summary(items: list[tuple[str, int]], label: str) -> None:
@@ -565,7 +526,7 @@ def print_stats_summary(items: list[tuple[str, int]], label: str) -> None:
 
 @register_endpoint(
     description="Show statistics for playlists (or dump files)",
-    configs=[ConfigPagination, ConfigLocalDumpFolder, ConfigStatsFilter],
+    configs=[ConfigPagination, ConfigLocalDumpFolder, ConfigStatsFilter, ConfigItemSource],
 )
 def stats() -> None:
     if ConfigLocalDumpFolder.local_dump_folder != ".":
@@ -577,21 +538,21 @@ def stats() -> None:
         print_stats_summary(items, "files")
     else:
         # API mode: query YouTube playlists
-        youtube = get_youtube()
-        if ConfigStatsFilter.stats_names:
-            playlist_ids = get_playlist_ids_from_names(youtube, ConfigStatsFilter.stats_names)
-            items = [
-                (name, get_playlist_item_count(youtube, pl_id))
-                for name, pl_id in zip(ConfigStatsFilter.stats_names, playlist_ids)
-            ]
-        else:
-            r = create_playlists_request(youtube)
-            all_playlists = r.get_all_items()
-            items = [
-                (pl["snippet"]["title"], pl["contentDetails"]["itemCount"])
-                for pl in all_playlists
-            ]
-        print_stats_summary(items, "playlists")
+        print_stats_summary(make_client().stats(ConfigStatsFilter.stats_names), "playlists")
+
+
+@register_endpoint(
+    description="Show how much quota each shard (see --shards) spent today",
+)
+def shards() -> None:
+    logger = logging.getLogger()
+    if not ConfigShards.shards:
+        logger.error("no shards configured, give --shards")
+        return
+    for status in get_cli_shard_set().status():
+        name, day, used, limit = status["name"], status["day"], status["used"], status["limit"]
+        state = "exhausted" if status["exhausted"] else f"{limit - used} left"
+        print(f"{name}: {used}/{limit} units on {day} ({state})")
 
 
 @register_endpoint(
@@ -618,11 +579,92 @@ def channels() -> None:
         pretty_print(res)
 
 
+@register_endpoint(
+    description="Add dump files and playlists to the set of seen videos",
+    configs=[ConfigPagination, ConfigSeen, ConfigSeenAdd],
+)
+def seen_add() -> None:
+    logger = logging.getLogger()
+    seen = SeenSet(os.path.expanduser(ConfigSeen.seen_store))
+    files, added = seen.add_files(ConfigSeenAdd.seen_add_paths)
+    if ConfigSeenAdd.seen_add_playlists:
+        added += seen.add(make_client().video_ids(ConfigSeenAdd.seen_add_playlists))
+    seen.save()
+    logger.info(f"read [{files}] changed files, added [{added}] videos, the set has [{len(seen)}]")
+
+
+@register_endpoint(
+    description="Videos of a playlist or channel which are not in the set of seen videos",
+    configs=[ConfigPagination, ConfigSeen, ConfigLeftToSee, ConfigItemSource],
+)
+def left_to_see() -> None:
+    logger = logging.getLogger()
+    client = make_client()
+    playlist_id = ConfigLeftToSee.left_playlist_id
+    if ConfigLeftToSee.left_playlist_name is not None:
+        try:
+            playlist_id = client.playlist_ids([ConfigLeftToSee.left_playlist_name])[0]
+        except KeyError:
+            logger.error(f"no playlist named [{ConfigLeftToSee.left_playlist_name}]")
+            return
+    if playlist_id is None:
+        logger.error("give --left-playlist-name or --left-playlist-id")
+        return
+    seen = SeenSet(os.path.expanduser(ConfigSeen.seen_store))
+    video_ids = [item.video_id for item in client.left_to_see(playlist_id, seen)]
+    logger.info(f"[{len(video_ids)}] videos left to see, the seen set has [{len(seen)}]")
+    if ConfigLeftToSee.left_output is None:
+        for video_id in video_ids:
+            print(video_id)
+    else:
+        with open(ConfigLeftToSee.left_output, "w") as f:
+            for video_id in video_ids:
+                print(video_id, file=f)
+
+
+@register_endpoint(
+    description="Crawl the new uploads of channels (or of the subscriptions), stopping at the last upload seen",
+    configs=[ConfigPagination, ConfigCrawl],
+)
+def crawl_uploads() -> None:
+    channel_ids = list(ConfigCrawl.crawl_channels)
+    if ConfigCrawl.crawl_channels_file is not None:
+        with open(ConfigCrawl.crawl_channels_file) as f:
+            channel_ids.extend(line.strip() for line in f if line.strip())
+    store = WatermarkStore(os.path.expanduser(ConfigCrawl.crawl_state))
+    results = make_client().crawl_uploads(
+        channel_ids,
+        store,
+        workers=ConfigCrawl.crawl_workers,
+        initial_pages=ConfigCrawl.crawl_initial_pages,
+    )
+    video_ids = [upload.video_id for result in results for upload in result.uploads]
+    if ConfigCrawl.crawl_output is None:
+        for video_id in video_ids:
+            print(video_id)
+    else:
+        with open(ConfigCrawl.crawl_output, "a") as f:
+            for video_id in video_ids:
+                print(video_id, file=f)
+    store.save()
+
+
 @register_endpoint(
     description="Download Watch Later playlist",
+    configs=[ConfigDownload],
 )
 def watch_later() -> None:
-    youtube_dl_download_urls(["https://www.youtube.com/playlist?list=WL"])
+    result = youtube_dl_download_urls(
+        ["https://www.youtube.com/playlist?list=WL"],
+        workers=ConfigDownload.download_workers,
+        fragments=ConfigDownload.download_fragments,
+        archive=os.path.expanduser(ConfigDownload.download_archive),
+        queue_file=os.path.expanduser(ConfigDownload.download_queue),
+        rate_limit=ConfigDownload.download_rate_limit,
+        per_host=ConfigDownload.download_per_host,
+    )
+    if result.failed:
+        sys.exit(1)
 
 
 @register_endpoint(
@@ -630,12 +672,11 @@ def watch_later() -> None:
     configs=[ConfigLocalDiff],
 )
 def local_diff() -> None:
-    ids_a = read_video_ids_from_path(ConfigLocalDiff.local_diff_a)
-    ids_b = read_video_ids_from_path(ConfigLocalDiff.local_diff_b)
-    if ConfigLocalDiff.local_diff_reverse:
-        result = sorted(ids_a & ids_b)
-    else:
-        result = sorted(ids_a - ids_b)
+    result = compute_local_diff(
+        ConfigLocalDiff.local_diff_a,
+        ConfigLocalDiff.local_diff_b,
+        reverse=ConfigLocalDiff.local_diff_reverse,
+    )
     for video_id in result:
         print(video_id)
 
@@ -646,22 +687,242 @@ def local_diff() -> None:
 )
 def local_dedup() -> None:
     data = read_all_dump_files(ConfigLocalDumpFolder.local_dump_folder)
-    # intra-playlist duplicates
-    for filename, lines in data.items():
-        seen: set[str] = set()
-        for line in lines:
-            if line in seen:
-                print(f"INTRA {filename}: {line}")
-            else:
-                seen.add(line)
-    # cross-playlist duplicates
-    global_seen: dict[str, str] = {}
-    for filename, lines in data.items():
-        for line in lines:
-            if line in global_seen and global_seen[line] != filename:
-                print(f"CROSS {global_seen[line]} & {filename}: {line}")
-            elif line not in global_seen:
-                global_seen[line] = filename
+    for line in find_dump_duplicates(data):
+        print(line)
+
+
+def exact_note(value: int | None) -> str:
+    return "" if value is None else f" (exact {value})"
+
+
+@register_endpoint(
+    description="Estimate distinct videos, overlaps and repeats over dump archives from stored sketches (zero API quota)",
+    configs=[ConfigSketch],
+)
+def sketch_stats() -> None:
+    logger = logging.getLogger()
+    sketch, built = merged_sketch(ConfigSketch.sketch_paths)
+    logger.info(f"merged [{sketch.files}] sketches, built [{built}]")
+    counts = exact_counts(ConfigSketch.sketch_paths)[1] if ConfigSketch.sketch_exact else None
+    distinct = sketch.distinct()
+    print(f"Files: {sketch.files}")
+    print(f"Lines: {sketch.lines}")
+    print(f"Distinct: ~{distinct}" + exact_note(None if counts is None else len(counts)))
+    if ConfigSketch.sketch_overlap_paths:
+        other, built = merged_sketch(ConfigSketch.sketch_overlap_paths)
+        logger.info(f"merged [{other.files}] overlap sketches, built [{built}]")
+        other_distinct = other.distinct()
+        other.merge(sketch)
+        union = other.distinct()
+        # inclusion-exclusion: the errors of three estimates add up, so a small overlap may come out below zero
+        common = max(distinct + other_distinct - union, 0)
+        exact_common = None
+        if counts is not None:
+            exact_common = len(counts.keys() & exact_counts(ConfigSketch.sketch_overlap_paths)[1].keys())
+        print(f"Other distinct: ~{other_distinct}")
+        print(f"Union: ~{union}")
+        print(f"Common: ~{common}" + exact_note(exact_common))
+    for video_id in ConfigSketch.sketch_videos:
+        print(f"{video_id}: ~{sketch.frequency(video_id)}" + exact_note(None if counts is None else counts[video_id]))
+    if ConfigSketch.sketch_candidates is not None:
+        candidates = read_video_ids_from_files(list_dump_files([ConfigSketch.sketch_candidates]))
+        ranked = sorted(candidates, key=lambda video_id: (-sketch.frequency(video_id), video_id))
+        print("---")
+        for video_id in ranked[:ConfigSketch.sketch_top]:
+            print(f"{video_id}: ~{sketch.frequency(video_id)}" + exact_note(None if counts is None else counts[video_id]))
+
+
+def get_history_store() -> HistoryStore:
+    return HistoryStore(os.path.expanduser(ConfigHistory.history_store))
+
+
+def get_snapshot_as_of(store: HistoryStore, value: str | None) -> Snapshot:
+    """ the snapshot as of the time value (the latest one when None); exits when there is none """
+    if value is None:
+        snapshots = store.snapshots()
+        snapshot = snapshots[-1] if snapshots else None
+    else:
+        snapshot = store.as_of(parse_time(value))
+    if snapshot is None:
+        logging.getLogger().error(f"no snapshot as of [{value}] in [{store.root}]")
+        sys.exit(1)
+    return snapshot
+
+
+@register_endpoint(
+    description="Save a snapshot of all playlists (or import dump folders) into the history store",
+    configs=[ConfigPagination, ConfigHistory, ConfigHistorySave],
+)
+def history_save() -> None:
+    logger = logging.getLogger()
+    store = get_history_store()
+    if ConfigHistorySave.history_import_folders:
+        sources = [
+            (read_dump_folder_time(folder), {name: ("", ids) for name, ids in read_all_dump_files(folder).items()})
+            for folder in ConfigHistorySave.history_import_folders
+        ]
+    else:
+        sources = [(int(time.time()), make_client().snapshot())]
+    for snapshot_time, playlists in sources:
+        result = store.save(snapshot_time, playlists)
+        logger.info(f"saved [{result.snapshot.name}]: {len(playlists)} playlists, {result.new_chunks}/{result.chunks} new chunks")
+
+
+@register_endpoint(
+    description="List the snapshots in the history store (zero API quota)",
+    configs=[ConfigHistory],
+)
+def history_list() -> None:
+    store = get_history_store()
+    for snapshot in store.snapshots():
+        manifest = store.manifest(snapshot)
+        items = sum(entry["count"] for entry in manifest.values())
+        print(f"{format_time(snapshot.time)}  {snapshot.name}  {len(manifest)} playlists  {items} items")
+
+
+@register_endpoint(
+    description="Show the playlists as they were at a given time (zero API quota)",
+    configs=[ConfigHistory, ConfigHistoryShow],
+)
+def history_show() -> None:
+    logger = logging.getLogger()
+    store = get_history_store()
+    snapshot = get_snapshot_as_of(store, ConfigHistoryShow.history_date)
+    playlists = store.load(snapshot, ConfigHistoryShow.history_playlists)
+    logger.info(f"snapshot [{snapshot.name}] taken at [{format_time(snapshot.time)}]")
+    output_folder = ConfigHistoryShow.history_output_folder
+    if output_folder is not None:
+        pathlib.Path(output_folder).mkdir(parents=True, exist_ok=True)
+    for title, video_ids in playlists.items():
+        if output_folder is not None:
+            with open(os.path.join(output_folder, title), "w") as f:
+                for video_id in video_ids:
+                    print(video_id, file=f)
+        else:
+            for video_id in video_ids:
+                print(f"{title}\t{video_id}")
+
+
+@register_endpoint(
+    description="Show videos added to and removed from playlists between two snapshots (zero API quota)",
+    configs=[ConfigHistory, ConfigHistoryChanges],
+)
+def history_changes() -> None:
+    store = get_history_store()
+    after = get_snapshot_as_of(store, ConfigHistoryChanges.history_to)
+    if ConfigHistoryChanges.history_from is not None:
+        before = get_snapshot_as_of(store, ConfigHistoryChanges.history_from)
+    else:
+        snapshots = store.snapshots()
+        index = snapshots.index(after)
+        before = snapshots[index - 1] if index > 0 else after
+    for change in store.changes(before, after):
+        print(f"{change.kind} {change.playlist}\t{change.video_id}")
+
+
+@register_endpoint(
+    description="Show when a video entered and left each playlist (zero API quota)",
+    configs=[ConfigHistory, ConfigHistoryTimeline],
+)
+def history_timeline() -> None:
+    store = get_history_store()
+    for snapshot, change in store.timeline(ConfigHistoryTimeline.history_video):
+        print(f"{format_time(snapshot.time)}  {change.kind} {change.playlist}")
+
+
+@register_endpoint(
+    description="Run the offline benchmark suite against replayed API responses (zero API quota)",
+    configs=[ConfigBenchmark],
+)
+def benchmark() -> None:
+    logger = logging.getLogger()
+    if ConfigBenchmark.benchmark_fixture is not None:
+        account = load_fixture(ConfigBenchmark.benchmark_fixture)
+    else:
+        account = synthetic_account(
+            ConfigBenchmark.benchmark_playlists,
+            ConfigBenchmark.benchmark_items,
+            ConfigBenchmark.benchmark_seed,
+        )
+    results = run_benchmarks(account, ConfigBenchmark.benchmark_repeat, ConfigBenchmark.benchmark_names)
+    print(json.dumps(results, indent=4))
+    if ConfigBenchmark.benchmark_output is not None:
+        with open(ConfigBenchmark.benchmark_output, "w") as f:
+            json.dump(results, f, indent=4)
+    if ConfigBenchmark.benchmark_baseline is not None:
+        with open(ConfigBenchmark.benchmark_baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, ConfigBenchmark.benchmark_tolerance)
+        for regression in regressions:
+            logger.error(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+@register_endpoint(
+    description="Serve a local fake YouTube Data API (use with --api-base-url) with quota, latency and faults",
+    configs=[ConfigFakeApi],
+)
+def fake_api() -> None:
+    logger = logging.getLogger()
+    if ConfigFakeApi.fake_api_fixture is not None:
+        account = FakeAccount.from_fixture(load_fixture(ConfigFakeApi.fake_api_fixture))
+    else:
+        account = FakeAccount.synthetic(
+            ConfigFakeApi.fake_api_playlists,
+            ConfigFakeApi.fake_api_items,
+            ConfigFakeApi.fake_api_seed,
+        )
+    api = FakeYouTube(
+        account,
+        quota_limit=ConfigFakeApi.fake_api_quota,
+        latency=ConfigFakeApi.fake_api_latency,
+        latency_ms=ConfigFakeApi.fake_api_latency_ms,
+        fault_rates={
+            403: ConfigFakeApi.fake_api_403_rate,
+            429: ConfigFakeApi.fake_api_429_rate,
+            500: ConfigFakeApi.fake_api_500_rate,
+            503: ConfigFakeApi.fake_api_503_rate,
+        },
+        seed=ConfigFakeApi.fake_api_seed,
+    )
+    server = FakeApiServer(api, ConfigFakeApi.fake_api_host, ConfigFakeApi.fake_api_port)
+    items = sum(len(playlist.items) for playlist in account.playlists.values())
+    logger.info(f"serving [{len(account.playlists)}] playlists with [{items}] items at [{server.base_url}]")
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(api.stats(), indent=4))
+
+
+@register_endpoint(
+    description="Run a daemon keeping the service and caches warm, for use with pytubekit-client",
+    configs=[ConfigServe],
+)
+def serve() -> None:
+    def warm() -> None:
+        list(make_client().playlists())
+    run_daemon(ConfigServe.serve_socket, ConfigServe.serve_cache_ttl, warm)
+
+
+@register_endpoint(
+    description="Run a script of invocations in one process, sharing fetched playlists between steps",
+    configs=[ConfigRun],
+)
+def run() -> None:
+    code = run_steps(read_script(str(ConfigRun.run_script)), ConfigRun.run_keep_going)
+    if code != 0:
+        sys.exit(code)
+
+
+def instrument_endpoints() -> None:
+    """ wrap every registered endpoint with the global (any command) options """
+    for function_data in get_pytconf().functions.values():
+        function_data.function = traced(profiled(function_data.function))
 
 
 @register_main(
@@ -674,6 +935,7 @@ def main():
     ConfigRequest.scopes = SCOPES
     ConfigRequest.location = os.path.dirname(os.path.realpath(__file__))
     register_functions()
+    instrument_endpoints()
     config_arg_parse_and_launch()
 
 
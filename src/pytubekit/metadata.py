@@ -0,0 +1,123 @@
+"""
+metadata.py
+
+Sort keys of playlist items.
+
+Title, channel and date (when the video was added to the playlist) come with
+the playlist items. Duration, upload date, view count and like count do not:
+they are asked of videos.list, 50 videos per request (one quota unit), and kept
+in a JSON file for a TTL, so sorting again soon after costs nothing.
+
+A sort is given as keys separated by commas, each ascending or, with a :desc
+suffix, descending (views:desc,title). The values of each key are computed once
+for all items, as a column, and the order is built by one stable sort of item
+indices per key, from the last key to the first. Items without a value for a key
+(videos which videos.list no longer returns, likes hidden by the uploader) go
+last whatever the direction.
+"""
+import re
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from pytubekit.availability import AvailabilityCache, fetch_videos
+from pytubekit.constants import MAX_PAGE_SIZE
+from pytubekit.records import PlaylistItem
+
+SORT_KEYS: dict[str, Callable[[PlaylistItem], str]] = {
+    "title": lambda item: item.title.lower(),
+    "channel": lambda item: item.channel.lower(),
+    "date": lambda item: item.published_at,
+}
+METADATA_KEYS = ["duration", "upload_date", "views", "likes"]
+DESCENDING = "desc"
+DIRECTIONS = ["", "asc", DESCENDING]
+METADATA_PARTS = "snippet,contentDetails,statistics"
+# ISO 8601 durations as videos.list gives them (P1DT2H3M4S, PT15M, P0D)
+DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+
+def parse_duration(duration: str) -> int | None:
+    """ seconds of an ISO 8601 duration (None when it is not one) """
+    match = DURATION.fullmatch(duration)
+    if match is None:
+        return None
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def get_count(statistics: dict[str, Any], name: str) -> int | None:
+    value = statistics.get(name)
+    return None if value is None else int(value)
+
+
+def trim(resource: dict[str, Any]) -> dict[str, Any]:
+    """ the METADATA_KEYS of a videos.list resource """
+    statistics = resource.get("statistics", {})
+    return {
+        "duration": parse_duration(resource.get("contentDetails", {}).get("duration", "")),
+        "upload_date": resource.get("snippet", {}).get("publishedAt"),
+        "views": get_count(statistics, "viewCount"),
+        "likes": get_count(statistics, "likeCount"),
+    }
+
+
+class MetadataCache(AvailabilityCache):
+    """ video id -> (time fetched, METADATA_KEYS values or None), persisted in a JSON file; path None keeps it in memory """
+    def __init__(self, path: str | None = None, ttl: float = 24 * 3600) -> None:
+        super().__init__(path, ttl)
+
+
+def parse_sort_keys(spec: str) -> list[tuple[str, bool]]:
+    """ [(key, descending)] of a sort given as key[:asc|:desc],key[:asc|:desc],... """
+    keys: list[tuple[str, bool]] = []
+    for part in spec.split(","):
+        name, _, direction = part.strip().partition(":")
+        if name not in SORT_KEYS and name not in METADATA_KEYS:
+            raise ValueError(f"invalid sort key [{name}], must be one of {list(SORT_KEYS) + METADATA_KEYS}")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"invalid sort direction [{direction}], must be asc or desc")
+        keys.append((name, direction == DESCENDING))
+    return keys
+
+
+def needs_metadata(keys: list[tuple[str, bool]]) -> bool:
+    return any(name in METADATA_KEYS for name, _ in keys)
+
+
+def fetch_metadata(
+    youtube: Any,
+    video_ids: list[str],
+    *,
+    cache: MetadataCache | None = None,
+    batch_size: int = MAX_PAGE_SIZE,
+) -> dict[str, dict[str, Any] | None]:
+    """ video id -> METADATA_KEYS values (None when videos.list did not return it), batched and cached """
+    return fetch_videos(
+        youtube,
+        video_ids,
+        part=METADATA_PARTS,
+        trim_resource=trim,
+        cache=cache if cache is not None else MetadataCache(),
+        batch_size=batch_size,
+    )
+
+
+def sort_items(
+    items: Sequence[PlaylistItem],
+    keys: list[tuple[str, bool]],
+    metadata: dict[str, dict[str, Any] | None] | None = None,
+) -> list[PlaylistItem]:
+    """ the items ordered by keys (see parse_sort_keys), metadata keys looked up in metadata """
+    metadata = metadata if metadata is not None else {}
+    order = list(range(len(items)))
+    for name, descending in reversed(keys):
+        column: list[Any]
+        if name in SORT_KEYS:
+            column = list(map(SORT_KEYS[name], items))
+        else:
+            column = [(metadata.get(item.video_id) or {}).get(name) for item in items]
+        present = [i for i in order if column[i] is not None]
+        # the sort is stable in both directions, so earlier passes break ties
+        present.sort(key=column.__getitem__, reverse=descending)
+        order = present + [i for i in order if column[i] is None]
+    return [items[i] for i in order]
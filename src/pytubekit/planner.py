@@ -0,0 +1,452 @@
+"""
+planner.py
+
+Planning layer for the mutating endpoints.
+
+An endpoint first computes the complete list of playlist changes it wants to make
+(a Plan) against a snapshot of the playlists it fetched. The plan can then be
+simulated locally to get the resulting playlists, costed in quota units (and in
+days at a given daily budget) and reported, all before a single write is made.
+Executing the plan is done by util.apply_plan().
+"""
+import heapq
+import logging
+import math
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from pytubekit.constants import BLOCKED, CHAIN, DELETED_TITLE, MAX_PLAYLIST_ITEMS, MISSING, PRIVATE, PRIVATE_TITLE, REJECTED
+from pytubekit.records import Item, get_item_id, get_item_playlist_id, get_item_title, get_item_video_id
+from pytubekit.tracing import get_quota_cost
+
+INSERT = "insert"
+DELETE = "delete"
+UPDATE = "update"
+CREATE_PLAYLIST = "create_playlist"
+RENAME_PLAYLIST = "rename_playlist"
+DELETE_PLAYLIST = "delete_playlist"
+
+OPERATION_METHODS = {
+    INSERT: "youtube.playlistItems.insert",
+    DELETE: "youtube.playlistItems.delete",
+    UPDATE: "youtube.playlistItems.update",
+    CREATE_PLAYLIST: "youtube.playlists.insert",
+    RENAME_PLAYLIST: "youtube.playlists.update",
+    DELETE_PLAYLIST: "youtube.playlists.delete",
+}
+
+
+@dataclass
+class Operation:
+    kind: str
+    playlist_id: str
+    video_id: str | None = None
+    item_id: str | None = None
+    position: int | None = None
+    title: str | None = None
+    description: str | None = None
+    privacy: str | None = None
+
+    def cost(self) -> int:
+        return get_quota_cost(OPERATION_METHODS[self.kind])
+
+
+def is_append(operation: Operation) -> bool:
+    return operation.kind == INSERT and operation.position is None
+
+
+def longest_increasing_subsequence(values: list[int]) -> set[int]:
+    """ indexes into values of one longest strictly increasing subsequence (patience sorting) """
+    tails: list[int] = []
+    previous: list[int] = [-1] * len(values)
+    for i, value in enumerate(values):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if values[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[i] = tails[low - 1]
+        if low == len(tails):
+            tails.append(i)
+        else:
+            tails[low] = i
+    result: set[int] = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        result.add(i)
+        i = previous[i]
+    return result
+
+
+class Plan:
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.operations: list[Operation] = []
+        # playlist id -> [(playlist item id, video id)] as fetched
+        self.snapshot: dict[str, list[tuple[str, str]]] = {}
+        self.titles: dict[str, str] = {}
+
+    def add_snapshot(self, playlist_id: str, items: Sequence[Item], title: str | None = None) -> None:
+        self.snapshot[playlist_id] = [(get_item_id(item), get_item_video_id(item)) for item in items]
+        if title is not None:
+            self.titles[playlist_id] = title
+
+    def add_snapshot_items(self, items: Sequence[Item]) -> None:
+        """ add items which may come from several playlists (grouped by snippet.playlistId) """
+        for item in items:
+            playlist_id = get_item_playlist_id(item)
+            self.snapshot.setdefault(playlist_id, []).append((get_item_id(item), get_item_video_id(item)))
+
+    def add_count(self, playlist_id: str, count: int, title: str | None = None) -> None:
+        """ a playlist whose items were counted, not fetched (its snapshot has count anonymous items) """
+        self.snapshot[playlist_id] = [("", "")] * count
+        if title is not None:
+            self.titles[playlist_id] = title
+
+    def insert(self, playlist_id: str, video_id: str, position: int | None = None) -> None:
+        self.operations.append(Operation(INSERT, playlist_id, video_id=video_id, position=position))
+
+    def delete(self, playlist_id: str, item_id: str, video_id: str | None = None) -> None:
+        self.operations.append(Operation(DELETE, playlist_id, video_id=video_id, item_id=item_id))
+
+    def update(self, playlist_id: str, item_id: str, video_id: str, position: int) -> None:
+        self.operations.append(Operation(UPDATE, playlist_id, video_id=video_id, item_id=item_id, position=position))
+
+    def create_playlist(self, title: str, description: str, privacy: str) -> None:
+        self.operations.append(Operation(CREATE_PLAYLIST, title, title=title, description=description, privacy=privacy))
+
+    def rename_playlist(self, playlist_id: str, title: str) -> None:
+        self.operations.append(Operation(RENAME_PLAYLIST, playlist_id, title=title))
+
+    def delete_playlist(self, playlist_id: str) -> None:
+        self.operations.append(Operation(DELETE_PLAYLIST, playlist_id))
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for operation in self.operations:
+            counts[operation.kind] = counts.get(operation.kind, 0) + 1
+        return counts
+
+    def reorder_moves(self, window: int = 1) -> int:
+        """
+        the most moves util.pipelined_insert() may need to put appends made window at a time back in
+        order: all but one of every run of appends to a playlist (none when they are made one at a time)
+        """
+        if window <= 1:
+            return 0
+        moves = 0
+        previous: Operation | None = None
+        for operation in self.operations:
+            if is_append(operation) and previous is not None and is_append(previous) and previous.playlist_id == operation.playlist_id:
+                moves += 1
+            previous = operation
+        return moves
+
+    def quota_cost(self, window: int = 1) -> int:
+        """ the cost of the operations, with the worst case of reordering appends made window at a time """
+        cost = sum(operation.cost() for operation in self.operations)
+        return cost + self.reorder_moves(window) * get_quota_cost(OPERATION_METHODS[UPDATE])
+
+    def days_needed(self, budget: int, window: int = 1) -> int:
+        return math.ceil(self.quota_cost(window) / budget) if budget > 0 else 0
+
+    def simulate(self) -> dict[str, list[str]]:
+        """ apply the operations to the snapshot and return playlist id -> video ids """
+        playlists = {playlist_id: list(items) for playlist_id, items in self.snapshot.items()}
+        # deletes are applied lazily (before the next positional operation) to keep big plans linear
+        pending: dict[str, set[str]] = {}
+
+        def compact(playlist_id: str) -> list[tuple[str, str]]:
+            items = playlists.setdefault(playlist_id, [])
+            if pending.get(playlist_id):
+                items[:] = [entry for entry in items if entry[0] not in pending[playlist_id]]
+                pending[playlist_id] = set()
+            return items
+
+        inserted = 0
+        for operation in self.operations:
+            if operation.kind == CREATE_PLAYLIST:
+                playlists[operation.playlist_id] = []
+            elif operation.kind == DELETE_PLAYLIST:
+                playlists.pop(operation.playlist_id, None)
+            elif operation.kind == DELETE:
+                assert operation.item_id is not None
+                pending.setdefault(operation.playlist_id, set()).add(operation.item_id)
+            elif operation.kind == UPDATE:
+                items = compact(operation.playlist_id)
+                index = next((i for i, (item_id, _) in enumerate(items) if item_id == operation.item_id), None)
+                if index is not None:
+                    entry = items.pop(index)
+                    items.insert(self._position(operation, items), entry)
+            elif operation.kind == INSERT:
+                assert operation.video_id is not None
+                inserted += 1
+                entry = (f"planned_{inserted}", operation.video_id)
+                if operation.position is None:
+                    playlists.setdefault(operation.playlist_id, []).append(entry)
+                else:
+                    items = compact(operation.playlist_id)
+                    items.insert(self._position(operation, items), entry)
+        for playlist_id in list(pending):
+            if playlist_id in playlists:
+                compact(playlist_id)
+        return {playlist_id: [video_id for _, video_id in items] for playlist_id, items in playlists.items()}
+
+    @staticmethod
+    def _position(operation: Operation, items: list[tuple[str, str]]) -> int:
+        if operation.position is None:
+            return len(items)
+        return min(operation.position, len(items))
+
+    def report(self, budget: int, window: int = 1) -> None:
+        logger = logging.getLogger()
+        counts = self.counts()
+        described = ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "no changes"
+        cost = self.quota_cost(window)
+        moves = self.reorder_moves(window)
+        logger.info(f"plan [{self.label}]: {described}")
+        if moves:
+            logger.info(f"plan [{self.label}]: up to {moves} moves to reorder appends made {window} at a time")
+        logger.info(f"plan [{self.label}]: costs {cost} quota units, {self.days_needed(budget, window)} day(s) at {budget} units/day")
+        result = self.simulate()
+        for playlist_id, video_ids in result.items():
+            before = len(self.snapshot.get(playlist_id, []))
+            name = self.titles.get(playlist_id, playlist_id)
+            if before != len(video_ids):
+                logger.info(f"plan [{self.label}]: [{name}] {before} -> {len(video_ids)} items")
+            if len(video_ids) > MAX_PLAYLIST_ITEMS:
+                logger.warning(f"plan [{self.label}]: [{name}] would exceed {MAX_PLAYLIST_ITEMS} items")
+
+
+def plan_cleanup(
+    items: Sequence[Item],
+    *,
+    dedup: bool,
+    check_deleted: bool,
+    check_privatized: bool,
+    availability: dict[str, str] | None = None,
+) -> tuple[Plan, dict[str, int]]:
+    """
+    delete duplicate, deleted and privatized items; also returns how many of each were found.
+    Without availability (video id -> availability, see availability.py) a video is deleted or private
+    when its title says so; with it, also when videos.list says so, and rejected or region blocked
+    videos are deleted along with deleted ones.
+    """
+    plan = Plan("cleanup")
+    plan.add_snapshot_items(items)
+    seen: set[str] = set()
+    found = {"duplicates": 0, "deleted": 0, "private": 0}
+    if availability is not None:
+        found.update({REJECTED: 0, BLOCKED: 0})
+    for item in items:
+        to_delete = False
+        video_id = get_item_video_id(item)
+        if dedup:
+            if video_id in seen:
+                found["duplicates"] += 1
+                to_delete = True
+            else:
+                seen.add(video_id)
+        title = get_item_title(item)
+        state = availability.get(video_id) if availability is not None else None
+        # videos.list does not return private videos of other channels, only the title tells them from deleted ones
+        private = title == PRIVATE_TITLE or state == PRIVATE
+        if check_deleted and (title == DELETED_TITLE or (state == MISSING and not private)):
+            found["deleted"] += 1
+            to_delete = True
+        if check_privatized and private:
+            found["private"] += 1
+            to_delete = True
+        if check_deleted and state in (REJECTED, BLOCKED):
+            found[state] += 1
+            to_delete = True
+        if to_delete:
+            plan.delete(get_item_playlist_id(item), get_item_id(item), video_id)
+    return plan, found
+
+
+def plan_subtract(what_video_ids: set[str], from_items: Sequence[Item]) -> Plan:
+    """ delete every item of from_items whose video is in what_video_ids """
+    plan = Plan("subtract")
+    plan.add_snapshot_items(from_items)
+    for item in from_items:
+        video_id = get_item_video_id(item)
+        if video_id in what_video_ids:
+            plan.delete(get_item_playlist_id(item), get_item_id(item), video_id)
+    return plan
+
+
+def plan_merge(
+    destination_id: str,
+    dest_items: Sequence[Item],
+    source_items: Sequence[Item],
+    dedup: bool,
+    dest_count: int | None = None,
+) -> Plan:
+    """
+    insert the videos of source_items into the destination (skipping ones already there if dedup);
+    without dedup the destination need not be read, dest_count (its item count) stands in for its items
+    """
+    plan = Plan("merge")
+    if dest_count is None:
+        plan.add_snapshot(destination_id, dest_items)
+    else:
+        plan.add_count(destination_id, dest_count)
+    seen = {get_item_video_id(item) for item in dest_items}
+    for item in source_items:
+        video_id = get_item_video_id(item)
+        if dedup and video_id in seen:
+            continue
+        plan.insert(destination_id, video_id)
+        seen.add(video_id)
+    return plan
+
+
+def plan_add(playlist_id: str, playlist_items: Sequence[Item], video_ids: list[str]) -> Plan:
+    """ insert video_ids into the playlist, skipping the ones it already holds """
+    plan = Plan("add")
+    plan.add_snapshot(playlist_id, playlist_items)
+    present = {get_item_video_id(item) for item in playlist_items}
+    for video_id in video_ids:
+        if video_id not in present:
+            plan.insert(playlist_id, video_id)
+            present.add(video_id)
+    return plan
+
+
+def plan_overflow(
+    source_id: str,
+    source_items: Sequence[Item],
+    destination_id: str,
+    destination_items: Sequence[Item],
+    available: int,
+) -> Plan:
+    """
+    move the first items of the source to the destination, up to available new destination items.
+    all inserts come before all deletes so an interrupted run never loses a video, and videos
+    already in the destination are only deleted from the source.
+    """
+    plan = Plan("overflow")
+    plan.add_snapshot(source_id, source_items)
+    plan.add_snapshot(destination_id, destination_items)
+    present = {get_item_video_id(item) for item in destination_items}
+    deletes: list[Item] = []
+    for item in source_items:
+        video_id = get_item_video_id(item)
+        if video_id not in present:
+            if available <= 0:
+                break
+            plan.insert(destination_id, video_id)
+            present.add(video_id)
+            available -= 1
+        deletes.append(item)
+    for item in deletes:
+        plan.delete(source_id, get_item_id(item), get_item_video_id(item))
+    return plan
+
+
+def pack(counts: list[int], moves: int, packing: str = CHAIN) -> list[int]:
+    """
+    how many of moves new items each playlist of counts items gets without passing MAX_PLAYLIST_ITEMS:
+    filling them in order (chain) or always the emptiest first (balance), which levels their fill
+    """
+    free = [max(MAX_PLAYLIST_ITEMS - count, 0) for count in counts]
+    if packing == CHAIN:
+        result = []
+        for slots in free:
+            result.append(min(slots, moves))
+            moves -= result[-1]
+        return result
+    result = [0] * len(counts)
+    heap = [(count, i) for i, count in enumerate(counts) if free[i] > 0]
+    heapq.heapify(heap)
+    while moves > 0 and heap:
+        count, i = heapq.heappop(heap)
+        result[i] += 1
+        moves -= 1
+        if result[i] < free[i]:
+            heapq.heappush(heap, (count + 1, i))
+    return result
+
+
+def plan_spill(
+    source_id: str,
+    source_items: Sequence[Item],
+    destinations: list[tuple[str, int]],
+    packing: str = CHAIN,
+) -> Plan:
+    """
+    move the items of the source, in order, into destinations ((playlist id, item count) pairs, in chain
+    order) packed by pack(). Each destination gets a consecutive run of the source, so source order is
+    kept along the chain. Destinations are only counted, not fetched, so videos they already hold are
+    not detected; repeats within the source are moved once. Inserts come before deletes, as in plan_overflow.
+    """
+    plan = Plan("overflow")
+    plan.add_snapshot(source_id, source_items)
+    for playlist_id, count in destinations:
+        plan.add_count(playlist_id, count)
+    unique = len({get_item_video_id(item) for item in source_items})
+    moves = pack([count for _, count in destinations], unique, packing)
+    targets = [playlist_id for (playlist_id, _), count in zip(destinations, moves) for _ in range(count)]
+    moved: set[str] = set()
+    deletes: list[Item] = []
+    for item in source_items:
+        video_id = get_item_video_id(item)
+        if video_id not in moved:
+            if len(moved) == len(targets):
+                break
+            plan.insert(targets[len(moved)], video_id)
+            moved.add(video_id)
+        deletes.append(item)
+    for item in deletes:
+        plan.delete(source_id, get_item_id(item), get_item_video_id(item))
+    return plan
+
+
+def plan_sync(playlist_id: str, playlist_items: Sequence[Item], target_video_ids: list[str]) -> Plan:
+    """
+    turn the playlist into target_video_ids with as few writes as possible. Items whose video is
+    not wanted (or wanted fewer times than it appears) are deleted and missing videos are inserted.
+    Of the items kept, only those outside a longest run already in target order are moved, each
+    one once, to just after its target predecessor.
+    """
+    plan = Plan("sync")
+    plan.add_snapshot(playlist_id, playlist_items)
+    wanted: dict[str, deque[int]] = {}
+    for index, video_id in enumerate(target_video_ids):
+        wanted.setdefault(video_id, deque()).append(index)
+    kept: list[tuple[str, str]] = []
+    # item id of a kept item -> its index in the target
+    target_index: dict[str, int] = {}
+    for item in playlist_items:
+        video_id = get_item_video_id(item)
+        indexes = wanted.get(video_id)
+        if indexes:
+            target_index[get_item_id(item)] = indexes.popleft()
+            kept.append((get_item_id(item), video_id))
+        else:
+            plan.delete(playlist_id, get_item_id(item), video_id)
+    in_order = longest_increasing_subsequence([target_index[item_id] for item_id, _ in kept])
+    staying = {kept[k][0] for k in in_order}
+    at_index = {index: item_id for item_id, index in target_index.items()}
+    # the playlist as it will be after the operations planned so far
+    order = [item_id for item_id, _ in kept]
+    for index, video_id in enumerate(target_video_ids):
+        item_id = at_index.get(index)
+        if item_id is not None and item_id in staying:
+            continue
+        if item_id is not None:
+            order.remove(item_id)
+        position = order.index(at_index[index - 1]) + 1 if index > 0 else 0
+        if item_id is None:
+            item_id = f"planned_{index}"
+            at_index[index] = item_id
+            plan.insert(playlist_id, video_id, position)
+        else:
+            plan.update(playlist_id, item_id, video_id, position)
+        order.insert(position, item_id)
+    return plan
@@ -0,0 +1,104 @@
+"""
+profiling.py
+
+Run an endpoint under a profiler selected by the global --profile option:
+
+- cprofile: deterministic profiling with cProfile, stats saved in pstats format
+- sampling: statistical profiling with pyinstrument when it is installed (falls back to cprofile)
+- tracemalloc: peak memory and the top allocation sites
+
+Every mode also reports wall time split into CPU time, time spent waiting on
+API/yt_dlp calls (taken from the tracer) and the remainder, so that an API stall
+can be told apart from a local hot loop. The network wait is wall time during
+which any call was in flight, so it stays within the wall time when several
+threads wait at once; the latencies summed over all calls are shown next to it.
+"""
+import cProfile
+import functools
+import logging
+import pstats
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from pytubekit.configs import ConfigProfile
+from pytubekit.tracing import TRACER
+
+
+def run_cprofile(function: Callable[[], None], stats_file: str, top: int) -> None:
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(function)
+    finally:
+        profiler.dump_stats(stats_file)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+
+def run_sampling(function: Callable[[], None], stats_file: str, top: int) -> None:
+    logger = logging.getLogger()
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyinstrument
+    except ImportError:
+        logger.warning("pyinstrument is not installed, falling back to cProfile")
+        run_cprofile(function, stats_file, top)
+        return
+    profiler = pyinstrument.Profiler()
+    profiler.start()
+    try:
+        function()
+    finally:
+        profiler.stop()
+        text = profiler.output_text()
+        with open(stats_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(text, file=sys.stderr)
+
+
+def run_tracemalloc(function: Callable[[], None], stats_file: str, top: int) -> None:
+    tracemalloc.start()
+    try:
+        function()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot.dump(stats_file)
+        print(f"peak traced memory: {peak / 2 ** 20:.1f} MiB", file=sys.stderr)
+        for stat in snapshot.statistics("lineno")[:top]:
+            print(stat, file=sys.stderr)
+
+
+PROFILE_RUNNERS = {
+    "cprofile": run_cprofile,
+    "sampling": run_sampling,
+    "tracemalloc": run_tracemalloc,
+}
+
+
+def profiled(function: Callable[[], None]) -> Callable[[], None]:
+    """ wrap an endpoint so that it runs under the profiler selected in ConfigProfile """
+    @functools.wraps(function)
+    def wrapper() -> None:
+        if ConfigProfile.profile == "none":
+            function()
+            return
+        logger = logging.getLogger()
+        runner = PROFILE_RUNNERS[ConfigProfile.profile]
+        # the tracer collects call latencies even when no trace output was asked for
+        TRACER.enabled = True
+        latency_before = TRACER.total_latency()
+        wall_before = time.perf_counter()
+        cpu_before = time.process_time()
+        try:
+            runner(function, ConfigProfile.profile_file, ConfigProfile.profile_top)
+        finally:
+            wall = time.perf_counter() - wall_before
+            cpu = time.process_time() - cpu_before
+            wait = TRACER.network_wait(wall_before)
+            latency = TRACER.total_latency() - latency_before
+            logger.info(f"wrote [{ConfigProfile.profile}] profile to [{ConfigProfile.profile_file}]")
+            print(f"wall {wall:.3f}s, cpu {cpu:.3f}s, network wait {wait:.3f}s (calls summed over threads {latency:.3f}s)", file=sys.stderr)
+    return wrapper
@@ -0,0 +1,125 @@
+"""
+progress.py
+
+Progress reporting for long running loops.
+
+Progress is emitted on a time basis (every --progress-interval seconds and at the
+end) rather than every N items, with a moving-average rate, an ETA and the rate of
+quota consumption. A Progress object may be advanced from several worker threads,
+in which case it reports the aggregate. When --progress-fd is given, every emission
+is also written as a JSON line to that file descriptor for orchestration tooling.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import IO
+
+from pytubekit.configs import ConfigProgress
+
+# how far back (seconds) the moving-average rate looks
+RATE_WINDOW = 30.0
+
+_streams: dict[int, IO[str]] = {}
+
+
+def get_progress_stream(fd: int | None) -> IO[str] | None:
+    if fd is None:
+        return None
+    if fd not in _streams:
+        # pylint: disable=consider-using-with
+        _streams[fd] = os.fdopen(fd, "w", encoding="utf-8", closefd=False)
+    return _streams[fd]
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    def __init__(
+        self,
+        total: int,
+        label: str = "progress",
+        interval: float = 5.0,
+        stream: IO[str] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.stream = stream
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.done = 0
+        self.quota = 0
+        self.per_worker: dict[str, int] = {}
+        self.start = clock()
+        self.last_emit = self.start
+        self.samples: deque[tuple[float, int, int]] = deque([(self.start, 0, 0)])
+        self.logger = logging.getLogger()
+
+    def rates(self, now: float) -> tuple[float, float]:
+        """ items per second and quota units per second over the last RATE_WINDOW seconds """
+        while len(self.samples) > 1 and now - self.samples[0][0] > RATE_WINDOW:
+            self.samples.popleft()
+        first_time, first_done, first_quota = self.samples[0]
+        elapsed = now - first_time
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (self.done - first_done) / elapsed, (self.quota - first_quota) / elapsed
+
+    def advance(self, n: int = 1, quota: int = 0) -> None:
+        worker = threading.current_thread().name
+        with self.lock:
+            self.done += n
+            self.quota += quota
+            self.per_worker[worker] = self.per_worker.get(worker, 0) + n
+            now = self.clock()
+            if now - self.samples[-1][0] >= 1.0:
+                self.samples.append((now, self.done, self.quota))
+            if self.done >= self.total or now - self.last_emit >= self.interval:
+                self.emit(now)
+
+    def emit(self, now: float) -> None:
+        self.last_emit = now
+        rate, quota_rate = self.rates(now)
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        message = f"{self.label}: {self.done}/{self.total} ({percent:.1f}%) {rate:.1f} items/s eta {format_eta(eta)}"
+        if self.quota:
+            message += f" quota {self.quota} units ({quota_rate:.1f}/s)"
+        if len(self.per_worker) > 1:
+            message += f" workers {len(self.per_worker)}"
+        self.logger.info(message)
+        if self.stream is not None:
+            record = {
+                "time": time.time(),
+                "label": self.label,
+                "done": self.done,
+                "total": self.total,
+                "elapsed": round(now - self.start, 3),
+                "rate": round(rate, 3),
+                "eta": None if eta is None else round(eta, 1),
+                "quota": self.quota,
+                "quota_rate": round(quota_rate, 3),
+                "workers": dict(self.per_worker),
+            }
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+
+def create_progress(total: int, label: str = "progress") -> Progress:
+    """ create a Progress configured from the global ConfigProgress options """
+    return Progress(
+        total=total,
+        label=label,
+        interval=ConfigProgress.progress_interval,
+        stream=get_progress_stream(ConfigProgress.progress_fd),
+    )
@@ -0,0 +1,74 @@
+"""
+records.py
+
+Compact records of playlist items.
+
+A playlistItems.list resource is a nested dict of several kilobytes (etags,
+thumbnails in five sizes, descriptions) of which the library reads a handful of
+fields. Items are parsed into slotted PlaylistItem records page by page, as they
+are listed, so a cleanup over every playlist of a large account holds a few
+hundred bytes per item instead. Strings which repeat across items (video ids of
+duplicates, playlist ids, channel names, the titles of deleted and private
+videos) are interned so equal values share one object. The resource itself is
+only kept when asked for (full output).
+
+The planner and util accept items as records or as resources through the
+get_item_* accessors.
+"""
+import sys
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class PlaylistItem:
+    id: str
+    playlist_id: str
+    video_id: str
+    title: str
+    channel: str
+    position: int | None
+    published_at: str
+    # the playlistItems.list resource, only kept by from_resource(keep_raw=True)
+    raw: dict[str, Any] | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_resource(cls, resource: dict[str, Any], keep_raw: bool = False) -> "PlaylistItem":
+        snippet = resource["snippet"]
+        return cls(
+            id=resource["id"],
+            playlist_id=sys.intern(snippet.get("playlistId", "")),
+            video_id=sys.intern(snippet["resourceId"]["videoId"]),
+            title=sys.intern(snippet.get("title", "")),
+            channel=sys.intern(snippet.get("videoOwnerChannelTitle", "")),
+            position=snippet.get("position"),
+            published_at=snippet.get("publishedAt", ""),
+            raw=resource if keep_raw else None,
+        )
+
+
+Item = dict[str, Any] | PlaylistItem
+
+
+def get_item_id(item: Item) -> str:
+    if isinstance(item, PlaylistItem):
+        return item.id
+    return item["id"]
+
+
+def get_item_video_id(item: Item) -> str:
+    if isinstance(item, PlaylistItem):
+        return item.video_id
+    return item["snippet"]["resourceId"]["videoId"]
+
+
+def get_item_playlist_id(item: Item) -> str:
+    if isinstance(item, PlaylistItem):
+        return item.playlist_id
+    return item["snippet"].get("playlistId", "")
+
+
+def get_item_title(item: Item) -> str:
+    if isinstance(item, PlaylistItem):
+        return item.title
+    return item["snippet"]["title"]
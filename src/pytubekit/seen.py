@@ -0,0 +1,189 @@
+"""
+seen.py
+
+The set of videos already seen, kept on disk and grown incrementally.
+
+The set is a folder holding:
+
+    bloom      a Bloom filter of the ids (1% false positives at capacity), which
+               answers most lookups of unseen videos without touching ids
+    ids        every video id once, sorted, in fixed width records (id + newline),
+               so membership is a binary search over the file without loading it
+    meta.json  the capacity and the size and modification time of every dump
+               file added, so adding a folder again only reads the files that
+               changed
+
+The files are replaced in that order, so an interrupted save leaves a filter
+with extra bits (more false positives, which ids corrects) and never one that
+misses an id of the ids file.
+
+Adding videos sets their bits in the filter and merges the new ids into the
+sorted file; nothing is rebuilt, except the filter when the set outgrows its
+capacity (which then doubles). left_to_see streams the videos of a playlist or
+channel past the set.
+"""
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+
+from pytubekit.fileio import write_atomically
+from pytubekit.sketch import list_dump_files
+from pytubekit.streams import iter_video_ids
+
+SEEN_VERSION = 1
+VIDEO_ID_LENGTH = 11
+RECORD_LENGTH = VIDEO_ID_LENGTH + 1
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 100000
+IDS_FILE = "ids"
+BLOOM_FILE = "bloom"
+META_FILE = "meta.json"
+# bits, hashes
+BLOOM_HEADER = struct.Struct(">QB")
+
+
+def bloom_parameters(capacity: int) -> tuple[int, int]:
+    """ (bits, hashes) of a Bloom filter holding capacity ids at FALSE_POSITIVE_RATE """
+    bits = math.ceil(-capacity * math.log(FALSE_POSITIVE_RATE) / math.log(2) ** 2)
+    bits = (bits + 7) // 8 * 8
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    def __init__(self, bits: int, hashes: int, data: bytearray | None = None) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self.data = data if data is not None else bytearray(bits // 8)
+
+    def positions(self, video_id: str) -> Iterator[int]:
+        digest = hashlib.blake2b(video_id.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, video_id: str) -> None:
+        for position in self.positions(video_id):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, video_id: str) -> bool:
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self.positions(video_id))
+
+
+def find_record(data: bytes | mmap.mmap, record: bytes) -> tuple[bool, int]:
+    """ whether the sorted fixed width records of data hold record, and the index it is (or would be) at """
+    low, high = 0, len(data) // RECORD_LENGTH
+    while low < high:
+        middle = (low + high) // 2
+        current = data[middle * RECORD_LENGTH:(middle + 1) * RECORD_LENGTH]
+        if current < record:
+            low = middle + 1
+        else:
+            high = middle
+    found = low < len(data) // RECORD_LENGTH and data[low * RECORD_LENGTH:(low + 1) * RECORD_LENGTH] == record
+    return found, low
+
+
+class SeenSet:
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        self.files: dict[str, list[int]] = {}
+        self.capacity = MIN_CAPACITY
+        self.data: bytes | mmap.mmap = b""
+        bits, hashes = bloom_parameters(self.capacity)
+        self.bloom = BloomFilter(bits, hashes)
+        meta_path = os.path.join(folder, META_FILE)
+        if os.path.isfile(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.files = meta["files"]
+            self.capacity = meta["capacity"]
+            with open(os.path.join(folder, BLOOM_FILE), "rb") as f:
+                bits, hashes = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+                self.bloom = BloomFilter(bits, hashes, bytearray(f.read()))
+            self.map_ids()
+
+    def map_ids(self) -> None:
+        path = os.path.join(self.folder, IDS_FILE)
+        if os.path.getsize(path) == 0:
+            self.data = b""
+            return
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.data) // RECORD_LENGTH
+
+    def __contains__(self, video_id: str) -> bool:
+        if video_id not in self.bloom:
+            return False
+        return find_record(self.data, video_id.encode() + b"\n")[0]
+
+    def add(self, video_ids: Iterable[str]) -> int:
+        """ add video ids (ones of a length other than VIDEO_ID_LENGTH are skipped); returns how many were new """
+        logger = logging.getLogger()
+        new: set[bytes] = set()
+        skipped = 0
+        for video_id in video_ids:
+            if len(video_id) != VIDEO_ID_LENGTH:
+                skipped += 1
+                continue
+            if video_id not in self:
+                new.add(video_id.encode() + b"\n")
+        if skipped:
+            logger.warning(f"skipped [{skipped}] ids which are not video ids")
+        if not new:
+            return 0
+        records = sorted(new)
+        parts: list[bytes] = []
+        previous = 0
+        for record in records:
+            index = find_record(self.data, record)[1] * RECORD_LENGTH
+            parts.append(self.data[previous:index])
+            parts.append(record)
+            previous = index
+        parts.append(self.data[previous:])
+        self.data = b"".join(parts)
+        if len(self) > self.capacity:
+            self.grow()
+        else:
+            for record in records:
+                self.bloom.add(record[:VIDEO_ID_LENGTH].decode())
+        return len(records)
+
+    def grow(self) -> None:
+        """ a filter of twice the capacity needed, built from the ids """
+        while self.capacity < len(self):
+            self.capacity *= 2
+        bits, hashes = bloom_parameters(self.capacity)
+        self.bloom = BloomFilter(bits, hashes)
+        for start in range(0, len(self.data), RECORD_LENGTH):
+            self.bloom.add(self.data[start:start + VIDEO_ID_LENGTH].decode())
+
+    def add_files(self, paths: list[str]) -> tuple[int, int]:
+        """ add the dump files under paths which were not added yet or changed since; returns (files read, new ids) """
+        read = 0
+        added = 0
+        for path in list_dump_files(paths):
+            stat = os.stat(path)
+            key = os.path.abspath(path)
+            if self.files.get(key) == [stat.st_size, stat.st_mtime_ns]:
+                continue
+            added += self.add(iter_video_ids(path))
+            self.files[key] = [stat.st_size, stat.st_mtime_ns]
+            read += 1
+        return read, added
+
+    def save(self) -> None:
+        header = BLOOM_HEADER.pack(self.bloom.bits, self.bloom.hashes)
+        write_atomically(os.path.join(self.folder, BLOOM_FILE), header + bytes(self.bloom.data))
+        write_atomically(os.path.join(self.folder, IDS_FILE), bytes(self.data))
+        meta = {"version": SEEN_VERSION, "capacity": self.capacity, "files": self.files}
+        write_atomically(os.path.join(self.folder, META_FILE), json.dumps(meta).encode())
+        self.map_ids()
@@ -0,0 +1,164 @@
+"""
+serve.py
+
+The serve daemon.
+
+It keeps one process alive with a warm service object (credentials already
+loaded and refreshed, discovery document already parsed) and with the playlist
+catalog and playlist items cached (see cache.py), and runs endpoint invocations
+sent by the thin client (client.py) over a Unix socket. Invocations run one at a
+time, in the working directory of the client, with their stdout, stderr and log
+output streamed back to the client as they are produced.
+
+The protocol is JSON lines. The client sends {"args": [...], "cwd": "..."}; the
+daemon answers with any number of {"stream": "stdout" | "stderr", "data": "..."}
+frames followed by a single {"exit": code} frame.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+import traceback
+from collections.abc import Callable
+from typing import Any
+
+from pytubekit.cache import CACHE
+from pytubekit.session import NOT_IN_SESSION, Session
+
+
+def send_frame(wfile: io.BufferedIOBase, frame: dict[str, Any], lock: threading.Lock) -> None:
+    with lock:
+        wfile.write((json.dumps(frame) + "\n").encode())
+        wfile.flush()
+
+
+class FrameWriter(io.TextIOBase):
+    """ a text stream that forwards everything written to it as frames of one stream name """
+    def __init__(self, wfile: io.BufferedIOBase, name: str, lock: threading.Lock) -> None:
+        super().__init__()
+        self.wfile = wfile
+        self.name = name
+        self.lock = lock
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        if s:
+            send_frame(self.wfile, {"stream": self.name, "data": s}, self.lock)
+        return len(s)
+
+
+class ServeHandler(socketserver.StreamRequestHandler):
+    server: "ServeServer"
+
+    def handle(self) -> None:
+        logger = logging.getLogger()
+        lock = threading.Lock()
+        try:
+            request = json.loads(self.rfile.readline())
+            args = [str(arg) for arg in request["args"]]
+            cwd = request.get("cwd")
+        except (ValueError, KeyError, TypeError):
+            send_frame(self.wfile, {"stream": "stderr", "data": "bad request\n"}, lock)
+            send_frame(self.wfile, {"exit": 2}, lock)
+            return
+        stdout = FrameWriter(self.wfile, "stdout", lock)
+        stderr = FrameWriter(self.wfile, "stderr", lock)
+        try:
+            code = self.server.run(args, cwd, stdout, stderr)
+            send_frame(self.wfile, {"exit": code}, lock)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.warning(f"client of {args} went away")
+
+
+class ServeServer(socketserver.UnixStreamServer):
+    """ serves one connection at a time: Config values and the working directory are process wide """
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+        remove_stale_socket(socket_path)
+        # the daemon holds the credentials, so only the owner may talk to it
+        with restricted_umask():
+            super().__init__(socket_path, ServeHandler)
+        self.session = Session()
+
+    def run(self, args: list[str], cwd: str | None, stdout: io.TextIOBase, stderr: io.TextIOBase) -> int:
+        if not args:
+            print("no command given", file=stderr)
+            return 2
+        if args[0] in NOT_IN_SESSION:
+            print(f"[{args[0]}] can not be run inside the daemon", file=stderr)
+            return 2
+        root = logging.getLogger()
+        saved_handlers = root.handlers[:]
+        handler = logging.StreamHandler(stderr)
+        if saved_handlers:
+            handler.setFormatter(saved_handlers[0].formatter)
+        saved_cwd = os.getcwd()
+        root.handlers = [handler]
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                if cwd is not None:
+                    os.chdir(cwd)
+                try:
+                    return self.session.invoke(args)
+                except Exception:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+                    traceback.print_exc(file=stderr)
+                    return 1
+        finally:
+            os.chdir(saved_cwd)
+            root.handlers = saved_handlers
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+
+@contextlib.contextmanager
+def restricted_umask():
+    old = os.umask(0o077)
+    try:
+        yield
+    finally:
+        os.umask(old)
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """ remove a socket left behind by a dead daemon; refuse to start next to a live one """
+    if not os.path.exists(socket_path):
+        return
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise ValueError(f"[{socket_path}] exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise ValueError(f"a daemon is already listening on [{socket_path}]")
+
+
+def run_daemon(socket_path: str, cache_ttl: int, warm: Callable[[], Any] | None = None) -> None:
+    """ serve until interrupted; warm is called once (with caching on) to preload the service and catalog """
+    logger = logging.getLogger()
+    CACHE.enable(cache_ttl if cache_ttl > 0 else None)
+    server = ServeServer(socket_path)
+    try:
+        if warm is not None:
+            try:
+                warm()
+            except Exception as e:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+                logger.warning(f"warm up failed, continuing cold: {e}")
+        logger.info(f"serving on [{socket_path}]")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        CACHE.disable()
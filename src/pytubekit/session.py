@@ -0,0 +1,47 @@
+"""
+session.py
+
+Running several endpoint invocations in one process.
+
+pytconf keeps parsed flags as attributes of the Config classes, so an invocation
+would leak its flags into the next one. A Session snapshots every registered
+config value once and restores it before each invocation, and turns the exit of
+an invocation (normal return, sys.exit or a pytconf argument error) into an exit
+code.
+"""
+import logging
+from typing import Any
+
+from pytconf.config import get_pytconf, the_registry
+
+# endpoints which can not run as one invocation of a session (the steps of run, the daemon of serve):
+# serve and fake_api never return, benchmark resets the process wide tracer under the invocations around it
+NOT_IN_SESSION = {"serve", "fake_api", "benchmark"}
+
+
+class Session:
+    def __init__(self) -> None:
+        self.defaults: dict[tuple[Any, str], Any] = {}
+        for config in the_registry.yield_configs():
+            for name in the_registry.yield_names_for_config(config):
+                self.defaults[(config, name)] = getattr(config, name)
+
+    def restore(self) -> None:
+        for (config, name), value in self.defaults.items():
+            setattr(config, name, value)
+
+    def invoke(self, args: list[str]) -> int:
+        """ run one invocation given as command line arguments (command first); returns its exit code """
+        logger = logging.getLogger()
+        self.restore()
+        logger.debug(f"invoking {args}")
+        try:
+            # on a bad command line pytconf prints the errors and calls sys.exit(1)
+            get_pytconf().config_arg_parse_and_launch(args=list(args))
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            return e.code if isinstance(e.code, int) else 1
+        finally:
+            self.restore()
+        return 0
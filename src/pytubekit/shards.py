@@ -0,0 +1,319 @@
+"""
+shards.py
+
+Spreading API calls over several Google Cloud projects.
+
+Every project has its own daily quota (10,000 units unless raised), so a merge
+or a sort of a few thousand items takes days through one project. A shard is a
+folder holding the OAuth client secret of one project (client_secret.json) and
+the token the account authorized for it (token.json, written by the browser
+flow the first time the shard is used). With shards configured, every API call
+goes through one of them, picked round robin (in turn) or least used (the one
+which spent the fewest units today), so several projects work through a job
+together.
+
+Each shard keeps a ledger of the units it spent on the current quota day
+(quotas reset at midnight Pacific time), in SQLite, so that several processes
+using the same shards (a run script next to a serve daemon) add up their spend
+instead of overwriting one another. A shard whose ledger has no room left
+for a call, or for which the API answers quotaExceeded, is skipped until the
+next quota day and the call goes to another shard. QuotaExhausted is raised
+only when no shard is left.
+
+Page tokens and item ids are not tied to a project, so the pages of one listing
+may well come from different shards.
+"""
+import contextlib
+import datetime
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zoneinfo
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.errors import HttpError
+
+from pytubekit.constants import DAILY_QUOTA, LEAST_USED, ROUND_ROBIN
+from pytubekit.fileio import write_atomically
+from pytubekit.tracing import get_quota_cost
+
+QUOTA_TIMEZONE = "America/Los_Angeles"
+CLIENT_SECRET_FILE = "client_secret.json"
+TOKEN_FILE = "token.json"
+# reasons of a 403 which only the next quota day cures
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+def quota_day(now: float | None = None) -> str:
+    """ the quota day (a date in Pacific time, when quotas reset) of now """
+    moment = datetime.datetime.fromtimestamp(time.time() if now is None else now, zoneinfo.ZoneInfo(QUOTA_TIMEZONE))
+    return moment.date().isoformat()
+
+
+def get_error_reason(e: HttpError) -> str:
+    """ the reason of the first error of an API error response (e.g. quotaExceeded), "" when it has none """
+    try:
+        return json.loads(e.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ""
+
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    day TEXT PRIMARY KEY,
+    used INTEGER NOT NULL,
+    exhausted INTEGER NOT NULL
+);
+"""
+
+
+class Ledger:
+    """
+    the units one shard spent on the current quota day. With a path the ledger is a SQLite database
+    which every process using the shard adds its spend to, in one statement, and reads back before it
+    picks a shard; path None keeps it in memory, for this process only
+    """
+    def __init__(self, path: str | None, limit: int = DAILY_QUOTA, timeout: float = 60) -> None:
+        self.path = path
+        self.limit = limit
+        # how long to wait for another process writing the ledger
+        self.timeout = timeout
+        self.day = ""
+        self.used = 0
+        self.exhausted = False
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with contextlib.closing(self.connect()) as connection:
+                connection.executescript(LEDGER_SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        assert self.path is not None
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    def roll(self, day: str) -> None:
+        """ bring the ledger up to day: what every process spent on it, or nothing for a new day """
+        if self.path is None:
+            if day != self.day:
+                self.day, self.used, self.exhausted = day, 0, False
+            return
+        with contextlib.closing(self.connect()) as connection:
+            row = connection.execute("SELECT used, exhausted FROM ledger WHERE day = ?", (day,)).fetchone()
+        used, exhausted = row if row is not None else (0, 0)
+        self.day, self.used, self.exhausted = day, used, bool(exhausted)
+
+    def has_room(self, cost: int) -> bool:
+        return not self.exhausted and self.used + cost <= self.limit
+
+    def add(self, day: str, cost: int, exhausted: bool = False) -> None:
+        """ add cost units (and mark the shard exhausted if asked) to the spend of day """
+        if self.path is None:
+            self.roll(day)
+            self.used += cost
+            self.exhausted = self.exhausted or exhausted
+            return
+        with contextlib.closing(self.connect()) as connection:
+            connection.execute(
+                "INSERT INTO ledger (day, used, exhausted) VALUES (?, ?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET used = used + excluded.used, exhausted = MAX(exhausted, excluded.exhausted)",
+                (day, cost, int(exhausted)),
+            )
+        self.roll(day)
+
+
+@dataclass
+class Shard:
+    name: str
+    folder: str
+    ledger: Ledger
+
+
+class ShardSet:
+    """ the shards of a process and which one takes the next call; shared by all threads """
+    def __init__(self, shards: list[Shard], policy: str = ROUND_ROBIN, clock: Callable[[], str] = quota_day) -> None:
+        if not shards:
+            raise ValueError("no shards given")
+        self.shards = shards
+        self.policy = policy
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.next = 0
+
+    @classmethod
+    def from_folders(cls, folders: list[str], ledger_folder: str | None, limit: int, policy: str) -> "ShardSet":
+        """ one shard per folder, named after it, with its ledger in ledger_folder (None keeps ledgers in memory) """
+        shards = []
+        for folder in folders:
+            name = os.path.basename(os.path.normpath(folder))
+            ledger_path = None if ledger_folder is None else os.path.join(ledger_folder, f"{name}.sqlite")
+            shards.append(Shard(name, folder, Ledger(ledger_path, limit)))
+        if len({shard.name for shard in shards}) < len(shards):
+            raise ValueError("shard folders must have different names, their ledgers are kept by name")
+        return cls(shards, policy)
+
+    def pick(self, cost: int) -> Shard | None:
+        """ the shard to send a call of cost units to, None when none has room for it """
+        day = self.clock()
+        with self.lock:
+            for shard in self.shards:
+                shard.ledger.roll(day)
+            candidates = [i for i, shard in enumerate(self.shards) if shard.ledger.has_room(cost)]
+            if not candidates:
+                return None
+            if self.policy == LEAST_USED:
+                index = min(candidates, key=lambda i: self.shards[i].ledger.used)
+            else:
+                index = next((i for i in candidates if i >= self.next), candidates[0])
+                self.next = index + 1
+            return self.shards[index]
+
+    def charge(self, shard: Shard, cost: int) -> None:
+        day = self.clock()
+        with self.lock:
+            shard.ledger.add(day, cost)
+
+    def exhaust(self, shard: Shard) -> None:
+        logging.getLogger().warning(f"shard [{shard.name}] is out of quota for today, moving on to the next one")
+        day = self.clock()
+        with self.lock:
+            shard.ledger.add(day, 0, exhausted=True)
+
+    def status(self) -> list[dict[str, Any]]:
+        day = self.clock()
+        with self.lock:
+            for shard in self.shards:
+                shard.ledger.roll(day)
+            return [
+                {
+                    "name": shard.name,
+                    "day": shard.ledger.day,
+                    "used": shard.ledger.used,
+                    "limit": shard.ledger.limit,
+                    "exhausted": shard.ledger.exhausted,
+                }
+                for shard in self.shards
+            ]
+
+
+@functools.cache
+def get_shard_set(folders: tuple[str, ...], ledger_folder: str | None, limit: int, policy: str) -> ShardSet:
+    """ the process wide ShardSet of a configuration, so that every thread and client shares its ledgers """
+    return ShardSet.from_folders(list(folders), ledger_folder, limit, policy)
+
+
+# folder -> lock, so that the worker threads of a shard refresh its token (or run the browser flow) once
+CREDENTIAL_LOCKS: dict[str, threading.Lock] = {}
+CREDENTIAL_LOCKS_LOCK = threading.Lock()
+
+
+def get_credential_lock(folder: str) -> threading.Lock:
+    with CREDENTIAL_LOCKS_LOCK:
+        return CREDENTIAL_LOCKS.setdefault(os.path.realpath(folder), threading.Lock())
+
+
+def load_credentials(folder: str, scopes: list[str]) -> Credentials:
+    """
+    the credentials of the token in folder, refreshed, or authorized in the browser with its client secret;
+    threads asking for the same folder wait for the first, and then find its fresh token
+    """
+    with get_credential_lock(folder):
+        return load_credentials_locked(folder, scopes)
+
+
+def load_credentials_locked(folder: str, scopes: list[str]) -> Credentials:
+    token_path = os.path.join(folder, TOKEN_FILE)
+    credentials = None
+    if os.path.isfile(token_path):
+        credentials = Credentials.from_authorized_user_file(token_path, scopes)
+    if credentials is not None and credentials.valid:
+        return credentials
+    if credentials is not None and credentials.expired and credentials.refresh_token:
+        credentials.refresh(Request())
+    else:
+        flow = InstalledAppFlow.from_client_secrets_file(os.path.join(folder, CLIENT_SECRET_FILE), scopes)
+        credentials = flow.run_local_server(port=0)
+    write_atomically(token_path, credentials.to_json().encode())
+    return credentials
+
+
+class ShardedRequest:
+    """ a request which is built and executed on the service object of a shard when it is executed """
+    def __init__(self, youtube: "ShardedYouTube", resource: str, method: str, kwargs: dict[str, Any]) -> None:
+        self.youtube = youtube
+        self.resource = resource
+        self.method = method
+        self.kwargs = kwargs
+        # read by tracing.get_request_method()
+        self.methodId = f"youtube.{resource}.{method}"
+
+    def execute(self) -> Any:
+        cost = get_quota_cost(self.methodId)
+        shard_set = self.youtube.shard_set
+        while True:
+            shard = shard_set.pick(cost)
+            if shard is None:
+                raise QuotaExhausted(f"every shard is out of quota for today ({self.methodId} costs {cost} units)")
+            service = self.youtube.get_service(shard)
+            request = getattr(getattr(service, self.resource)(), self.method)(**self.kwargs)
+            try:
+                response = request.execute()
+            except HttpError as e:
+                if e.resp.status == 403 and get_error_reason(e) in QUOTA_REASONS:
+                    shard_set.exhaust(shard)
+                    continue
+                shard_set.charge(shard, cost)
+                raise
+            shard_set.charge(shard, cost)
+            return response
+
+
+class ShardedYouTube:
+    """
+    stands in for a service object, sending every request through a shard of shard_set; like a service
+    object it is not thread safe (it holds one service object per shard, built by build), use one per thread
+    """
+    def __init__(self, shard_set: ShardSet, build: Callable[[Shard], Any]) -> None:
+        self.shard_set = shard_set
+        self.build = build
+        self.services: dict[str, Any] = {}
+
+    def get_service(self, shard: Shard) -> Any:
+        if shard.name not in self.services:
+            self.services[shard.name] = self.build(shard)
+        return self.services[shard.name]
+
+    def __getattr__(self, resource: str) -> Callable[[], Any]:
+        if resource.startswith("_"):
+            raise AttributeError(resource)
+
+        def get_resource() -> Any:
+            return ShardedResource(self, resource)
+        return get_resource
+
+
+class ShardedResource:
+    def __init__(self, youtube: ShardedYouTube, resource: str) -> None:
+        self.youtube = youtube
+        self.resource = resource
+
+    def __getattr__(self, method: str) -> Callable[..., ShardedRequest]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def make_request(**kwargs: Any) -> ShardedRequest:
+            return ShardedRequest(self.youtube, self.resource, method, kwargs)
+        return make_request
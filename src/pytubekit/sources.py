@@ -0,0 +1,133 @@
+"""
+sources.py
+
+Where a Client reads playlists and their items from.
+
+ApiSource reads them from the YouTube Data API (one quota unit per page of 50).
+YtDlpSource reads them the way the web site shows them, through yt-dlp flat
+extraction, which costs no quota at all and can also list the Watch Later
+playlist (WL), which the API refuses to list. It returns resources of the same
+shape as the API (see PagedRequest), holding what a flat extraction knows: ids,
+titles, channels and positions. Its items have no playlist item ids, so
+playlists read through it can not be changed.
+
+list_records() gives the items as PlaylistItem records (see records.py), parsed
+page by page.
+"""
+import functools
+from collections.abc import Callable
+from typing import Any
+
+from pytubekit.constants import DELETED_TITLE, MAX_PAGE_SIZE, PRIVATE_TITLE
+from pytubekit.records import PlaylistItem
+from pytubekit.util import create_playlist_request, create_playlists_request
+from pytubekit.youtube import youtube_dl_flat_extract
+
+API_SOURCE = "api"
+YTDLP_SOURCE = "ytdlp"
+SOURCES = [API_SOURCE, YTDLP_SOURCE]
+
+PLAYLISTS_FEED_URL = "https://www.youtube.com/feed/playlists"
+WATCH_LATER_ID = "WL"
+WATCH_LATER_TITLE = "Watch later"
+# how the web site titles entries which the API titles DELETED_TITLE and PRIVATE_TITLE
+YTDLP_TITLES = {"[Deleted video]": DELETED_TITLE, "[Private video]": PRIVATE_TITLE}
+
+
+class ApiSource:
+    writable = True
+
+    def __init__(self, get_youtube: Callable[[], Any], page_size: int = MAX_PAGE_SIZE) -> None:
+        self.get_youtube = get_youtube
+        self.page_size = page_size
+
+    def list_playlists(self) -> list[dict[str, Any]]:
+        return create_playlists_request(self.get_youtube(), self.page_size).get_all_items()
+
+    def list_items(self, playlist_id: str) -> list[dict[str, Any]]:
+        return create_playlist_request(self.get_youtube(), playlist_id, self.page_size).get_all_items()
+
+    def list_records(self, playlist_id: str, keep_raw: bool = False) -> list[PlaylistItem]:
+        convert = functools.partial(PlaylistItem.from_resource, keep_raw=keep_raw)
+        return create_playlist_request(self.get_youtube(), playlist_id, self.page_size).get_all_items(convert)
+
+
+def uploads_playlist_id(playlist_id: str) -> str:
+    """ a channel id stands for the playlist of its uploads (UC... -> UU...), any other id for itself """
+    if playlist_id.startswith("UC") and len(playlist_id) == 24:
+        return "UU" + playlist_id[2:]
+    return playlist_id
+
+
+def get_playlist_url(playlist_id: str) -> str:
+    """ the url of a playlist; a channel id stands for the playlist of its uploads """
+    return f"https://www.youtube.com/playlist?list={uploads_playlist_id(playlist_id)}"
+
+
+def make_playlist_resource(playlist_id: str, title: str, item_count: int | None) -> dict[str, Any]:
+    resource: dict[str, Any] = {
+        "kind": "youtube#playlist",
+        "id": playlist_id,
+        "snippet": {"title": title},
+        "contentDetails": {},
+    }
+    # a flat listing of the playlists feed does not always know their sizes
+    if item_count is not None:
+        resource["contentDetails"]["itemCount"] = item_count
+    return resource
+
+
+def make_item_resource(playlist_id: str, position: int, entry: dict[str, Any]) -> dict[str, Any]:
+    video_id = entry["id"]
+    title = entry.get("title") or ""
+    return {
+        "kind": "youtube#playlistItem",
+        "id": "",
+        "snippet": {
+            "playlistId": playlist_id,
+            "position": position,
+            "title": YTDLP_TITLES.get(title, title),
+            "videoOwnerChannelTitle": entry.get("channel") or entry.get("uploader") or "",
+            "videoOwnerChannelId": entry.get("channel_id") or "",
+            "resourceId": {"kind": "youtube#video", "videoId": video_id},
+        },
+        "contentDetails": {"videoId": video_id},
+    }
+
+
+class YtDlpSource:
+    writable = False
+
+    def __init__(
+        self,
+        cookies_from_browser: str | None = None,
+        cookie_file: str | None = None,
+        extract: Callable[[str], dict[str, Any]] | None = None,
+    ) -> None:
+        """ extract (url -> flat info dict) defaults to yt-dlp with the given cookies """
+        if extract is None:
+            def flat_extract(url: str) -> dict[str, Any]:
+                return youtube_dl_flat_extract(url, cookies_from_browser, cookie_file)
+            extract = flat_extract
+        self.extract = extract
+
+    def list_playlists(self) -> list[dict[str, Any]]:
+        """ the playlists of the account (from the cookies), Watch Later first """
+        resources = [make_playlist_resource(WATCH_LATER_ID, WATCH_LATER_TITLE, None)]
+        for entry in self.extract(PLAYLISTS_FEED_URL).get("entries") or []:
+            if entry.get("id") and entry["id"] != WATCH_LATER_ID:
+                resources.append(make_playlist_resource(entry["id"], entry.get("title") or "", entry.get("playlist_count")))
+        return resources
+
+    def list_items(self, playlist_id: str) -> list[dict[str, Any]]:
+        entries = self.extract(get_playlist_url(playlist_id)).get("entries") or []
+        return [
+            make_item_resource(playlist_id, position, entry)
+            for position, entry in enumerate(entry for entry in entries if entry and entry.get("id"))
+        ]
+
+    def list_records(self, playlist_id: str, keep_raw: bool = False) -> list[PlaylistItem]:
+        return [PlaylistItem.from_resource(resource, keep_raw) for resource in self.list_items(playlist_id)]
+
+
+ItemSource = ApiSource | YtDlpSource
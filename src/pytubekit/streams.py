@@ -0,0 +1,112 @@
+"""
+streams.py
+
+Compressed dump files and JSON lines.
+
+Dump files can be written gzip or zstd compressed (zstd needs zstandard, which
+is optional: pip install zstandard). Readers do not look at file names: they
+check the first bytes of a file for the gzip or zstd magic and decompress as
+they read, line by line, so compressed and plain dumps mix freely and are never
+held in memory whole.
+
+Full dumps can be written as JSON lines, one compact item per line, so they can
+be read as a stream; orjson is used to encode and decode them when it is
+installed. A line of a dump file is either a video id or such an item.
+"""
+import functools
+import gzip
+import io
+import json
+from collections.abc import Callable, Iterator
+from typing import IO, Any
+
+NONE = "none"
+GZIP = "gzip"
+ZSTD = "zstd"
+COMPRESSIONS = [NONE, GZIP, ZSTD]
+SUFFIXES = {GZIP: ".gz", ZSTD: ".zst"}
+MAGICS = {GZIP: b"\x1f\x8b", ZSTD: b"\x28\xb5\x2f\xfd"}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def import_zstandard() -> Any:
+    try:
+        # pylint: disable=import-outside-toplevel
+        import zstandard
+    except ImportError as e:
+        raise ValueError("zstd compression needs zstandard: pip install zstandard") from e
+    return zstandard
+
+
+@functools.cache
+def get_json_codec() -> tuple[Callable[[Any], bytes], Callable[[str | bytes], Any]]:
+    """ (encode, decode) of orjson if it is installed, of the json module otherwise """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import orjson
+    except ImportError:
+        def encode(data: Any) -> bytes:
+            return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        return encode, json.loads
+    return orjson.dumps, orjson.loads  # pylint: disable=no-member
+
+
+def detect_compression(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(4)
+    for compression, magic in MAGICS.items():
+        if head.startswith(magic):
+            return compression
+    return NONE
+
+
+def strip_suffix(name: str) -> str:
+    """ the name of a dump file without the suffix its compression added """
+    for suffix in SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def open_text(path: str) -> IO[str]:
+    """ a text file open for reading, decompressed as it is read if it is compressed """
+    compression = detect_compression(path)
+    if compression == GZIP:
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == ZSTD:
+        # the reader closes the file when it is closed
+        # pylint: disable=consider-using-with
+        reader = import_zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)  # noqa: SIM115
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def open_binary_writer(path: str, compression: str = NONE) -> io.BufferedIOBase:
+    """ a file open for writing bytes, compressed as they are written """
+    if compression == GZIP:
+        return gzip.open(path, "wb", compresslevel=GZIP_LEVEL)
+    if compression == ZSTD:
+        # pylint: disable=consider-using-with
+        return import_zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb")
+
+
+def encode_json_line(data: Any) -> bytes:
+    return get_json_codec()[0](data) + b"\n"
+
+
+def parse_video_id(line: str) -> str:
+    """ the video id of a line of a dump file: the line itself, or the video of the item on it """
+    if line.startswith("{"):
+        return get_json_codec()[1](line)["snippet"]["resourceId"]["videoId"]
+    return line
+
+
+def iter_video_ids(path: str) -> Iterator[str]:
+    """ the video ids of a dump file, compressed or not, in file order """
+    with open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield parse_video_id(line)
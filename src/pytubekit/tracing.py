@@ -0,0 +1,227 @@
+"""
+tracing.py
+
+Per-call tracing of YouTube API and yt_dlp calls.
+
+Every attempt of a call is recorded with its method, status, attempt number, latency
+and quota cost, so that the backoff sleeps between retries stay out of the latencies.
+Records are streamed to a JSONL trace file and aggregated into per-method counters
+and latency histograms which are written as a Prometheus textfile (for the node
+exporter textfile collector) when the run ends.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import IO, Any
+
+from pytubekit.configs import ConfigTrace
+from pytubekit.constants import QUOTA_COSTS
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+METRIC_PREFIX = "pytubekit"
+
+
+def get_quota_cost(method: str) -> int:
+    return QUOTA_COSTS.get(method, 0)
+
+
+def get_request_method(request: Any) -> str:
+    method = getattr(request, "methodId", None)
+    if isinstance(method, str):
+        return method
+    return "unknown"
+
+
+class Histogram:
+    def __init__(self, buckets: list[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float:
+        """ upper bound of the bucket holding the q-quantile (inf if beyond the last bucket) """
+        target = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= target:
+                return bound
+        return float("inf")
+
+
+class MethodStats:
+    def __init__(self) -> None:
+        self.calls_by_status: dict[int, int] = {}
+        self.retries = 0
+        self.quota = 0
+        self.items = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+
+
+class Tracer:
+    """ Collects call records; does nothing until enabled by open() """
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stats: dict[str, MethodStats] = {}
+        self.lock = threading.Lock()
+        self.trace_fp: IO[str] | None = None
+        self.prometheus_file: str | None = None
+        # (start, end) perf_counter of every attempt, for the wall time spent waiting on calls
+        self.intervals: list[tuple[float, float]] = []
+
+    def open(self, trace_file: str | None, prometheus_file: str | None) -> None:
+        if self.trace_fp is not None:
+            self.trace_fp.close()
+            self.trace_fp = None
+        self.stats = {}
+        self.intervals = []
+        self.prometheus_file = prometheus_file
+        if trace_file is not None:
+            # pylint: disable=consider-using-with
+            self.trace_fp = open(trace_file, "w", encoding="utf-8")  # noqa: SIM115
+        self.enabled = trace_file is not None or prometheus_file is not None
+
+    def close(self) -> None:
+        if self.trace_fp is not None:
+            self.trace_fp.close()
+            self.trace_fp = None
+        if not self.enabled:
+            return
+        if self.prometheus_file is not None:
+            self.write_prometheus(self.prometheus_file)
+            self.prometheus_file = None
+        self.enabled = False
+
+    def collect(self) -> None:
+        """ start collecting into fresh counters without producing any output (used by the benchmarks) """
+        with self.lock:
+            self.stats = {}
+            self.intervals = []
+        self.enabled = True
+
+    def _get_stats(self, method: str) -> MethodStats:
+        if method not in self.stats:
+            self.stats[method] = MethodStats()
+        return self.stats[method]
+
+    def record(self, method: str, status: int, attempt: int, latency: float) -> None:
+        """ one attempt of a call; attempt counts from 0, so any other attempt is a retry """
+        if not self.enabled:
+            return
+        quota = get_quota_cost(method)
+        end = time.perf_counter()
+        with self.lock:
+            self.intervals.append((end - latency, end))
+            stats = self._get_stats(method)
+            stats.calls_by_status[status] = stats.calls_by_status.get(status, 0) + 1
+            if attempt > 0:
+                stats.retries += 1
+            stats.quota += quota
+            stats.latency.observe(latency)
+            if self.trace_fp is not None:
+                record = {
+                    "time": time.time(),
+                    "method": method,
+                    "status": status,
+                    "attempt": attempt,
+                    "latency": round(latency, 6),
+                    "quota": quota,
+                }
+                self.trace_fp.write(json.dumps(record) + "\n")
+
+    def count_items(self, method: str, items: int) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self._get_stats(method).items += items
+
+    def total_quota(self) -> int:
+        with self.lock:
+            return sum(stats.quota for stats in self.stats.values())
+
+    def total_latency(self) -> float:
+        """ the latencies of all attempts summed, so calls of several threads which overlap all count """
+        with self.lock:
+            return sum(stats.latency.sum for stats in self.stats.values())
+
+    def network_wait(self, since: float) -> float:
+        """ wall time after since (a perf_counter) during which at least one call was in flight """
+        with self.lock:
+            intervals = sorted((max(start, since), end) for start, end in self.intervals if end > since)
+        wait = 0.0
+        covered = since
+        for start, end in intervals:
+            if end > covered:
+                wait += end - max(start, covered)
+                covered = end
+        return wait
+
+    def prometheus_lines(self) -> list[str]:
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_api_calls_total Attempts made, by method and status",
+            f"# TYPE {p}_api_calls_total counter",
+        ]
+        with self.lock:
+            stats_items = sorted(self.stats.items())
+            for method, stats in stats_items:
+                for status, count in sorted(stats.calls_by_status.items()):
+                    lines.append(f"{p}_api_calls_total{{method=\"{method}\",status=\"{status}\"}} {count}")
+            for name, help_string, attr in [
+                ("api_retries_total", "Retries performed", "retries"),
+                ("api_quota_units_total", "Quota units charged", "quota"),
+                ("api_items_total", "Items received through pagination", "items"),
+            ]:
+                lines.append(f"# HELP {p}_{name} {help_string}, by method")
+                lines.append(f"# TYPE {p}_{name} counter")
+                for method, stats in stats_items:
+                    lines.append(f"{p}_{name}{{method=\"{method}\"}} {getattr(stats, attr)}")
+            lines.append(f"# HELP {p}_api_call_duration_seconds Latency of each attempt, by method")
+            lines.append(f"# TYPE {p}_api_call_duration_seconds histogram")
+            for method, stats in stats_items:
+                h = stats.latency
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f"{p}_api_call_duration_seconds_bucket{{method=\"{method}\",le=\"{bound}\"}} {count}")
+                lines.append(f"{p}_api_call_duration_seconds_bucket{{method=\"{method}\",le=\"+Inf\"}} {h.count}")
+                lines.append(f"{p}_api_call_duration_seconds_sum{{method=\"{method}\"}} {h.sum:.6f}")
+                lines.append(f"{p}_api_call_duration_seconds_count{{method=\"{method}\"}} {h.count}")
+        return lines
+
+    def write_prometheus(self, path: str) -> None:
+        # write to a temp file and rename so the node exporter never sees a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in self.prometheus_lines():
+                print(line, file=f)
+        os.replace(tmp_path, path)
+
+
+TRACER = Tracer()
+
+
+def traced(function: Callable[[], None]) -> Callable[[], None]:
+    """
+    wrap an endpoint so that the ConfigTrace outputs are produced around it; an endpoint run by another
+    one (the steps of run) records into the outputs already open
+    """
+    @functools.wraps(function)
+    def wrapper() -> None:
+        if TRACER.enabled:
+            function()
+            return
+        TRACER.open(ConfigTrace.trace_file, ConfigTrace.trace_prometheus_file)
+        try:
+            function()
+        finally:
+            TRACER.close()
+    return wrapper
@@ -2,43 +2,62 @@
 util.py
 """
 
+import functools
 import json
 import logging
 import os
+import re
 import sys
+import threading
 import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, IO
 
 import googleapiclient.discovery
 import yt_dlp
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 from pygooglehelper import get_credentials, ConfigRequest
 
-from pytubekit.configs import ConfigPagination, ConfigPlaylist
+from pytubekit.cache import CACHE, Cache
+from pytubekit.configs import ConfigApi, ConfigShards
 from pytubekit.constants import SCOPES, API_SERVICE_NAME, API_VERSION, NEXT_PAGE_TOKEN, PAGE_TOKEN, ITEMS_TOKEN, \
-    DELETED_TITLE, PRIVATE_TITLE
+    DAILY_QUOTA, MAX_PAGE_SIZE, MANUAL_SORT_REQUIRED
+from pytubekit.planner import Plan, Operation, get_item_video_id, longest_increasing_subsequence, \
+    INSERT, DELETE, UPDATE, CREATE_PLAYLIST, RENAME_PLAYLIST, DELETE_PLAYLIST
+from pytubekit.progress import Progress, create_progress
+from pytubekit.records import Item, PlaylistItem
+from pytubekit.shards import QUOTA_REASONS, Shard, ShardedYouTube, ShardSet, get_error_reason, get_shard_set, load_credentials
 from pytubekit.static import APP_NAME
+from pytubekit.streams import NONE, SUFFIXES, detect_compression, encode_json_line, iter_video_ids, open_binary_writer, \
+    strip_suffix
+from pytubekit.tracing import TRACER, get_request_method
 
-
-def log_progress(logger: logging.Logger, current: int, total: int, interval: int = 100) -> None:
-    if current % interval == 0 or current == total:
-        logger.info(f"progress: {current}/{total}")
+YT_DLP_METHOD = "yt_dlp.extract_info"
 
 
 def retry_execute(request: Any, max_retries: int = 5) -> dict[str, Any]:
     logger = logging.getLogger()
+    method = get_request_method(request)
     last_error = None
     for attempt in range(max_retries):
+        start = time.perf_counter()
         try:
-            return request.execute()
+            response = request.execute()
         except HttpError as e:
             last_error = e
-            if e.resp.status in (403, 429, 500, 503) and attempt < max_retries - 1:
+            TRACER.record(method, e.resp.status, attempt, time.perf_counter() - start)
+            # an exhausted daily quota does not come back by waiting
+            if e.resp.status in (403, 429, 500, 503) and get_error_reason(e) not in QUOTA_REASONS and attempt < max_retries - 1:
                 wait = 2 ** attempt
                 logger.warning(f"API error {e.resp.status}, retrying in {wait}s (attempt {attempt + 1}/{max_retries})")
                 time.sleep(wait)
             else:
                 raise
+        else:
+            TRACER.record(method, 200, attempt, time.perf_counter() - start)
+            return response
     raise last_error  # type: ignore[misc]
 
 
@@ -53,6 +72,7 @@ class PagedRequest:
             self.kwargs[PAGE_TOKEN] = self.next_page_token
         request = self.f(**self.kwargs)
         response = retry_execute(request)
+        TRACER.count_items(get_request_method(request), len(response.get(ITEMS_TOKEN, [])))
         if NEXT_PAGE_TOKEN in response:
             self.next_page_token = response[NEXT_PAGE_TOKEN]
             over = False
@@ -60,116 +80,310 @@ class PagedRequest:
             over = True
         return over, response
 
-    def get_all_items(self) -> list[dict[str, Any]]:
-        items: list[dict[str, Any]] = []
+    def get_all_items(self, convert: Callable[[dict[str, Any]], Any] | None = None) -> list[Any]:
+        """ the items of all pages, each page converted by convert (if given) as soon as it arrives """
+        items: list[Any] = []
         while True:
             over, response = self.get_next_page()
             # print(f"got {len(response[ITEMS_TOKEN])} items")
-            items.extend(response[ITEMS_TOKEN])
+            if convert is None:
+                items.extend(response[ITEMS_TOKEN])
+            else:
+                items.extend(map(convert, response[ITEMS_TOKEN]))
             if over:
                 break
         return items
 
 
-def create_playlists_request(youtube: Any) -> PagedRequest:
+def create_playlists_request(youtube: Any, page_size: int = MAX_PAGE_SIZE) -> PagedRequest:
     kwargs = {
         "part": "snippet,contentDetails",
-        "maxResults": ConfigPagination.page_size,
+        "maxResults": page_size,
         "mine": True,
     }
     return PagedRequest(f=youtube.playlists().list, kwargs=kwargs)
 
 
-def create_playlist_request(youtube: Any, playlist_id: str) -> PagedRequest:
+def create_playlist_request(youtube: Any, playlist_id: str, page_size: int = MAX_PAGE_SIZE) -> PagedRequest:
     kwargs = {
         "part": "snippet,id",
         "playlistId": playlist_id,
-        "maxResults": ConfigPagination.page_size,
+        "maxResults": page_size,
     }
     return PagedRequest(f=youtube.playlistItems().list, kwargs=kwargs)
 
 
-def get_playlist_ids_from_names(youtube: Any, playlist_names: list[str]) -> list[str]:
-    r = create_playlists_request(youtube)
-    items = r.get_all_items()
-    name_to_id = {item["snippet"]["title"]: item["id"] for item in items}
-    return [name_to_id[playlist_name] for playlist_name in playlist_names]
-
-
-def get_all_items(youtube: Any) -> list[dict[str, Any]]:
-    if ConfigPlaylist.name is not None:
-        playlist_id = get_playlist_ids_from_names(youtube, [ConfigPlaylist.name])[0]
-    else:
-        playlist_id = ConfigPlaylist.playlist_id
-    return get_all_items_from_playlist_id(youtube, playlist_id)
-
+# The read helpers take the page size and the cache to go through explicitly (the
+# defaults are the largest page and the process wide cache) so that several
+# api.Client objects with their own settings can run in one process.
 
-def get_all_items_from_playlist_id(youtube: Any, playlist_id: str) -> list[dict[str, Any]]:
-    return create_playlist_request(youtube, playlist_id=playlist_id).get_all_items()
 
+def get_all_records_from_playlist_id(
+    youtube: Any,
+    playlist_id: str,
+    page_size: int = MAX_PAGE_SIZE,
+    cache: Cache = CACHE,
+) -> list[PlaylistItem]:
+    """ the items as records, which is how api.Client keeps them in the cache too """
+    request = create_playlist_request(youtube, playlist_id, page_size)
+    return cache.get_items(playlist_id, functools.partial(request.get_all_items, PlaylistItem.from_resource))
 
-def get_all_items_from_playlist_ids(youtube: Any, playlist_ids: list[str]) -> list[dict[str, Any]]:
-    items: list[dict[str, Any]] = []
-    for playlist_id in playlist_ids:
-        items.extend(get_all_items_from_playlist_id(youtube, playlist_id))
-    return items
 
-
-def delete_playlist_item_by_id(youtube: Any, playlist_item_id: str) -> None:
+def delete_playlist_item_by_id(youtube: Any, playlist_item_id: str, cache: Cache = CACHE) -> None:
     logger = logging.getLogger()
     logger.info(f"deleting playlist item [{playlist_item_id}]")
     request = youtube.playlistItems().delete(
         id=playlist_item_id,
     )
     retry_execute(request)
+    cache.invalidate_item(playlist_item_id)
 
 
-def cleanup_items(youtube: Any, items: list[dict[str, Any]], *, dedup: bool, check_deleted: bool, check_privatized: bool, do_delete: bool) -> None:
+def log_cleanup(plan: Plan, found: dict[str, int], saw: int, dedup: bool) -> None:
     logger = logging.getLogger()
-    seen: set[str] = set()
-    saw = 0
-    found_duplicates = 0
-    found_deleted = 0
-    found_private = 0
-    wanted_to_delete = 0
-    deleted = 0
-    total = len(items)
-    for item in items:
-        to_delete = False
-        saw += 1
-        log_progress(logger, saw, total)
-        if dedup:
-            f_video_id = item["snippet"]["resourceId"]["videoId"]
-            if f_video_id in seen:
-                found_duplicates += 1
-                to_delete = True
-            else:
-                seen.add(f_video_id)
-        if check_deleted:
-            f_title = item["snippet"]["title"]
-            if f_title == DELETED_TITLE:
-                found_deleted += 1
-                to_delete = True
-        if check_privatized:
-            f_title = item["snippet"]["title"]
-            if f_title == PRIVATE_TITLE:
-                found_private += 1
-                to_delete = True
-        if to_delete:
-            wanted_to_delete += 1
-            if do_delete:
-                delete_playlist_item_by_id(youtube, item["id"])
-                deleted += 1
     logger.info(f"saw {saw} items")
-    if dedup:
-        logger.info(f"found_duplicates {found_duplicates} items")
-    logger.info(f"found_deleted {found_deleted} items")
-    logger.info(f"found_private {found_private} items")
-    logger.info(f"wanted_to_delete {wanted_to_delete} items")
-    logger.info(f"deleted {deleted} items")
+    for kind, count in found.items():
+        if dedup or kind != "duplicates":
+            logger.info(f"found_{kind} {count} items")
+    logger.info(f"wanted_to_delete {len(plan.operations)} items")
+
+
+def execute_operation(youtube: Any, operation: Operation, cache: Cache = CACHE) -> None:
+    if operation.kind == INSERT:
+        assert operation.video_id is not None
+        add_video_to_playlist(youtube, operation.playlist_id, operation.video_id, position=operation.position, cache=cache)
+    elif operation.kind == DELETE:
+        assert operation.item_id is not None
+        delete_playlist_item_by_id(youtube, operation.item_id, cache=cache)
+    elif operation.kind == UPDATE:
+        assert operation.item_id is not None and operation.video_id is not None and operation.position is not None
+        move_playlist_item(
+            youtube, operation.playlist_id, operation.item_id, operation.video_id, operation.position, cache=cache,
+        )
+    elif operation.kind == CREATE_PLAYLIST:
+        insert_playlist(youtube, str(operation.title), str(operation.description), str(operation.privacy), cache=cache)
+    elif operation.kind == RENAME_PLAYLIST:
+        update_playlist_title(youtube, operation.playlist_id, str(operation.title), cache=cache)
+    elif operation.kind == DELETE_PLAYLIST:
+        delete_playlist_by_id(youtube, operation.playlist_id, cache=cache)
+
+
+def reorder_inserted(
+    youtube: Any,
+    playlist_id: str,
+    inserted: list[tuple[str, str]],
+    page_size: int = MAX_PAGE_SIZE,
+    cache: Cache = CACHE,
+) -> int:
+    """
+    make the (item id, video id) pairs in inserted appear in the playlist in that order,
+    moving only the items outside a longest run that is already in order
+    """
+    logger = logging.getLogger()
+    order = [item.id for item in get_all_records_from_playlist_id(youtube, playlist_id, page_size, cache)]
+    # the moves below change the positions the cached records hold
+    cache.invalidate_playlist(playlist_id)
+    index = {item_id: i for i, item_id in enumerate(order)}
+    inserted = [(item_id, video_id) for item_id, video_id in inserted if item_id in index]
+    keep = longest_increasing_subsequence([index[item_id] for item_id, _ in inserted])
+    moves = 0
+    for k, (item_id, video_id) in enumerate(inserted):
+        if k in keep:
+            continue
+        order.remove(item_id)
+        if k == 0:
+            target = order.index(inserted[min(keep)][0])
+        else:
+            target = order.index(inserted[k - 1][0]) + 1
+        order.insert(target, item_id)
+        try:
+            move_playlist_item(youtube, playlist_id, item_id, video_id, target, cache=cache)
+        except HttpError as e:
+            if get_error_reason(e) != MANUAL_SORT_REQUIRED:
+                raise
+            # the playlist is sorted by YouTube (date added, popularity...), the order of the inserts does not matter
+            logger.info(f"playlist [{playlist_id}] is not sorted manually, leaving the order of the inserts to YouTube")
+            return moves
+        moves += 1
+    if moves:
+        logger.info(f"moved {moves} out of order inserts in playlist [{playlist_id}]")
+    return moves
+
+
+def pipelined_insert(
+    youtube: Any,
+    operations: list[Operation],
+    progress: Progress,
+    *,
+    window: int,
+    client_factory: Callable[[], Any] | None,
+    dedup: bool,
+    page_size: int = MAX_PAGE_SIZE,
+    cache: Cache = CACHE,
+) -> int:
+    """
+    append the videos of operations (inserts into one playlist) keeping up to window inserts in flight.
+    Inserts carry their target positions, so that they land in order, until the API answers that the
+    playlist is not sorted manually, after which they carry none (and their order is up to YouTube).
+    Concurrent inserts may still land out of order in a manually sorted playlist; a final pass moves
+    those into place, so the result is the same as serial inserts. With dedup, videos the playlist
+    already holds are skipped. Returns the number of inserts made.
+    """
+    logger = logging.getLogger()
+    playlist_id = operations[0].playlist_id
+    current = get_all_records_from_playlist_id(youtube, playlist_id, page_size, cache)
+    present = {item.video_id for item in current}
+    wanted: list[Operation] = []
+    for operation in operations:
+        assert operation.video_id is not None
+        if dedup and operation.video_id in present:
+            progress.advance()
+            continue
+        present.add(operation.video_id)
+        wanted.append(operation)
+    if len(wanted) < len(operations):
+        logger.info(f"skipping {len(operations) - len(wanted)} videos already in playlist [{playlist_id}]")
+    if client_factory is None:
+        window = 1
+    local = threading.local()
+    unsorted = threading.Event()
+
+    def insert(position: int, operation: Operation) -> tuple[str, str]:
+        if window == 1:
+            client = youtube
+        else:
+            # service objects are not thread safe, every worker gets its own
+            if not hasattr(local, "youtube"):
+                assert client_factory is not None
+                local.youtube = client_factory()
+            client = local.youtube
+        assert operation.video_id is not None
+        sent = None if unsorted.is_set() else position
+        try:
+            response = add_video_to_playlist(client, playlist_id, operation.video_id, position=sent, cache=cache)
+        except HttpError as e:
+            if sent is None or get_error_reason(e) != MANUAL_SORT_REQUIRED:
+                raise
+            if not unsorted.is_set():
+                logger.info(f"playlist [{playlist_id}] is not sorted manually, appending without positions")
+            unsorted.set()
+            response = add_video_to_playlist(client, playlist_id, operation.video_id, cache=cache)
+        progress.advance(quota=operation.cost())
+        return response["id"], operation.video_id
+
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        futures = [executor.submit(insert, len(current) + k, operation) for k, operation in enumerate(wanted)]
+        try:
+            inserted = [future.result() for future in futures]
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    if window > 1 and not unsorted.is_set():
+        reorder_inserted(youtube, playlist_id, inserted, page_size, cache)
+    return len(inserted)
+
+
+def execute_plan(
+    youtube: Any,
+    plan: Plan,
+    window: int = 1,
+    client_factory: Callable[[], Any] | None = None,
+    dedup: bool = False,
+    *,
+    page_size: int = MAX_PAGE_SIZE,
+    cache: Cache = CACHE,
+    progress_factory: Callable[[int, str], Progress] = create_progress,
+) -> int:
+    """ runs of appends to one playlist go through pipelined_insert() when concurrency or dedup is asked for """
+    progress = progress_factory(len(plan.operations), plan.label)
+    operations = plan.operations
+    pipelined = dedup or (window > 1 and client_factory is not None)
+    done = 0
+    i = 0
+    while i < len(operations):
+        operation = operations[i]
+        if pipelined and operation.kind == INSERT and operation.position is None:
+            j = i
+            while j < len(operations) and operations[j].kind == INSERT and operations[j].position is None \
+                    and operations[j].playlist_id == operation.playlist_id:
+                j += 1
+            done += pipelined_insert(
+                youtube, operations[i:j], progress, window=window, client_factory=client_factory, dedup=dedup,
+                page_size=page_size, cache=cache,
+            )
+            i = j
+            continue
+        execute_operation(youtube, operation, cache)
+        progress.advance(quota=operation.cost())
+        done += 1
+        i += 1
+    return done
+
+
+def apply_plan(
+    youtube: Any,
+    plan: Plan,
+    *,
+    execute: bool,
+    budget: int = DAILY_QUOTA,
+    window: int = 1,
+    client_factory: Callable[[], Any] | None = None,
+    dedup: bool = False,
+    page_size: int = MAX_PAGE_SIZE,
+    cache: Cache = CACHE,
+    progress_factory: Callable[[int, str], Progress] = create_progress,
+) -> int:
+    """ report the plan (cost, days, simulated result) and execute it unless this is a dry run """
+    logger = logging.getLogger()
+    plan.report(budget, window if client_factory is not None else 1)
+    if not execute:
+        logger.info(f"dry run: not executing plan [{plan.label}]")
+        return 0
+    return execute_plan(
+        youtube, plan, window=window, client_factory=client_factory, dedup=dedup,
+        page_size=page_size, cache=cache, progress_factory=progress_factory,
+    )
 
 
 def get_youtube() -> Any:
+    """ the service object of the command line, which may be shared (serve, run) through the cache """
+    return CACHE.get_youtube(build_cli_youtube)
+
+
+def build_cli_youtube() -> Any:
+    if ConfigShards.shards:
+        return ShardedYouTube(get_cli_shard_set(), functools.partial(build_shard_youtube, base_url=ConfigApi.api_base_url))
+    return build_youtube(ConfigApi.api_base_url)
+
+
+def get_cli_shard_set() -> ShardSet:
+    return get_shard_set(
+        tuple(os.path.expanduser(folder) for folder in ConfigShards.shards),
+        os.path.expanduser(ConfigShards.shard_ledgers),
+        ConfigShards.shard_quota,
+        ConfigShards.shard_policy,
+    )
+
+
+def build_shard_youtube(shard: Shard, base_url: str | None = None) -> Any:
+    """
+    a client for the project of the shard; for an API server at base_url the shard name is sent as the API
+    key, which the fake_api server keeps a quota per
+    """
+    if base_url is not None:
+        return get_youtube_at(base_url, developer_key=shard.name)
+    return googleapiclient.discovery.build(
+        serviceName=API_SERVICE_NAME,
+        version=API_VERSION,
+        credentials=load_credentials(shard.folder, SCOPES),
+        cache_discovery=False,
+    )
+
+
+def build_youtube(base_url: str | None = None) -> Any:
+    """ an authenticated client for the real API, or an unauthenticated one for the API server at base_url """
+    if base_url is not None:
+        return get_youtube_at(base_url)
     ConfigRequest.scopes = SCOPES
     ConfigRequest.app_name = APP_NAME
     credentials = get_credentials()
@@ -182,6 +396,18 @@ def get_youtube() -> Any:
     return youtube
 
 
+def get_youtube_at(base_url: str, developer_key: str | None = None) -> Any:
+    """ an unauthenticated client for an API server at base_url (e.g. the fake_api server) """
+    return googleapiclient.discovery.build(
+        serviceName=API_SERVICE_NAME,
+        version=API_VERSION,
+        http=build_http(),
+        client_options={"api_endpoint": base_url},
+        static_discovery=True,
+        developerKey=developer_key,
+    )
+
+
 def get_video_info(youtube: Any, youtube_id: str) -> dict[str, Any]:
     request = youtube.videos().list(
         part="snippet,status,snippet,contentDetails",
@@ -190,8 +416,9 @@ def get_video_info(youtube: Any, youtube_id: str) -> dict[str, Any]:
     return retry_execute(request)
 
 
-def pretty_print(data: Any, fp: IO[str] = sys.stdout) -> None:
-    json.dump(data, fp, indent=4)
+def pretty_print(data: Any, fp: IO[str] | None = None) -> None:
+    # sys.stdout is looked up on every call so that redirected output (serve) is honored
+    json.dump(data, fp if fp is not None else sys.stdout, indent=4)
 
 
 def get_youtube_channels(youtube: Any) -> Any:
@@ -202,43 +429,18 @@ def get_youtube_playlists(youtube: Any) -> Any:
     return youtube.playlists()
 
 
-def get_my_playlists_ids(youtube: Any) -> list[str]:
-    r = create_playlists_request(youtube)
-    items = r.get_all_items()
-    ids = []
-    for item in items:
-        ids.append(item["id"])
-    return ids
-
-
-def get_playlist_item_ids_from_names(youtube: Any, playlist_names: list[str]) -> set[str]:
-    playlist_ids = get_playlist_ids_from_names(youtube, playlist_names)
-    items = get_all_items_from_playlist_ids(youtube, playlist_ids)
-    return {item["id"] for item in items}
+def read_video_ids_in_order(file_path: str) -> list[str]:
+    """ the video ids of a file (e.g. a dump file) in file order, duplicates included """
+    return list(iter_video_ids(file_path))
 
 
 def read_video_ids_from_files(file_paths: list[str]) -> set[str]:
-    video_ids = set()
+    video_ids: set[str] = set()
     for file_path in file_paths:
-        with open(file_path) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    video_ids.add(line)
+        video_ids.update(iter_video_ids(file_path))
     return video_ids
 
 
-def get_video_ids_from_playlist_names(youtube: Any, names: list[str]) -> set[str]:
-    playlist_ids = get_playlist_ids_from_names(youtube, names)
-    items = get_all_items_from_playlist_ids(youtube, playlist_ids)
-    return {item["snippet"]["resourceId"]["videoId"] for item in items}
-
-
-def get_items_from_playlist_names(youtube: Any, names: list[str]) -> list[dict[str, Any]]:
-    playlist_ids = get_playlist_ids_from_names(youtube, names)
-    return get_all_items_from_playlist_ids(youtube, playlist_ids)
-
-
 METADATA_FIELDNAMES = [
     "video_id", "title", "description", "duration", "upload_date",
     "uploader", "uploader_id", "channel", "channel_id",
@@ -251,27 +453,99 @@ METADATA_FIELDNAMES = [
 ]
 
 
-def add_video_to_playlist(youtube: Any, playlist_id: str, video_id: str) -> None:
+def add_video_to_playlist(
+    youtube: Any,
+    playlist_id: str,
+    video_id: str,
+    position: int | None = None,
+    cache: Cache = CACHE,
+) -> dict[str, Any]:
     logger = logging.getLogger()
     logger.info(f"adding video [{video_id}] to playlist [{playlist_id}]")
+    snippet: dict[str, Any] = {
+        "playlistId": playlist_id,
+        "resourceId": {
+            "kind": "youtube#video",
+            "videoId": video_id,
+        },
+    }
+    if position is not None:
+        snippet["position"] = position
     request = youtube.playlistItems().insert(
         part="snippet",
         body={
+            "snippet": snippet,
+        },
+    )
+    response = retry_execute(request)
+    cache.invalidate_playlist(playlist_id)
+    return response
+
+
+def move_playlist_item(
+    youtube: Any,
+    playlist_id: str,
+    playlist_item_id: str,
+    video_id: str,
+    position: int,
+    cache: Cache = CACHE,
+) -> None:
+    logger = logging.getLogger()
+    logger.info(f"moving playlist item [{playlist_item_id}] to position [{position}]")
+    request = youtube.playlistItems().update(
+        part="snippet",
+        body={
+            "id": playlist_item_id,
             "snippet": {
                 "playlistId": playlist_id,
                 "resourceId": {
                     "kind": "youtube#video",
                     "videoId": video_id,
                 },
+                "position": position,
+            },
+        },
+    )
+    retry_execute(request)
+    cache.invalidate_playlist(playlist_id)
+
+
+def insert_playlist(youtube: Any, title: str, description: str, privacy: str, cache: Cache = CACHE) -> str:
+    request = youtube.playlists().insert(
+        part="snippet,status",
+        body={
+            "snippet": {
+                "title": title,
+                "description": description,
+            },
+            "status": {
+                "privacyStatus": privacy,
+            },
+        },
+    )
+    response = retry_execute(request)
+    cache.invalidate_catalog()
+    return response["id"]
+
+
+def update_playlist_title(youtube: Any, playlist_id: str, title: str, cache: Cache = CACHE) -> None:
+    request = youtube.playlists().update(
+        part="snippet",
+        body={
+            "id": playlist_id,
+            "snippet": {
+                "title": title,
             },
         },
     )
     retry_execute(request)
+    cache.invalidate_catalog()
 
 
-def get_playlist_item_count(youtube: Any, playlist_id: str) -> int:
-    items = get_all_items_from_playlist_id(youtube, playlist_id)
-    return len(items)
+def delete_playlist_by_id(youtube: Any, playlist_id: str, cache: Cache = CACHE) -> None:
+    request = youtube.playlists().delete(id=playlist_id)
+    retry_execute(request)
+    cache.invalidate_playlist(playlist_id)
 
 
 def get_video_metadata(video_id: str) -> dict[str, Any] | None:
@@ -283,12 +557,15 @@ def get_video_metadata(video_id: str) -> dict[str, Any] | None:
         "skip_download": True,
         "ignore_no_formats_error": True,
     }
+    start = time.perf_counter()
     try:
         logger.info(f"Fetching data for ID: {video_id}...")
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info_dict = ydl.extract_info(video_url, download=False)
         if not info_dict:
+            TRACER.record(YT_DLP_METHOD, 404, 0, time.perf_counter() - start)
             return None
+        TRACER.record(YT_DLP_METHOD, 200, 0, time.perf_counter() - start)
         metadata: dict[str, Any] = {
             "video_id": video_id,
             "title": info_dict.get("title", ""),
@@ -328,6 +605,7 @@ def get_video_metadata(video_id: str) -> dict[str, Any] | None:
         }
         return metadata
     except Exception as e:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+        TRACER.record(YT_DLP_METHOD, 500, 0, time.perf_counter() - start)
         logger.warning(f"An unexpected error occurred for ID {video_id}: {e}")
         return None
 
@@ -338,8 +616,8 @@ def read_all_dump_files(dump_folder: str) -> dict[str, list[str]]:
         filepath = os.path.join(dump_folder, filename)
         if not os.path.isfile(filepath):
             continue
-        with open(filepath) as f:
-            result[filename] = [line.strip() for line in f if line.strip()]
+        name = filename if detect_compression(filepath) == NONE else strip_suffix(filename)
+        result[name] = list(iter_video_ids(filepath))
     return result
 
 
@@ -351,3 +629,82 @@ def read_video_ids_from_path(path: str) -> set[str]:
             ids.update(lines)
         return ids
     return read_video_ids_from_files([path])
+
+
+def write_dump(
+    dump_folder: str,
+    playlists: list[dict[str, Any]],
+    get_items: Callable[[str], Sequence[Item]],
+    full: bool,
+    jsonl: bool = False,
+    compression: str = NONE,
+) -> list[str]:
+    """
+    write one file per playlist resource, with the items get_items returns for its id (resources when
+    full, records will do otherwise); full items are written indented, or one per line if jsonl, and
+    compressed files get the suffix of their compression
+    """
+    logger = logging.getLogger()
+    written: list[str] = []
+    id_to_title = {}
+    for item in playlists:
+        f_id = item["id"]
+        f_title = item["snippet"]["title"]
+        id_to_title[f_id] = f_title
+    logger.info("got lists data")
+    for f_id, f_title in id_to_title.items():
+        filename = os.path.join(dump_folder, f_title + SUFFIXES.get(compression, ""))
+        logger.info(f"dumping [{f_title}] to [{filename}]")
+        with open_binary_writer(filename, compression) as f:
+            for playlist_item in get_items(f_id):
+                f_video_id = get_item_video_id(playlist_item)
+                if full and jsonl:
+                    f.write(encode_json_line(playlist_item))
+                elif full:
+                    f.write(json.dumps(playlist_item, indent=4).encode())
+                else:
+                    f.write(f"{f_video_id}\n".encode())
+        written.append(filename)
+    return written
+
+
+def compute_local_diff(path_a: str, path_b: str, reverse: bool) -> list[str]:
+    ids_a = read_video_ids_from_path(path_a)
+    ids_b = read_video_ids_from_path(path_b)
+    if reverse:
+        return sorted(ids_a & ids_b)
+    return sorted(ids_a - ids_b)
+
+
+def find_dump_duplicates(data: dict[str, list[str]]) -> list[str]:
+    found: list[str] = []
+    # intra-playlist duplicates
+    for filename, lines in data.items():
+        seen: set[str] = set()
+        for line in lines:
+            if line in seen:
+                found.append(f"INTRA {filename}: {line}")
+            else:
+                seen.add(line)
+    # cross-playlist duplicates
+    global_seen: dict[str, str] = {}
+    for filename, lines in data.items():
+        for line in lines:
+            if line in global_seen and global_seen[line] != filename:
+                found.append(f"CROSS {global_seen[line]} & {filename}: {line}")
+            elif line not in global_seen:
+                global_seen[line] = filename
+    return found
+
+
+YOUTUBE_ID_RE = re.compile(r"(?:youtu\.be/|youtube\.com/.*[?&]v=|^)([A-Za-z0-9_-]{11})(?:\s|$|&)")
+
+
+def collect_ids_from_files(file_paths: list[str]) -> set[str]:
+    found: set[str] = set()
+    for file_path in file_paths:
+        with open(file_path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                for match in YOUTUBE_ID_RE.findall(line):
+                    found.add(match)
+    return found
@@ -0,0 +1,295 @@
+"""
+workqueue.py
+
+A work queue of video IDs in SQLite, shared by add_data workers on several hosts.
+
+add_data is one process fetching the metadata of one ID at a time. Here the IDs
+of input files are split into batches in a SQLite database (queue_fill), any
+number of workers on hosts sharing its filesystem work through them together
+(queue_work) and the rows of all of them are written to one CSV, Parquet or
+Arrow file in the order of the input (queue_merge).
+
+A worker claims a batch by taking a lease on it: the batch is its own for lease
+seconds, which a heartbeat thread keeps extending while the worker fetches. A
+lease which is not extended (the worker crashed, hung or lost the filesystem)
+expires and the batch goes to the next worker which asks. Every claim increments
+the token of the batch, and a worker commits the rows of its batch and marks it
+done in one transaction, only while the token is still its own. So the rows of
+every ID are committed exactly once, also when a worker whose lease expired
+comes back and finishes its batch late: its rows are dropped.
+
+SQLite locks the whole database for a write, which is cheap next to batches that
+take minutes to fetch, but a network filesystem must support its locks (NFS with
+lockd does, some FUSE filesystems do not). Leases are compared with the clocks
+of the hosts, so these should be synchronized (NTP) to well within the lease.
+"""
+import contextlib
+import csv
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, Self
+
+from pytubekit.columnar import COLUMNAR_FORMATS, ColumnarWriter
+from pytubekit.progress import Progress, create_progress
+from pytubekit.util import METADATA_FIELDNAMES
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    worker TEXT,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    ordinal INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    batch_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_batch ON items (batch_id);
+CREATE TABLE IF NOT EXISTS results (
+    video_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def default_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass(frozen=True)
+class Lease:
+    batch_id: int
+    token: int
+    video_ids: tuple[str, ...]
+
+
+class WorkQueue:
+    def __init__(self, path: str, lease: float = 300, timeout: float = 60) -> None:
+        self.path = os.path.expanduser(path)
+        self.lease = lease
+        # how long to wait for another process holding the write lock
+        self.timeout = timeout
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with contextlib.closing(self.connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """ a write transaction, which takes the write lock up front so that reads in it are not stale """
+        with contextlib.closing(self.connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def fill(self, video_ids: list[str], batch_size: int) -> int:
+        """ add the IDs not queued yet, in new batches of batch_size; returns how many were added """
+        if batch_size < 1:
+            raise ValueError("batch size must be at least 1")
+        with self.transaction() as connection:
+            queued = {row[0] for row in connection.execute("SELECT video_id FROM items")}
+            new_ids = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in queued]
+            ordinal = connection.execute("SELECT COALESCE(MAX(ordinal), 0) FROM items").fetchone()[0]
+            batch_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM batches").fetchone()[0]
+            for start in range(0, len(new_ids), batch_size):
+                batch_id += 1
+                connection.execute("INSERT INTO batches (id, state, token) VALUES (?, ?, 0)", (batch_id, PENDING))
+                connection.executemany(
+                    "INSERT INTO items (ordinal, video_id, batch_id) VALUES (?, ?, ?)",
+                    [(ordinal + i + 1, video_id, batch_id) for i, video_id in enumerate(new_ids[start:start + batch_size], start)],
+                )
+        return len(new_ids)
+
+    def claim(self, worker: str, now: float | None = None) -> Lease | None:
+        """ lease the first batch which is pending or whose lease expired, None when there is none """
+        now = time.time() if now is None else now
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT id, state, token, worker FROM batches WHERE state = ? OR (state = ? AND expires < ?) ORDER BY id LIMIT 1",
+                (PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            batch_id, state, token, previous = row
+            if state == LEASED:
+                logging.getLogger().warning(f"lease of [{previous}] on batch [{batch_id}] expired, taking it over")
+            token += 1
+            connection.execute(
+                "UPDATE batches SET state = ?, token = ?, worker = ?, expires = ? WHERE id = ?",
+                (LEASED, token, worker, now + self.lease, batch_id),
+            )
+            video_ids = tuple(
+                video_id for (video_id,) in connection.execute(
+                    "SELECT video_id FROM items WHERE batch_id = ? ORDER BY ordinal", (batch_id,),
+                )
+            )
+        return Lease(batch_id, token, video_ids)
+
+    def heartbeat(self, lease: Lease, now: float | None = None) -> bool:
+        """ extend the lease; False when it is not held any more (it expired and was taken over) """
+        now = time.time() if now is None else now
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE batches SET expires = ? WHERE id = ? AND token = ? AND state = ?",
+                (now + self.lease, lease.batch_id, lease.token, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def commit(self, lease: Lease, rows: list[dict[str, Any]]) -> bool:
+        """ store the rows of the batch and mark it done, unless the lease was taken over; returns whether it was committed """
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE batches SET state = ?, expires = NULL WHERE id = ? AND token = ? AND state = ?",
+                (DONE, lease.batch_id, lease.token, LEASED),
+            )
+            if cursor.rowcount != 1:
+                return False
+            connection.executemany(
+                "INSERT INTO results (video_id, data) VALUES (?, ?)",
+                [(row["video_id"], json.dumps(row)) for row in rows],
+            )
+        return True
+
+    def release(self, lease: Lease) -> None:
+        """ give a batch back without its rows (the worker is stopping), so that the next claim takes it right away """
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE batches SET state = ?, worker = NULL, expires = NULL WHERE id = ? AND token = ? AND state = ?",
+                (PENDING, lease.batch_id, lease.token, LEASED),
+            )
+
+    def status(self, now: float | None = None) -> dict[str, int]:
+        now = time.time() if now is None else now
+        with contextlib.closing(self.connect()) as connection:
+            counts = {PENDING: 0, LEASED: 0, DONE: 0}
+            for state, count in connection.execute("SELECT state, COUNT(*) FROM batches GROUP BY state"):
+                counts[state] = count
+            expired = connection.execute("SELECT COUNT(*) FROM batches WHERE state = ? AND expires < ?", (LEASED, now)).fetchone()[0]
+            ids = connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            rows = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "batches": sum(counts.values()),
+            "pending": counts[PENDING],
+            "leased": counts[LEASED] - expired,
+            "expired": expired,
+            "done": counts[DONE],
+            "ids": ids,
+            "rows": rows,
+        }
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        """ the committed rows, in the order their IDs were queued """
+        with contextlib.closing(self.connect()) as connection:
+            for (data,) in connection.execute("SELECT data FROM items JOIN results USING (video_id) ORDER BY ordinal"):
+                yield json.loads(data)
+
+
+class Heartbeat:
+    """ extends a lease every interval seconds from a thread, until the with block ends or the lease is lost """
+    def __init__(self, queue: WorkQueue, lease: Lease, interval: float) -> None:
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"heartbeat-{lease.batch_id}", daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                held = self.queue.heartbeat(self.lease)
+            except sqlite3.Error as e:
+                # the database may be busy or unreachable for a while; the lease lasts several intervals
+                logging.getLogger().warning(f"heartbeat of batch [{self.lease.batch_id}] failed: {e}")
+                continue
+            if not held:
+                self.lost.set()
+                return
+
+    def __enter__(self) -> Self:
+        self.thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_worker(
+    queue: WorkQueue,
+    fetch: Callable[[str], dict[str, Any]],
+    *,
+    worker: str | None = None,
+    heartbeat_interval: float | None = None,
+    progress_factory: Callable[[int, str], Progress] = create_progress,
+) -> int:
+    """ claim batches and commit the rows fetch gives for their IDs until none is left; returns how many were committed """
+    logger = logging.getLogger()
+    worker = default_worker() if worker is None else worker
+    interval = queue.lease / 3 if heartbeat_interval is None else heartbeat_interval
+    status = queue.status()
+    progress = progress_factory(status["ids"] - status["rows"], f"add_data [{worker}]")
+    committed = 0
+    while (lease := queue.claim(worker)) is not None:
+        rows = []
+        with Heartbeat(queue, lease, interval) as heartbeat:
+            try:
+                for video_id in lease.video_ids:
+                    if heartbeat.lost.is_set():
+                        break
+                    rows.append(fetch(video_id))
+                    progress.advance()
+            except BaseException:
+                queue.release(lease)
+                raise
+        if heartbeat.lost.is_set() or not queue.commit(lease, rows):
+            logger.warning(f"batch [{lease.batch_id}] was taken over by another worker, dropping its rows")
+            continue
+        committed += 1
+    logger.info(f"worker [{worker}] committed {committed} batches")
+    return committed
+
+
+def merge_queue(queue: WorkQueue, output_path: str, output_format: str) -> int:
+    """ write the committed rows to one output file; returns how many were written """
+    count = 0
+    if output_format in COLUMNAR_FORMATS:
+        with ColumnarWriter(output_path, output_format, METADATA_FIELDNAMES) as columnar_writer:
+            for row in queue.rows():
+                columnar_writer.write(row)
+                count += 1
+        return count
+    with open(output_path, "w", encoding="utf-8", newline="") as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=METADATA_FIELDNAMES)
+        writer.writeheader()
+        for row in queue.rows():
+            writer.writerow(row)
+            count += 1
+    return count
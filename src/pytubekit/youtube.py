@@ -1,22 +1,268 @@
 """
 Module that handles the interaction with the yt_dlp library
 
+Downloads go through a Downloader: the urls given are expanded (flat) into one
+job per video, and the jobs run on a pool of workers, each with its own
+YoutubeDL object and with concurrent fragment downloads. Finished videos are
+appended to a download archive, so they are skipped by later runs, and the jobs
+not finished yet are kept in a queue file, so an interrupted run is resumed by
+the next one even when the playlist it came from has changed since. Every job
+is resolved (its formats chosen) before it is downloaded, so that downloads from
+one media host (the CDN server the chosen formats come from, not the page the
+video is on) are limited to per_host at a time. The bandwidth limit is shared
+evenly by the workers.
+
 References:
 - https://github.com/yt-dlp/yt-dlp#embedding-yt-dlp
 """
+import json
 import logging
+import os
+import threading
+import time
+import urllib.parse
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any
 
 import yt_dlp
 
+from pytubekit.fileio import write_atomically
 from pytubekit.static import LOGGER_NAME
+from pytubekit.tracing import TRACER
+from pytubekit.util import YT_DLP_METHOD
+
+YT_DLP_DOWNLOAD_METHOD = "yt_dlp.download"
+
+
+@dataclass(frozen=True)
+class DownloadJob:
+    # the download archive key: "<extractor> <video id>", as in yt-dlp archives
+    key: str
+    url: str
 
 
-def youtube_dl_download_urls(urls: list[str]) -> None:
+@dataclass
+class DownloadResult:
+    done: list[str] = field(default_factory=list)
+    skipped: int = 0
+    failed: list[str] = field(default_factory=list)
+
+
+def youtube_dl_flat_extract(url: str, cookies_from_browser: str | None = None, cookie_file: str | None = None) -> dict[str, Any]:
+    """
+    the info dict of a playlist, channel or feed url with its entries listed but not resolved (one
+    request per page of about 100 entries, no API quota); credentials come from .netrc and, if given,
+    from the cookies of a browser or a cookies.txt file
+    """
     logger = logging.getLogger(LOGGER_NAME)
-    ydl_opts = {
+    ydl_opts: dict[str, Any] = {
         "extract_flat": True,
         "usenetrc": True,
+        "quiet": True,
+        "no_warnings": True,
+        "skip_download": True,
     }
-    logger.debug(f"passing options {ydl_opts}")
+    if cookies_from_browser is not None:
+        ydl_opts["cookiesfrombrowser"] = (cookies_from_browser,)
+    if cookie_file is not None:
+        ydl_opts["cookiefile"] = cookie_file
+    logger.debug(f"flat extracting [{url}]")
+    start = time.perf_counter()
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download(urls)
+        info = ydl.extract_info(url, download=False)
+        info = ydl.sanitize_info(info) if info else {}
+    TRACER.record(YT_DLP_METHOD, 200 if info else 404, 0, time.perf_counter() - start)
+    entries = info.get("entries") or []
+    logger.debug(f"got [{len(entries)}] entries from [{url}]")
+    return info
+
+
+def youtube_dl_resolve(url: str, ydl_opts: dict[str, Any]) -> dict[str, Any]:
+    """ the info dict of one video with its formats chosen, nothing downloaded yet """
+    start = time.perf_counter()
+    status = 500
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        status = 200 if info else 404
+    finally:
+        TRACER.record(YT_DLP_METHOD, status, 0, time.perf_counter() - start)
+    if not info:
+        raise ValueError(f"no info for [{url}]")
+    return info
+
+
+def youtube_dl_download_info(info: dict[str, Any], ydl_opts: dict[str, Any]) -> None:
+    """ download a video resolved by youtube_dl_resolve(); raises yt_dlp.utils.DownloadError when it fails """
+    start = time.perf_counter()
+    status = 500
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.process_ie_result(info, download=True)
+        status = 200
+    finally:
+        TRACER.record(YT_DLP_DOWNLOAD_METHOD, status, 0, time.perf_counter() - start)
+
+
+def media_host(info: dict[str, Any]) -> str:
+    """ the host the chosen formats of a resolved video are downloaded from (the page host when it has none) """
+    formats = info.get("requested_formats") or [info]
+    for media_format in formats:
+        host = urllib.parse.urlsplit(media_format.get("url") or "").netloc
+        if host:
+            return host
+    return urllib.parse.urlsplit(info.get("webpage_url") or "").netloc
+
+
+def get_jobs(info: dict[str, Any], extract: Callable[[str], dict[str, Any]]) -> list[DownloadJob]:
+    """ the videos of a flat info dict; entries which are playlists themselves (channel tabs) are expanded """
+    if "entries" not in info:
+        extractor = info.get("extractor_key", "").lower()
+        video_id = info["id"]
+        return [DownloadJob(f"{extractor} {video_id}", info.get("webpage_url") or video_id)]
+    jobs: list[DownloadJob] = []
+    for entry in info["entries"] or []:
+        if not entry or not entry.get("id"):
+            continue
+        ie_key = entry.get("ie_key") or ""
+        if ie_key.endswith("Tab") or entry.get("_type") == "playlist":
+            jobs.extend(get_jobs(extract(entry["url"]), extract))
+        else:
+            video_id = entry["id"]
+            jobs.append(DownloadJob(f"{ie_key.lower()} {video_id}", entry.get("url") or video_id))
+    return jobs
+
+
+class Downloader:
+    def __init__(
+        self,
+        *,
+        workers: int = 1,
+        fragments: int = 1,
+        archive: str | None = None,
+        queue_file: str | None = None,
+        rate_limit: int | None = None,
+        per_host: int | None = None,
+        extract: Callable[[str], dict[str, Any]] = youtube_dl_flat_extract,
+        resolve: Callable[[str, dict[str, Any]], dict[str, Any]] = youtube_dl_resolve,
+        download: Callable[[dict[str, Any], dict[str, Any]], None] = youtube_dl_download_info,
+    ) -> None:
+        """
+        rate_limit is in bytes per second for all workers together (None for no limit) and per_host the
+        number of downloads from one media host at a time (None for as many as there are workers)
+        """
+        self.workers = workers
+        self.fragments = fragments
+        self.archive = archive
+        self.queue_file = queue_file
+        self.rate_limit = rate_limit
+        self.per_host = per_host if per_host is not None else workers
+        self.extract = extract
+        self.resolve = resolve
+        self.download = download
+        self.host_locks: dict[str, threading.BoundedSemaphore] = {}
+        self.lock = threading.Lock()
+
+    def ydl_opts(self) -> dict[str, Any]:
+        ydl_opts: dict[str, Any] = {
+            "usenetrc": True,
+            "concurrent_fragment_downloads": self.fragments,
+        }
+        if self.rate_limit is not None:
+            ydl_opts["ratelimit"] = max(self.rate_limit // self.workers, 1)
+        return ydl_opts
+
+    def read_archive(self) -> set[str]:
+        if self.archive is None or not os.path.isfile(self.archive):
+            return set()
+        with open(self.archive) as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def add_to_archive(self, job: DownloadJob) -> None:
+        if self.archive is None:
+            return
+        folder = os.path.dirname(self.archive)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.archive, "a") as f:
+            f.write(f"{job.key}\n")
+
+    def read_queue(self) -> list[DownloadJob]:
+        if self.queue_file is None or not os.path.isfile(self.queue_file):
+            return []
+        with open(self.queue_file) as f:
+            return [DownloadJob(**json.loads(line)) for line in f if line.strip()]
+
+    def write_queue(self, jobs: list[DownloadJob]) -> None:
+        if self.queue_file is None:
+            return
+        data = "".join(json.dumps({"key": job.key, "url": job.url}) + "\n" for job in jobs)
+        write_atomically(self.queue_file, data.encode())
+
+    def host_lock(self, host: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.host_locks:
+                self.host_locks[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_locks[host]
+
+    def run_job(self, job: DownloadJob) -> None:
+        ydl_opts = self.ydl_opts()
+        # the media host is only known once the formats are chosen
+        info = self.resolve(job.url, ydl_opts)
+        with self.host_lock(media_host(info)):
+            self.download(info, ydl_opts)
+
+    def run(self, urls: list[str]) -> DownloadResult:
+        """ download the videos of urls and of the queue left by an earlier run, except archived ones """
+        logger = logging.getLogger(LOGGER_NAME)
+        jobs = {job.key: job for job in self.read_queue()}
+        for url in urls:
+            for job in get_jobs(self.extract(url), self.extract):
+                jobs.setdefault(job.key, job)
+        archived = self.read_archive()
+        pending = {key: job for key, job in jobs.items() if key not in archived}
+        result = DownloadResult(skipped=len(jobs) - len(pending))
+        logger.info(f"downloading [{len(pending)}] videos, [{result.skipped}] already archived")
+        self.write_queue(list(pending.values()))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.run_job, job): job for job in pending.values()}
+            # the archive and the queue are only written from this thread
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    future.result()
+                except Exception as e:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+                    logger.warning(f"[{job.url}] failed, it stays queued: {e}")
+                    result.failed.append(job.key)
+                    continue
+                result.done.append(job.key)
+                self.add_to_archive(job)
+                del pending[job.key]
+                self.write_queue(list(pending.values()))
+        logger.info(f"downloaded [{len(result.done)}] videos, [{len(result.failed)}] failed")
+        return result
+
+
+def youtube_dl_download_urls(
+    urls: list[str],
+    *,
+    workers: int = 1,
+    fragments: int = 1,
+    archive: str | None = None,
+    queue_file: str | None = None,
+    rate_limit: int | None = None,
+    per_host: int | None = None,
+) -> DownloadResult:
+    logger = logging.getLogger(LOGGER_NAME)
+    downloader = Downloader(
+        workers=workers,
+        fragments=fragments,
+        archive=archive,
+        queue_file=queue_file,
+        rate_limit=rate_limit,
+        per_host=per_host,
+    )
+    logger.debug(f"passing options {downloader.ydl_opts()}")
+    return downloader.run(urls)
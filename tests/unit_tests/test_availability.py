@@ -0,0 +1,71 @@
+"""
+test_availability.py
+"""
+
+import os
+import tempfile
+import unittest
+
+from pytubekit.api import Client
+from pytubekit.availability import AvailabilityCache, classify
+from pytubekit.constants import PRIVATE_TITLE
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+
+
+class TestAvailability(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeYouTube(FakeAccount.synthetic(playlists=3, items=60, seed=1))
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_availability_cleanup(self):
+        api = self.api
+        playlist = next(iter(api.account.playlists.values()))
+        # removed without its items being retitled, as with terminated channels
+        gone = next(item[1] for item in playlist.items if api.account.videos.get(item[1], ("", "", ""))[2] == "public")
+        del api.account.videos[gone]
+        client = Client(base_url=self.server.base_url, dry_run=True)
+        by_title = client.cleanup(dedup=False)
+        cache_path = os.path.join(tempfile.mkdtemp(), "availability.json")
+        checked = client.cleanup(dedup=False, availability=True, availability_cache=AvailabilityCache(cache_path))
+        self.assertGreater(checked.found["deleted"], by_title.found["deleted"])
+        self.assertIn(gone, {operation.video_id for operation in checked.plan.operations})
+        calls = api.stats()["calls"]["youtube.videos.list"]
+        again = client.cleanup(dedup=False, availability=True, availability_cache=AvailabilityCache(cache_path))
+        self.assertEqual(api.stats()["calls"]["youtube.videos.list"], calls)
+        self.assertEqual(again.found, checked.found)
+
+    def test_availability_keeps_private_unless_privatized(self):
+        api = self.api
+        playlist = next(iter(api.account.playlists.values()))
+        private = next(item[1] for item in playlist.items if api.account.videos.get(item[1], ("", "", ""))[2] == "public")
+        title, channel, _ = api.account.videos[private]
+        api.account.videos[private] = (title, channel, "private")
+        for other in api.account.playlists.values():
+            for item in other.items:
+                if item[1] == private:
+                    item[2] = PRIVATE_TITLE
+        client = Client(base_url=self.server.base_url, dry_run=True)
+        # videos.list leaves private videos out, so they look missing
+        kept = client.cleanup(dedup=False, privatized=False, availability=True)
+        self.assertNotIn(private, {operation.video_id for operation in kept.plan.operations})
+        self.assertEqual(kept.found["private"], 0)
+        removed = client.cleanup(dedup=False, deleted=False, availability=True)
+        self.assertIn(private, {operation.video_id for operation in removed.plan.operations})
+
+    def test_classify(self):
+        restricted = {"status": {"privacyStatus": "public"}, "contentDetails": {"regionRestriction": {"allowed": ["US"]}}}
+        self.assertEqual(classify(None), "missing")
+        self.assertEqual(classify({"status": {"privacyStatus": "private"}}), "private")
+        self.assertEqual(classify({"status": {"privacyStatus": "public", "uploadStatus": "rejected"}}), "rejected")
+        self.assertEqual(classify(restricted), "available")
+        self.assertEqual(classify(restricted, "US"), "available")
+        self.assertEqual(classify(restricted, "IL"), "blocked")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,17 +2,56 @@
 test_basic.py
 """
 
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import random
 import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
 from googleapiclient.errors import HttpError
 
-from pytubekit.constants import NEXT_PAGE_TOKEN, ITEMS_TOKEN, DELETED_TITLE, PRIVATE_TITLE
+import pytubekit.main  # noqa: F401  # pylint: disable=unused-import  # registers the endpoints
+from pytubekit.api import CleanupResult, Client, Playlist
+from pytubekit.batch import parse_lines, parse_yaml, run_steps
+from pytubekit.benchmark import BENCHMARKS, compare_to_baseline, run_benchmarks, synthetic_account
+from pytubekit.cache import CACHE, Cache
+from pytubekit.client import call
+from pytubekit.columnar import ColumnarWriter, read_table
+from pytubekit.configs import ConfigProfile, ConfigTrace
+from pytubekit.constants import DELETED_TITLE, ITEMS_TOKEN, NEXT_PAGE_TOKEN, PRIVATE_TITLE
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.history import ADDED, REMOVED, Change, HistoryStore, parse_time
+from pytubekit.planner import Plan, plan_add, plan_overflow, plan_sync
+from pytubekit.profiling import profiled
+from pytubekit.progress import Progress
+from pytubekit.records import PlaylistItem
+from pytubekit.serve import ServeServer
+from pytubekit.sketch import Sketch, get_file_sketch, get_sketch_path, merged_sketch
+from pytubekit.sources import YtDlpSource
+from pytubekit.streams import detect_compression
+from pytubekit.tracing import TRACER, Histogram, traced
 from pytubekit.util import (
-    PagedRequest, get_playlist_ids_from_names, cleanup_items,
-    retry_execute, read_video_ids_from_files, log_progress,
+    METADATA_FIELDNAMES,
+    PagedRequest,
+    add_video_to_playlist,
+    apply_plan,
+    create_playlist_request,
+    delete_playlist_item_by_id,
+    get_youtube_at,
+    longest_increasing_subsequence,
+    move_playlist_item,
+    read_all_dump_files,
+    read_video_ids_from_files,
+    retry_execute,
 )
+from pytubekit.youtube import Downloader, media_host
 
 
 def _make_item(video_id: str, title: str = "Title", item_id: str | None = None) -> dict:
@@ -77,41 +116,31 @@ class TestPagedRequestSinglePage(unittest.TestCase):
         self.assertEqual(result, [])
 
 
-class TestGetPlaylistIdsFromNames(unittest.TestCase):
-    @patch("pytubekit.util.create_playlists_request")
-    def test_lookup(self, mock_create):
-        mock_pr = MagicMock()
-        mock_pr.get_all_items.return_value = [
+class TestPlaylistIds(unittest.TestCase):
+    def setUp(self):
+        source = MagicMock()
+        source.list_playlists.return_value = [
             _make_playlist_item("id_a", "Playlist A"),
             _make_playlist_item("id_b", "Playlist B"),
         ]
-        mock_create.return_value = mock_pr
-        youtube = MagicMock()
-        result = get_playlist_ids_from_names(youtube, ["Playlist B", "Playlist A"])
-        self.assertEqual(result, ["id_b", "id_a"])
+        self.client = Client(MagicMock(), source=source)
 
-    @patch("pytubekit.util.create_playlists_request")
-    def test_missing_name_raises(self, mock_create):
-        mock_pr = MagicMock()
-        mock_pr.get_all_items.return_value = [
-            _make_playlist_item("id_a", "Playlist A"),
-        ]
-        mock_create.return_value = mock_pr
-        youtube = MagicMock()
+    def test_lookup(self):
+        self.assertEqual(self.client.playlist_ids(["Playlist B", "Playlist A"]), ["id_b", "id_a"])
+
+    def test_missing_name_raises(self):
         with self.assertRaises(KeyError):
-            get_playlist_ids_from_names(youtube, ["No Such Playlist"])
+            self.client.playlist_ids(["No Such Playlist"])
 
 
-class TestCleanupItems(unittest.TestCase):
+class TestCleanup(unittest.TestCase):
     def _run_cleanup(self, items, *, dedup=False, check_deleted=False, check_privatized=False, do_delete=True):
         youtube = MagicMock()
-        cleanup_items(
-            youtube, items,
-            dedup=dedup,
-            check_deleted=check_deleted,
-            check_privatized=check_privatized,
-            do_delete=do_delete,
-        )
+        source = MagicMock()
+        source.list_playlists.return_value = [_make_playlist_item("pl", "Playlist")]
+        source.list_records.return_value = [PlaylistItem.from_resource(item) for item in items]
+        client = Client(youtube, source=source, dry_run=not do_delete)
+        client.cleanup(["Playlist"], dedup=dedup, deleted=check_deleted, privatized=check_privatized)
         return youtube
 
     def test_dedup_removes_second_occurrence(self):
@@ -134,7 +163,7 @@ class TestCleanupItems(unittest.TestCase):
         youtube = self._run_cleanup(items, check_privatized=True)
         youtube.playlistItems().delete.assert_called_once_with(id="i1")
 
-    def test_do_delete_false_skips_api_call(self):
+    def test_dry_run_skips_api_call(self):
         items = [_make_item("v1", title=DELETED_TITLE, item_id="i1")]
         youtube = self._run_cleanup(items, check_deleted=True, do_delete=False)
         youtube.playlistItems().delete.assert_not_called()
@@ -215,18 +244,744 @@ class TestReadVideoIdsFromFiles(unittest.TestCase):
         self.assertEqual(result, set())
 
 
-class TestLogProgress(unittest.TestCase):
-    def test_logs_at_interval(self):
-        logger = MagicMock()
-        log_progress(logger, 100, 500, interval=100)
-        logger.info.assert_called_once()
+class TestTracer(unittest.TestCase):
+    def tearDown(self):
+        TRACER.close()
+
+    def test_disabled_records_nothing(self):
+        request = MagicMock(methodId="youtube.playlists.list")
+        request.execute.return_value = {ITEMS_TOKEN: []}
+        retry_execute(request)
+        self.assertEqual(TRACER.stats, {})
+
+    @patch("pytubekit.util.time.sleep")
+    def test_trace_and_prometheus_outputs(self, _mock_sleep):
+        with tempfile.TemporaryDirectory() as folder:
+            trace_file = os.path.join(folder, "trace.jsonl")
+            prom_file = os.path.join(folder, "pytubekit.prom")
+            TRACER.open(trace_file, prom_file)
+            resp = MagicMock()
+            resp.status = 503
+            request = MagicMock(methodId="youtube.playlistItems.delete")
+            request.execute.side_effect = [HttpError(resp, b"unavailable"), {}]
+            retry_execute(request, max_retries=3)
+            self.assertEqual(TRACER.total_quota(), 100)
+            TRACER.close()
+            with open(trace_file) as f:
+                records = [json.loads(line) for line in f]
+            # one record per attempt, so the backoff sleep is in neither latency
+            self.assertEqual(len(records), 2)
+            self.assertEqual({record["method"] for record in records}, {"youtube.playlistItems.delete"})
+            self.assertEqual([(record["attempt"], record["status"]) for record in records], [(0, 503), (1, 200)])
+            with open(prom_file) as f:
+                text = f.read()
+            self.assertIn("pytubekit_api_quota_units_total{method=\"youtube.playlistItems.delete\"} 100", text)
+            self.assertIn("pytubekit_api_retries_total{method=\"youtube.playlistItems.delete\"} 1", text)
+            self.assertIn("pytubekit_api_call_duration_seconds_count{method=\"youtube.playlistItems.delete\"} 2", text)
+
+    def test_nested_endpoints_share_the_trace(self):
+        def step():
+            TRACER.record("youtube.playlists.list", 200, 0, 0.01)
+
+        @traced
+        def script():
+            traced(step)()
+            traced(step)()
+        with tempfile.TemporaryDirectory() as folder:
+            trace_file = os.path.join(folder, "trace.jsonl")
+            with patch.object(ConfigTrace, "trace_file", trace_file):
+                script()
+            self.assertFalse(TRACER.enabled)
+            with open(trace_file) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+    def test_network_wait_counts_overlap_once(self):
+        TRACER.collect()
+        since = time.perf_counter() - 10
+        # two calls of 1s and 0.5s which ended together, as on two threads
+        TRACER.record("youtube.playlists.list", 200, 0, 1.0)
+        TRACER.record("youtube.playlists.list", 200, 0, 0.5)
+        self.assertAlmostEqual(TRACER.total_latency(), 1.5)
+        self.assertAlmostEqual(TRACER.network_wait(since), 1.0, places=2)
+        self.assertEqual(TRACER.network_wait(time.perf_counter()), 0.0)
+
+    def test_histogram_is_cumulative(self):
+        h = Histogram([0.1, 1.0])
+        h.observe(0.05)
+        h.observe(0.5)
+        h.observe(5.0)
+        self.assertEqual(h.counts, [1, 2])
+        self.assertEqual(h.count, 3)
+        self.assertEqual(h.quantile(0.5), 1.0)
+        self.assertEqual(h.quantile(1.0), float("inf"))
+
+
+class TestProfiled(unittest.TestCase):
+    def tearDown(self):
+        ConfigProfile.profile = "none"
+        TRACER.close()
+
+    def _run_profiled(self, mode: str, stats_file: str) -> list[int]:
+        calls: list[int] = []
+        ConfigProfile.profile = mode
+        ConfigProfile.profile_file = stats_file
+        with patch("sys.stderr"):
+            profiled(lambda: calls.append(sum(range(1000))))()
+        return calls
+
+    def test_none_runs_plainly(self):
+        calls = self._run_profiled("none", "unused")
+        self.assertEqual(calls, [499500])
+
+    def test_cprofile_writes_stats(self):
+        with tempfile.TemporaryDirectory() as folder:
+            stats_file = os.path.join(folder, "out.prof")
+            calls = self._run_profiled("cprofile", stats_file)
+            self.assertEqual(calls, [499500])
+            self.assertTrue(os.path.getsize(stats_file) > 0)
+
+    def test_tracemalloc_writes_snapshot(self):
+        with tempfile.TemporaryDirectory() as folder:
+            stats_file = os.path.join(folder, "out.snapshot")
+            self._run_profiled("tracemalloc", stats_file)
+            self.assertTrue(os.path.exists(stats_file))
+
+
+class TestProgress(unittest.TestCase):
+    def _make(self, total: int, stream=None):
+        now = [0.0]
+        progress = Progress(total=total, label="test", interval=5.0, stream=stream, clock=lambda: now[0])
+        progress.logger = MagicMock()
+        return progress, now
+
+    def test_emits_by_time_not_count(self):
+        progress, now = self._make(1000)
+        for _ in range(10):
+            now[0] += 1.0
+            progress.advance()
+        self.assertEqual(progress.logger.info.call_count, 2)
+
+    def test_emits_at_end(self):
+        progress, _now = self._make(3)
+        for _ in range(3):
+            progress.advance()
+        progress.logger.info.assert_called_once()
+
+    def test_json_stream_rate_and_eta(self):
+        stream = io.StringIO()
+        progress, now = self._make(100, stream=stream)
+        for _ in range(10):
+            now[0] += 1.0
+            progress.advance(5, quota=50)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(records[-1]["done"], 50)
+        self.assertAlmostEqual(records[-1]["rate"], 5.0)
+        self.assertAlmostEqual(records[-1]["eta"], 10.0)
+        self.assertAlmostEqual(records[-1]["quota_rate"], 50.0)
+
+    def test_aggregates_across_threads(self):
+        progress, _now = self._make(400)
+        threads = [threading.Thread(target=lambda: [progress.advance() for _ in range(100)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(progress.done, 400)
+        self.assertEqual(sum(progress.per_worker.values()), 400)
+
+
+class TestPlan(unittest.TestCase):
+    def _make_plan(self) -> Plan:
+        plan = Plan("test")
+        plan.add_snapshot("pl", [_make_item("v1", item_id="i1"), _make_item("v2", item_id="i2")], "Playlist")
+        return plan
+
+    def test_cost_and_days(self):
+        plan = self._make_plan()
+        plan.delete("pl", "i1", "v1")
+        plan.insert("pl", "v3")
+        plan.insert("other", "v4")
+        self.assertEqual(plan.counts(), {"delete": 1, "insert": 2})
+        self.assertEqual(plan.quota_cost(), 150)
+        self.assertEqual(plan.days_needed(100), 2)
+
+    def test_cost_counts_reorder_moves(self):
+        plan = self._make_plan()
+        for video_id in ("v3", "v4", "v5"):
+            plan.insert("pl", video_id)
+        plan.insert("pl", "v6", position=0)
+        plan.insert("other", "v7")
+        plan.insert("other", "v8")
+        self.assertEqual(plan.reorder_moves(1), 0)
+        # all but one append of each run to a playlist may land out of order and be moved
+        self.assertEqual(plan.reorder_moves(8), 3)
+        self.assertEqual(plan.quota_cost(8), plan.quota_cost() + 150)
+        self.assertEqual(plan.days_needed(300, 8), 2)
+
+    def test_simulate(self):
+        plan = self._make_plan()
+        plan.delete("pl", "i1", "v1")
+        plan.insert("pl", "v3", position=0)
+        plan.insert("pl", "v4")
+        plan.update("pl", "i2", "v2", 0)
+        self.assertEqual(plan.simulate(), {"pl": ["v2", "v3", "v4"]})
+
+    def test_simulate_playlist_operations(self):
+        plan = self._make_plan()
+        plan.delete_playlist("pl")
+        plan.create_playlist("New", "", "private")
+        self.assertEqual(plan.simulate(), {"New": []})
+
+    def test_dry_run_does_not_execute(self):
+        plan = self._make_plan()
+        plan.delete("pl", "i1", "v1")
+        youtube = MagicMock()
+        self.assertEqual(apply_plan(youtube, plan, execute=False), 0)
+        youtube.playlistItems().delete.assert_not_called()
 
-    def test_logs_at_total(self):
-        logger = MagicMock()
-        log_progress(logger, 500, 500, interval=100)
-        logger.info.assert_called_once()
+    def test_execute(self):
+        plan = self._make_plan()
+        plan.delete("pl", "i1", "v1")
+        plan.insert("pl", "v3", position=1)
+        youtube = MagicMock()
+        self.assertEqual(apply_plan(youtube, plan, execute=True), 2)
+        youtube.playlistItems().delete.assert_called_once_with(id="i1")
+        body = youtube.playlistItems().insert.call_args.kwargs["body"]
+        self.assertEqual(body["snippet"]["position"], 1)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmarks(self):
+        account = synthetic_account(playlists=2, items=120, seed=1)
+        results = run_benchmarks(account, repeat=1)
+        self.assertEqual(set(results), set(BENCHMARKS))
+        # one listing call plus the item pages of every playlist
+        pages = sum((len(items) + 49) // 50 for items in account["items"].values())
+        self.assertEqual(sum(results["dump"]["calls"].values()), 1 + pages)
+        self.assertEqual(results["dump"]["quota"], 1 + pages)
+        # a dry run: the same reads, no writes
+        self.assertEqual(results["cleanup"]["calls"], results["dump"]["calls"])
+        self.assertEqual(results["local_diff"]["quota"], 0)
+        # under serve and run the process wide cache is on; the benchmarks neither read nor fill it
+        CACHE.enable()
+        try:
+            cached = run_benchmarks(account, repeat=1)
+            self.assertEqual(CACHE.stats()["misses"], 0)
+        finally:
+            CACHE.disable()
+        self.assertEqual(cached["subtract"]["calls"], results["subtract"]["calls"])
+        self.assertEqual(cached["dump"]["calls"], results["dump"]["calls"])
+
+    def test_compare_to_baseline(self):
+        baseline = {"dump": {"seconds": 1.0, "calls": {"m": 3}, "quota": 3}}
+        same = {"dump": {"seconds": 1.1, "calls": {"m": 3}, "quota": 3}}
+        worse = {"dump": {"seconds": 2.0, "calls": {"m": 4}, "quota": 4}}
+        self.assertEqual(compare_to_baseline(same, baseline, tolerance=20), [])
+        self.assertEqual(len(compare_to_baseline(worse, baseline, tolerance=20)), 3)
+
+
+class TestFakeApi(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeYouTube(FakeAccount.synthetic(playlists=3, items=120, seed=2), quota_limit=1000)
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+        self.youtube = get_youtube_at(self.server.base_url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_paginated_listing(self):
+        playlist = self.api.account.playlists["PL00000001"]
+        items = create_playlist_request(self.youtube, "PL00000001").get_all_items()
+        self.assertEqual([item["id"] for item in items], [item[0] for item in playlist.items])
+        self.assertEqual(items[-1]["snippet"]["position"], len(items) - 1)
+        self.assertTrue(all(item["etag"] for item in items))
+        pages = (len(items) + 49) // 50
+        self.assertEqual(self.api.stats()["quota"], {"youtube.playlistItems.list": pages})
+
+    def test_insert_update_delete(self):
+        video_id = next(iter(self.api.account.videos))
+        item = add_video_to_playlist(self.youtube, "PL00000000", video_id, position=0)
+        self.assertEqual(item["snippet"]["position"], 0)
+        move_playlist_item(self.youtube, "PL00000000", item["id"], video_id, 2)
+        self.assertEqual(self.api.account.playlists["PL00000000"].items[2][0], item["id"])
+        delete_playlist_item_by_id(self.youtube, item["id"])
+        self.assertNotIn(item["id"], self.api.account.item_index)
+        self.assertEqual(self.api.stats()["quota_used"], 150)
+
+    def test_inserts_send_positions_until_refused(self):
+        self.api.quota_limit = 10000
+        for playlist_id, manual_sort in (("PL00000000", True), ("PL00000001", False)):
+            playlist = self.api.account.playlists[playlist_id]
+            playlist.manual_sort = manual_sort
+            before = [item[1] for item in playlist.items]
+            video_ids = [video_id for video_id in self.api.account.videos if video_id not in before][:3]
+            with patch("pytubekit.util.add_video_to_playlist", wraps=add_video_to_playlist) as add:
+                apply_plan(self.youtube, plan_add(playlist_id, [], video_ids), execute=True, dedup=True)
+            positions = [call.kwargs.get("position") for call in add.call_args_list]
+            if manual_sort:
+                self.assertEqual(positions, [len(before), len(before) + 1, len(before) + 2])
+            else:
+                # refused once, then appended without positions
+                self.assertEqual(positions, [len(before), None, None, None])
+            self.assertEqual([item[1] for item in playlist.items], before + video_ids)
+        self.assertNotIn("youtube.playlistItems.update", self.api.stats()["quota"])
+
+    def test_quota_exceeded(self):
+        self.api.quota_limit = 0
+        with self.assertRaises(HttpError) as context:
+            self.youtube.channels().list(part="id", mine=True).execute()
+        self.assertEqual(context.exception.resp.status, 403)
+        self.assertEqual(context.exception.error_details[0]["reason"], "quotaExceeded")
+
+    def test_fault_injection(self):
+        self.api.fault_rates = {503: 1000}
+        with self.assertRaises(HttpError) as context:
+            self.youtube.videos().list(part="id", id="v0000000000").execute()
+        self.assertEqual(context.exception.resp.status, 503)
+        self.assertEqual(self.api.stats()["faults"], {"503": 1})
+
+
+class TestInsertPlanning(unittest.TestCase):
+    def test_longest_increasing_subsequence(self):
+        values = [3, 0, 1, 7, 2, 5]
+        keep = longest_increasing_subsequence(values)
+        self.assertEqual(len(keep), 4)
+        kept = [values[i] for i in sorted(keep)]
+        self.assertEqual(kept, sorted(kept))
+        self.assertEqual(longest_increasing_subsequence([]), set())
+
+    def test_plan_add_skips_present(self):
+        plan = plan_add("pl", [_make_item("v1")], ["v1", "v2", "v2", "v3"])
+        self.assertEqual([operation.video_id for operation in plan.operations], ["v2", "v3"])
+
+    def test_plan_overflow(self):
+        source = [_make_item(f"v{i}", item_id=f"i{i}") for i in range(5)]
+        plan = plan_overflow("src", source, "dst", [_make_item("v1")], available=2)
+        kinds = [(operation.kind, operation.video_id) for operation in plan.operations]
+        # v1 is already in the destination, so it is only deleted from the source
+        self.assertEqual(kinds, [
+            ("insert", "v0"), ("insert", "v2"),
+            ("delete", "v0"), ("delete", "v1"), ("delete", "v2"),
+        ])
+
+    def test_plan_sync_is_minimal(self):
+        items = [_make_item(video_id, item_id=f"i{video_id}") for video_id in "abcd"]
+        self.assertEqual(plan_sync("pl", items, list("abcd")).operations, [])
+        self.assertEqual(plan_sync("pl", items, list("acbd")).counts(), {"update": 1})
+        self.assertEqual(plan_sync("pl", items, list("abxc")).counts(), {"delete": 1, "insert": 1})
+
+    def test_plan_sync_reaches_target(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            current = [rng.choice("abcdefgh") for _ in range(rng.randint(0, 12))]
+            target = [rng.choice("abcdefghij") for _ in range(rng.randint(0, 12))]
+            items = [_make_item(video_id, item_id=f"i{i}") for i, video_id in enumerate(current)]
+            self.assertEqual(plan_sync("pl", items, target).simulate()["pl"], target)
+
+
+class TestCache(unittest.TestCase):
+    def test_disabled_always_fetches(self):
+        cache = Cache()
+        fetch = MagicMock(return_value=[])
+        cache.get_items("pl", fetch)
+        cache.get_items("pl", fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_hits_and_invalidation(self):
+        cache = Cache()
+        cache.enable()
+        fetch = MagicMock(return_value=[{"id": "i1"}])
+        cache.get_items("pl", fetch)
+        cache.get_items("pl", fetch)
+        self.assertEqual(fetch.call_count, 1)
+        cache.invalidate_item("i1")
+        cache.get_items("pl", fetch)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(cache.stats(), {"playlists": 1, "hits": 1, "misses": 2})
+
+    def test_ttl(self):
+        cache = Cache()
+        cache.enable(ttl=0)
+        fetch = MagicMock(return_value=[])
+        cache.get_playlists(fetch)
+        cache.get_playlists(fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+
+class TestClient(unittest.TestCase):
+    def setUp(self):
+        self.apis = [FakeYouTube(FakeAccount.synthetic(playlists=3, items=60, seed=seed)) for seed in (1, 2)]
+        self.servers = [FakeApiServer(api) for api in self.apis]
+        for server in self.servers:
+            server.start()
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def test_concurrent_clients_keep_their_settings(self):
+        clients = [
+            Client(base_url=self.servers[0].base_url, page_size=10),
+            Client(base_url=self.servers[1].base_url, page_size=50),
+        ]
+        results: dict[int, list[Playlist]] = {}
+
+        def read(index: int) -> None:
+            client = clients[index]
+            results[index] = list(client.playlists())
+            for playlist in results[index]:
+                self.assertEqual(len(list(client.items(playlist_id=playlist.id))), playlist.item_count)
+
+        threads = [threading.Thread(target=read, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index, api in enumerate(self.apis):
+            self.assertEqual([playlist.id for playlist in results[index]], list(api.account.playlists))
+        pages = self.apis[0].stats()["calls"]["youtube.playlistItems.list"]
+        self.assertGreater(pages, self.apis[1].stats()["calls"]["youtube.playlistItems.list"])
+
+    def test_dry_run_cleanup_and_merge(self):
+        api = self.apis[0]
+        client = Client(base_url=self.servers[0].base_url, dry_run=True)
+        result = client.cleanup()
+        self.assertIsInstance(result, CleanupResult)
+        self.assertFalse(result.executed)
+        self.assertEqual(result.done, 0)
+        self.assertEqual(result.seen, sum(len(playlist.items) for playlist in api.account.playlists.values()))
+        # an item can be found for several reasons but is deleted once
+        self.assertGreater(len(result.plan.operations), 0)
+        self.assertLessEqual(len(result.plan.operations), sum(result.found.values()))
+        titles = [playlist.title for playlist in client.playlists()]
+        merge = client.merge(titles[1:], titles[0], dedup=True)
+        self.assertGreater(len(merge.plan.operations), 0)
+        # without dedup the destination is counted, not read
+        calls = api.stats()["calls"]["youtube.playlistItems.list"]
+        merge = client.merge(titles[1:2], titles[0])
+        destination = api.account.playlists[merge.plan.operations[0].playlist_id]
+        source = next(playlist for playlist in api.account.playlists.values() if playlist.title == titles[1])
+        self.assertEqual(api.stats()["calls"]["youtube.playlistItems.list"] - calls, (len(source.items) + 49) // 50)
+        self.assertEqual(len(merge.plan.simulate()[destination.playlist_id]), len(destination.items) + len(merge.plan.operations))
+        self.assertNotIn("youtube.playlistItems.insert", api.stats()["calls"])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "needs pyarrow")
+    def test_columnar_dump(self):
+        api = self.apis[0]
+        folder = tempfile.mkdtemp()
+        for output_format in ("parquet", "arrow"):
+            paths = Client(base_url=self.servers[0].base_url).dump(folder, output_format=output_format)
+            table = read_table(paths[0])
+            self.assertEqual(table.num_rows, sum(len(playlist.items) for playlist in api.account.playlists.values()))
+            self.assertEqual(str(table.schema.field("position").type), "int64")
+            self.assertEqual(table.column("position").to_pylist()[:3], [0, 1, 2])
+
+    def test_compressed_dump(self):
+        client = Client(base_url=self.servers[0].base_url)
+        plain = tempfile.mkdtemp()
+        client.dump(plain)
+        expected = read_all_dump_files(plain)
+        compressions = ["none", "gzip"] + (["zstd"] if importlib.util.find_spec("zstandard") else [])
+        for compression in compressions:
+            folder = tempfile.mkdtemp()
+            paths = client.dump(folder, full=True, jsonl=True, compression=compression)
+            self.assertEqual(detect_compression(paths[0]), compression)
+            self.assertEqual(read_all_dump_files(folder), expected)
+        self.assertTrue(paths[0].endswith(".zst" if "zstd" in compressions else ".gz"))
+
+    def test_item_records(self):
+        client = Client(base_url=self.servers[0].base_url)
+        playlist_id = next(iter(self.apis[0].account.playlists))
+        items = list(client.items(playlist_id=playlist_id))
+        self.assertFalse(hasattr(items[0], "__dict__"))
+        self.assertTrue(all(item.raw is None for item in items))
+        self.assertTrue(all(item.playlist_id is items[0].playlist_id for item in items))
+        raw = list(client.items(playlist_id=playlist_id, raw=True))
+        self.assertEqual(raw, items)
+        self.assertEqual(raw[0].raw["snippet"]["resourceId"]["videoId"], items[0].video_id)
+
+    def test_sync(self):
+        api = self.apis[0]
+        client = Client(base_url=self.servers[0].base_url)
+        playlist_id, playlist = next(iter(api.account.playlists.items()))
+        current = [item[1] for item in playlist.items]
+        target = current[5:] + current[:2] + ["v0000000000"]
+        result = client.sync(playlist.title, target)
+        self.assertEqual([item.video_id for item in client.items(playlist_id=playlist_id)], target)
+        self.assertEqual(result.done, len(result.plan.operations))
+        self.assertLess(len(result.plan.operations), len(current))
+
+    def test_merge_executes(self):
+        client = Client(base_url=self.servers[0].base_url)
+        titles = [playlist.title for playlist in client.playlists()]
+        result = client.merge([titles[1]], titles[0], dedup=True)
+        self.assertTrue(result.executed)
+        video_ids = {item.video_id for item in client.items(name=titles[0])}
+        self.assertTrue({item.video_id for item in client.items(name=titles[1])} <= video_ids)
+        self.assertEqual(client.diff([titles[1]], [titles[0]]), [])
+
+
+class TestYtDlpSource(unittest.TestCase):
+    def setUp(self):
+        self.pages = {
+            "https://www.youtube.com/feed/playlists": {"entries": [
+                {"id": "PLa", "title": "A", "playlist_count": 3},
+                {"id": "PLb", "title": "B"},
+            ]},
+            "https://www.youtube.com/playlist?list=WL": {"entries": [{"id": "w1", "title": "Later"}]},
+            "https://www.youtube.com/playlist?list=PLa": {"entries": [
+                {"id": "v1", "title": "One", "channel": "C"},
+                {"id": "v2", "title": "[Deleted video]"},
+                {"id": "v3", "title": "Three"},
+            ]},
+            "https://www.youtube.com/playlist?list=PLb": {"entries": [{"id": "v3", "title": "Three"}, None]},
+            "https://www.youtube.com/playlist?list=UU0123456789012345678901": {"entries": [{"id": "u1"}]},
+        }
+        self.client = Client(source=YtDlpSource(extract=self.pages.__getitem__))
+
+    def test_reads_like_the_api(self):
+        self.assertEqual(self.client.stats(), [("Watch later", 1), ("A", 3), ("B", 1)])
+        self.assertEqual(self.client.diff(["A"], ["B"]), ["v1", "v2"])
+        self.assertEqual([playlist.id for playlist in self.client.find_video("v3")], ["PLa", "PLb"])
+        items = list(self.client.items(name="A"))
+        self.assertEqual([(item.video_id, item.position, item.playlist_id) for item in items], [
+            ("v1", 0, "PLa"), ("v2", 1, "PLa"), ("v3", 2, "PLa"),
+        ])
+        self.assertEqual((items[0].channel, items[1].title), ("C", DELETED_TITLE))
+        self.assertEqual([item.video_id for item in self.client.items(playlist_id="UC0123456789012345678901")], ["u1"])
+        folder = tempfile.mkdtemp()
+        self.client.dump(folder)
+        with open(os.path.join(folder, "Watch later")) as f:
+            self.assertEqual(f.read(), "w1\n")
+
+    def test_can_not_change_playlists(self):
+        with self.assertRaises(ValueError):
+            self.client.cleanup(["A"])
+        self.assertEqual(Client(dry_run=True, source=self.client.source).cleanup(["A"]).found["deleted"], 1)
+
+
+class TestDownloader(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.archive = os.path.join(folder, "archive.txt")
+        self.queue = os.path.join(folder, "queue.jsonl")
+        entries = [{"id": f"v{i}", "ie_key": "Youtube", "url": f"https://www.youtube.com/watch?v=v{i}"} for i in range(12)]
+        self.info = {"entries": entries}
+        self.lock = threading.Lock()
+        self.running: dict[str, int] = {}
+        self.most: dict[str, int] = {}
+        self.broken = {"https://www.youtube.com/watch?v=v3"}
+
+    @staticmethod
+    def resolve(url, _ydl_opts):
+        # the videos are spread over two media hosts, all on one page host
+        number = int(url.rsplit("v", 1)[1])
+        return {"webpage_url": url, "requested_formats": [{"url": f"https://rr{number % 2}.googlevideo.com/videoplayback"}]}
+
+    def download(self, info, _ydl_opts):
+        host = media_host(info)
+        with self.lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.most[host] = max(self.most.get(host, 0), self.running[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.running[host] -= 1
+        if info["webpage_url"] in self.broken:
+            raise ValueError("broken")
+
+    def downloader(self):
+        return Downloader(
+            workers=6, per_host=2, archive=self.archive, queue_file=self.queue,
+            extract=lambda url: self.info, resolve=self.resolve, download=self.download,
+        )
 
-    def test_skips_non_interval(self):
-        logger = MagicMock()
-        log_progress(logger, 50, 500, interval=100)
-        logger.info.assert_not_called()
+    def test_archive_queue_and_limits(self):
+        result = self.downloader().run(["https://www.youtube.com/playlist?list=WL"])
+        self.assertEqual((len(result.done), result.skipped, result.failed), (11, 0, ["youtube v3"]))
+        self.assertEqual(sorted(self.most), ["rr0.googlevideo.com", "rr1.googlevideo.com"])
+        self.assertTrue(all(1 < most <= 2 for most in self.most.values()))
+        with open(self.queue) as f:
+            self.assertEqual([json.loads(line)["key"] for line in f], ["youtube v3"])
+        self.broken = set()
+        # the queue alone brings back what failed, the archive keeps finished videos out
+        result = self.downloader().run([])
+        self.assertEqual((result.done, result.skipped), (["youtube v3"], 0))
+        result = self.downloader().run(["https://www.youtube.com/playlist?list=WL"])
+        self.assertEqual((result.done, result.skipped), ([], 12))
+
+
+class TestColumnar(unittest.TestCase):
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "needs pyarrow")
+    def test_typed_metadata_and_resume(self):
+        path = os.path.join(tempfile.mkdtemp(), "metadata.parquet")
+        row = {field: "" for field in METADATA_FIELDNAMES}
+        row.update({"video_id": "a", "duration": 212, "view_count": "1000", "upload_date": "20091025", "tags": "x, y z"})
+        with ColumnarWriter(path, "parquet", METADATA_FIELDNAMES, batch_size=2) as writer:
+            for video_id in "abc":
+                writer.write({**row, "video_id": video_id})
+        table = read_table(path)
+        with ColumnarWriter(path, "parquet", METADATA_FIELDNAMES) as writer:
+            writer.write_table(table)
+            writer.write({**row, "video_id": "d", "is_live": True})
+        rows = read_table(path).to_pylist()
+        self.assertEqual([r["video_id"] for r in rows], ["a", "b", "c", "d"])
+        self.assertEqual((rows[0]["duration"], rows[0]["view_count"]), (212, 1000))
+        self.assertEqual(rows[0]["upload_date"], datetime.date(2009, 10, 25))
+        self.assertEqual(rows[0]["tags"], ["x", "y z"])
+        self.assertEqual((rows[0]["like_count"], rows[3]["is_live"]), (None, True))
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.store = HistoryStore(tempfile.mkdtemp())
+        self.ids = [f"v{i:010d}" for i in range(1000)]
+
+    def test_unchanged_playlists_cost_no_chunks(self):
+        first = self.store.save(100, {"a": ("PLa", self.ids)})
+        self.assertGreater(first.chunks, 1)
+        self.assertEqual(first.new_chunks, first.chunks)
+        self.assertEqual(self.store.save(200, {"a": ("PLa", self.ids), "b": ("PLb", self.ids)}).new_chunks, 0)
+        inserted = self.ids[:500] + ["new"] + self.ids[500:]
+        third = self.store.save(300, {"a": ("PLa", inserted)})
+        self.assertEqual(third.new_chunks, 1)
+        self.assertEqual(self.store.load(third.snapshot)["a"], inserted)
+
+    def test_as_of_changes_and_timeline(self):
+        self.store.save(100, {"a": ("", ["x", "y"]), "b": ("", ["z"])})
+        self.store.save(200, {"a": ("", ["y", "w"]), "b": ("", ["z", "x"])})
+        self.store.save(300, {"a": ("", ["y", "w"]), "b": ("", ["z"])})
+        self.assertIsNone(self.store.as_of(99))
+        snapshots = self.store.snapshots()
+        self.assertEqual(self.store.as_of(250), snapshots[1])
+        self.assertEqual(self.store.load(self.store.as_of(150), ["a"]), {"a": ["x", "y"]})
+        self.assertEqual(list(self.store.changes(snapshots[0], snapshots[1])), [
+            Change("a", "w", ADDED), Change("a", "x", REMOVED), Change("b", "x", ADDED),
+        ])
+        timeline = [(snapshot.time, change.playlist, change.kind) for snapshot, change in self.store.timeline("x")]
+        self.assertEqual(timeline, [(100, "a", ADDED), (200, "b", ADDED), (200, "a", REMOVED), (300, "b", REMOVED)])
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time("1700000000"), 1700000000)
+        self.assertGreater(parse_time("2024-05-01"), parse_time("2024-05-01T12:00:00"))
+
+
+class TestSketch(unittest.TestCase):
+    def test_distinct_and_merge(self):
+        first, second = Sketch(), Sketch()
+        for i in range(30000):
+            first.add(f"v{i}")
+        for i in range(20000, 50000):
+            second.add(f"v{i}")
+        self.assertAlmostEqual(first.distinct(), 30000, delta=1500)
+        first.merge(second)
+        self.assertAlmostEqual(first.distinct(), 50000, delta=2500)
+        self.assertEqual(first.lines, 60000)
+
+    def test_frequency_never_under_counts(self):
+        sketch = Sketch()
+        rng = random.Random(0)
+        counts = {f"v{i}": rng.randint(1, 20) for i in range(5000)}
+        for video_id, count in counts.items():
+            for _ in range(count):
+                sketch.add(video_id)
+        for video_id, count in counts.items():
+            self.assertGreaterEqual(sketch.frequency(video_id), count)
+        self.assertEqual(sketch.frequency("v0"), counts["v0"])
+
+    def test_file_sketches_are_stored_and_rebuilt(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "a")
+        with open(path, "w") as f:
+            f.write("x\ny\nx\n")
+        sketch, built = get_file_sketch(path)
+        self.assertTrue(built)
+        self.assertTrue(os.path.isfile(get_sketch_path(path)))
+        self.assertEqual(get_file_sketch(path)[0].hll.registers, sketch.hll.registers)
+        self.assertFalse(get_file_sketch(path)[1])
+        with open(path, "a") as f:
+            f.write("z\n")
+        merged, built = merged_sketch([folder])
+        self.assertEqual((merged.files, merged.lines, merged.distinct(), merged.frequency("x"), built), (1, 4, 3, 2, 1))
+
+
+class TestBatch(unittest.TestCase):
+    def test_parse_lines(self):
+        text = "# a comment\n\nlocal_dedup\nstats --stats_names \"a b\",c\n"
+        self.assertEqual(parse_lines(text), [["local_dedup"], ["stats", "--stats_names", "a b,c"]])
+
+    def test_parse_yaml(self):
+        text = "- local_dedup\n- [stats, --local_dump_folder, d]\n- command: merge\n  args:\n    merge_dedup: true\n    merge_sources: [a, b]\n"
+        self.assertEqual(parse_yaml(text), [
+            ["local_dedup"],
+            ["stats", "--local_dump_folder", "d"],
+            ["merge", "--merge_dedup", "true", "--merge_sources", "a,b"],
+        ])
+        with self.assertRaises(TypeError):
+            parse_yaml("command: merge\n")
+
+    def test_stops_on_failure_unless_keep_going(self):
+        with patch("pytubekit.batch.Session.invoke", side_effect=[1, 0]) as invoke:
+            self.assertEqual(run_steps([["a"], ["b"]], keep_going=False), 1)
+        self.assertEqual(invoke.call_count, 1)
+        with patch("pytubekit.batch.Session.invoke", side_effect=[1, 0]) as invoke:
+            self.assertEqual(run_steps([["a"], ["b"]], keep_going=True), 1)
+        self.assertEqual(invoke.call_count, 2)
+        # benchmark would run against the cache which the steps share
+        for command in ("serve", "fake_api", "benchmark"):
+            with self.assertRaises(ValueError):
+                run_steps([["local_dedup"], [command]], keep_going=False)
+
+    def test_steps_share_fetched_playlists(self):
+        api = FakeYouTube(FakeAccount.synthetic(playlists=3, items=10, seed=1))
+        server = FakeApiServer(api)
+        server.start()
+        try:
+            step = ["stats", "--api_base_url", server.base_url]
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(run_steps([step, step], keep_going=False), 0)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(api.stats()["calls"], {"youtube.playlists.list": 1})
+        self.assertFalse(CACHE.enabled)
+
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.folder, "test.sock")
+        self.server = ServeServer(self.socket_path)
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _call(self, args: list[str], cwd: str | None = None) -> tuple[int, str, str]:
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = call(self.socket_path, args, stdout, stderr, cwd=cwd)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_streams_output_in_client_cwd(self):
+        dump = os.path.join(self.folder, "dump")
+        os.mkdir(dump)
+        for name in ("a", "b"):
+            with open(os.path.join(dump, name), "w") as f:
+                f.write("vid1\n")
+        code, stdout, _ = self._call(["local_dedup"], cwd=dump)
+        self.assertEqual(code, 0)
+        self.assertIn("CROSS a & b: vid1", stdout)
+        self.assertFalse(os.path.exists(os.path.join(os.getcwd(), "a")))
+
+    def test_errors(self):
+        self.assertEqual(self._call(["no_such_command"])[0], 1)
+        self.assertEqual(self._call(["serve"])[0], 2)
+        for command in ("fake_api", "benchmark"):
+            code, stdout, stderr = self._call([command])
+            self.assertEqual((code, stdout), (2, ""))
+            self.assertIn(f"[{command}] can not be run inside the daemon", stderr)
+        # the daemon still answers
+        self.assertEqual(self._call(["no_such_command"])[0], 1)
@@ -0,0 +1,59 @@
+"""
+test_crawler.py
+"""
+
+import os
+import tempfile
+import unittest
+
+from pytubekit.api import Client
+from pytubekit.crawler import WatermarkStore
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+
+
+class TestCrawler(unittest.TestCase):
+    def setUp(self):
+        self.account = FakeAccount()
+        self.channels = [f"UC{i:022d}" for i in range(3)]
+        self.account.subscriptions = self.channels + ["UCnouploads0000000000000"]
+        for day, channel_id in enumerate(self.channels):
+            uploads = self.account.add_playlist("Uploads", playlist_id="UU" + channel_id[2:])
+            for i in range(12):
+                self.upload(uploads, f"v{day}{i:09d}", f"2024-01-{28 - i:02d}T00:00:00Z")
+        self.api = FakeYouTube(self.account)
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+        self.store = WatermarkStore(os.path.join(tempfile.mkdtemp(), "crawl.json"))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def upload(self, playlist, video_id, published_at, position=None):
+        self.account.videos[video_id] = (video_id, "Channel", "public")
+        self.account.add_item(playlist, video_id, position=position, published_at=published_at)
+
+    def crawl(self):
+        self.api.reset()
+        results = Client(base_url=self.server.base_url, page_size=5).crawl_uploads(store=self.store, workers=2)
+        self.store.save()
+        return {result.channel_id: [upload.video_id for upload in result.uploads] for result in results}
+
+    def test_stops_at_watermark(self):
+        first = self.crawl()
+        self.assertEqual(list(first), self.channels)
+        self.assertEqual(first[self.channels[0]], [f"v0{i:09d}" for i in range(5)])
+        self.assertEqual(self.crawl(), {channel_id: [] for channel_id in self.channels})
+        # one call per channel, the one without uploads included
+        self.assertEqual(self.api.stats()["quota"]["youtube.playlistItems.list"], 4)
+        uploads = self.account.playlists["UU" + self.channels[1][2:]]
+        for i in range(7):
+            self.upload(uploads, f"n{i:010d}", f"2024-02-{10 - i:02d}T00:00:00Z", position=i)
+        # the watermark video is gone: the crawl stops at the first older upload
+        self.account.playlists["UU" + self.channels[2][2:]].items.pop(0)
+        self.upload(self.account.playlists["UU" + self.channels[2][2:]], "x000000000", "2024-03-01T00:00:00Z", position=0)
+        self.store = WatermarkStore(self.store.path)
+        second = self.crawl()
+        self.assertEqual(second[self.channels[1]], [f"n{i:010d}" for i in range(7)])
+        self.assertEqual(second[self.channels[2]], ["x000000000"])
+        self.assertEqual(self.store.get(self.channels[1]).video_id, "n0000000000")
@@ -0,0 +1,76 @@
+"""
+test_insert.py
+"""
+
+import unittest
+
+from pytubekit.api import Client
+from pytubekit.cache import CACHE
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.planner import plan_add
+from pytubekit.util import apply_plan, get_youtube_at
+
+
+class TestPipelinedInsert(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeYouTube(FakeAccount.synthetic(playlists=3, items=120, seed=2), quota_limit=1000)
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+        self.youtube = get_youtube_at(self.server.base_url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pipelined_insert_keeps_order(self):
+        self.api.latency, self.api.latency_ms, self.api.quota_limit = "uniform", 5, 10000
+        playlist = self.api.account.playlists["PL00000000"]
+        before = [item[1] for item in playlist.items]
+        candidates = [video_id for video_id in self.api.account.videos if video_id not in before]
+        video_ids = candidates[:20] + before[:3]
+        plan = plan_add("PL00000000", [], video_ids)
+        added = apply_plan(
+            self.youtube, plan, execute=True, window=8,
+            client_factory=lambda: get_youtube_at(self.server.base_url), dedup=True,
+        )
+        self.assertEqual(added, 20)
+        self.assertEqual([item[1] for item in playlist.items], before + candidates[:20])
+
+    def test_pipelined_insert_without_manual_sort(self):
+        self.api.quota_limit = 10000
+        playlist = self.api.account.playlists["PL00000000"]
+        playlist.manual_sort = False
+        before = [item[1] for item in playlist.items]
+        candidates = [video_id for video_id in self.api.account.videos if video_id not in before]
+        # the default path (one insert at a time, dedup) and the concurrent one both append without positions
+        for window, video_ids in ((1, candidates[:3]), (4, candidates[3:9])):
+            plan = plan_add("PL00000000", [], video_ids)
+            added = apply_plan(
+                self.youtube, plan, execute=True, window=window,
+                client_factory=lambda: get_youtube_at(self.server.base_url), dedup=True,
+            )
+            self.assertEqual(added, len(video_ids))
+        self.assertEqual([item[1] for item in playlist.items][:len(before) + 3], before + candidates[:3])
+        self.assertEqual({item[1] for item in playlist.items[len(before):]}, set(candidates[:9]))
+
+    def test_items_after_pipelined_apply_with_the_cache(self):
+        self.api.quota_limit = 10000
+        playlist = self.api.account.playlists["PL00000000"]
+        before = [item[1] for item in playlist.items]
+        candidates = [video_id for video_id in self.api.account.videos if video_id not in before]
+        # serve and run turn the process wide cache on, which both the insert pipeline and records() read through
+        CACHE.enable()
+        try:
+            client = Client(base_url=self.server.base_url, cache=CACHE, insert_window=8)
+            self.assertEqual([item.video_id for item in client.items(playlist_id="PL00000000")], before)
+            # one insert: the reorder pass reads the playlist and moves nothing, so nothing else invalidates it
+            client.add_videos(playlist.title, candidates[:1])
+            items = list(client.items(playlist_id="PL00000000"))
+        finally:
+            CACHE.disable()
+        self.assertEqual([item.video_id for item in items], before + candidates[:1])
+        self.assertEqual([item.position for item in items], list(range(len(items))))
+
+
+if __name__ == "__main__":
+    unittest.main()
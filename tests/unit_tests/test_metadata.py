@@ -0,0 +1,79 @@
+"""
+test_metadata.py
+"""
+
+import math
+import os
+import tempfile
+import time
+import unittest
+
+from pytubekit.api import Client
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.metadata import MetadataCache, parse_duration, parse_sort_keys, sort_items, trim
+from pytubekit.records import PlaylistItem
+
+
+def record(video_id, title):
+    return PlaylistItem(f"PLI{video_id}", "PL", video_id, title, "Channel", None, "")
+
+
+class TestSortKeys(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_duration("PT1H2M3S"), 3723)
+        self.assertEqual(parse_duration("P1DT5S"), 86405)
+        self.assertEqual(parse_duration("P0D"), 0)
+        self.assertIsNone(parse_duration(""))
+        self.assertEqual(parse_sort_keys("views:desc, title,duration:asc"), [("views", True), ("title", False), ("duration", False)])
+        with self.assertRaises(ValueError):
+            parse_sort_keys("rating")
+        with self.assertRaises(ValueError):
+            parse_sort_keys("views:down")
+        self.assertEqual(trim({"statistics": {"viewCount": "7"}}), {"duration": None, "upload_date": None, "views": 7, "likes": None})
+
+    def test_multi_key_and_missing(self):
+        items = [record("a", "B"), record("b", "a"), record("c", "c"), record("d", "d"), record("e", "e")]
+        metadata = {
+            "a": {"views": 5, "likes": None},
+            "b": {"views": 5, "likes": 1},
+            "c": {"views": 9, "likes": 2},
+            "d": None,
+        }
+        order = sort_items(items, parse_sort_keys("views:desc,title"), metadata)
+        self.assertEqual([item.video_id for item in order], ["c", "b", "a", "d", "e"])
+        order = sort_items(items, parse_sort_keys("likes:desc"), metadata)
+        self.assertEqual([item.video_id for item in order], ["c", "b", "a", "d", "e"])
+        order = sort_items(items, parse_sort_keys("title:desc"))
+        self.assertEqual([item.video_id for item in order], ["e", "d", "c", "a", "b"])
+
+
+class TestSortPlaylist(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeYouTube(FakeAccount.synthetic(playlists=1, items=40, seed=3))
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sort_by_views(self):
+        playlist = next(iter(self.api.account.playlists.values()))
+        # deleted videos cannot be added back
+        playlist.items = [item for item in playlist.items if item[1] in self.api.account.videos]
+        client = Client(base_url=self.server.base_url, page_size=10)
+        cache_path = os.path.join(tempfile.mkdtemp(), "metadata.json")
+        client.sort(playlist.title, "views:desc", metadata_cache=MetadataCache(cache_path))
+        videos = len({item[1] for item in playlist.items})
+        self.assertEqual(self.api.stats()["calls"]["youtube.videos.list"], math.ceil(videos / 10))
+        metadata = MetadataCache(cache_path)
+        views = [(metadata.get(item[1], time.time())[1] or {}).get("views") for item in playlist.items]
+        present = [value for value in views if value is not None]
+        self.assertEqual(present, sorted(present, reverse=True))
+        self.assertEqual(views[:len(present)], present)
+        client.sort(playlist.title, "duration,title", metadata_cache=MetadataCache(cache_path))
+        self.assertEqual(self.api.stats()["calls"]["youtube.videos.list"], math.ceil(videos / 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+test_seen.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pytubekit import seen
+from pytubekit.api import Client
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.seen import SeenSet
+
+
+def video_id(i):
+    return f"s{i:010d}"
+
+
+class TestSeenSet(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def write_dump(self, name, ids):
+        path = os.path.join(self.folder, "dump", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for i in ids:
+                print(video_id(i), file=f)
+        return path
+
+    def test_add_and_reopen(self):
+        store = os.path.join(self.folder, "seen")
+        seen_set = SeenSet(store)
+        self.assertEqual(seen_set.add([video_id(i) for i in (5, 1, 3, 1)] + ["short"]), 3)
+        self.assertEqual(seen_set.add([video_id(2), video_id(3)]), 1)
+        seen_set.save()
+        reopened = SeenSet(store)
+        self.assertEqual(len(reopened), 4)
+        self.assertEqual([video_id(i) in reopened for i in range(7)], [False, True, True, True, False, True, False])
+        with open(os.path.join(store, seen.IDS_FILE)) as f:
+            self.assertEqual(f.read().split(), sorted(video_id(i) for i in (1, 2, 3, 5)))
+
+    def test_files_added_once(self):
+        store = os.path.join(self.folder, "seen")
+        self.write_dump("a", range(10))
+        self.write_dump("b", range(5, 20))
+        seen_set = SeenSet(store)
+        self.assertEqual(seen_set.add_files([os.path.join(self.folder, "dump")]), (2, 20))
+        seen_set.save()
+        seen_set = SeenSet(store)
+        self.assertEqual(seen_set.add_files([os.path.join(self.folder, "dump")]), (0, 0))
+        path = self.write_dump("b", range(5, 25))
+        os.utime(path, ns=(0, 1))
+        self.assertEqual(seen_set.add_files([os.path.join(self.folder, "dump")]), (1, 5))
+        self.assertEqual(len(seen_set), 25)
+
+    def test_grows(self):
+        store = os.path.join(self.folder, "seen")
+        with mock.patch.object(seen, "MIN_CAPACITY", 100):
+            seen_set = SeenSet(store)
+            seen_set.add(video_id(i) for i in range(150))
+            seen_set.add(video_id(i) for i in range(150, 450))
+        self.assertEqual(seen_set.capacity, 800)
+        seen_set.save()
+        reopened = SeenSet(store)
+        self.assertTrue(all(video_id(i) in reopened for i in range(450)))
+        misses = sum(video_id(i) in reopened.bloom for i in range(450, 10450))
+        self.assertLess(misses, 300)
+
+
+class TestLeftToSee(unittest.TestCase):
+    def setUp(self):
+        self.account = FakeAccount()
+        uploads = self.account.add_playlist("Uploads", playlist_id="UU" + "c" * 22)
+        for i in range(12):
+            self.account.videos[video_id(i)] = (video_id(i), "Channel", "public")
+            self.account.add_item(uploads, video_id(i))
+        self.server = FakeApiServer(FakeYouTube(self.account))
+        self.server.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_left_to_see(self):
+        seen_set = SeenSet(tempfile.mkdtemp())
+        seen_set.add(video_id(i) for i in range(0, 12, 3))
+        client = Client(base_url=self.server.base_url, page_size=5)
+        left = [item.video_id for item in client.left_to_see("UC" + "c" * 22, seen_set)]
+        self.assertEqual(left, [video_id(i) for i in range(12) if i % 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+test_shards.py
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pytubekit import shards
+from pytubekit.api import Client
+from pytubekit.constants import LEAST_USED, ROUND_ROBIN
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.shards import Ledger, QuotaExhausted, Shard, ShardedYouTube, ShardSet, load_credentials
+from pytubekit.util import build_shard_youtube
+
+
+def make_shards(names, limit=100, folder=None):
+    return [Shard(name, name, Ledger(None if folder is None else os.path.join(folder, f"{name}.sqlite"), limit)) for name in names]
+
+
+class TestShardSet(unittest.TestCase):
+    def test_policies(self):
+        shard_set = ShardSet(make_shards(["a", "b", "c"]), ROUND_ROBIN, clock=lambda: "2024-01-01")
+        picked = []
+        for _ in range(4):
+            shard = shard_set.pick(1)
+            shard_set.charge(shard, 1)
+            picked.append(shard.name)
+        self.assertEqual(picked, ["a", "b", "c", "a"])
+        shard_set.exhaust(shard_set.shards[1])
+        self.assertEqual([shard_set.pick(1).name for _ in range(2)], ["c", "a"])
+        shard_set.policy = LEAST_USED
+        self.assertEqual(shard_set.pick(1).name, "c")
+        # a call which does not fit the room a shard has left goes elsewhere
+        self.assertEqual(shard_set.pick(99).name, "c")
+        self.assertIsNone(shard_set.pick(101))
+
+    def test_ledgers_persist_per_day(self):
+        folder = tempfile.mkdtemp()
+        day = ["2024-01-01"]
+        shard_set = ShardSet(make_shards(["a"], folder=folder), clock=lambda: day[0])
+        shard_set.charge(shard_set.pick(50), 50)
+        shard_set = ShardSet(make_shards(["a"], folder=folder), clock=lambda: day[0])
+        self.assertIsNone(shard_set.pick(51))
+        day[0] = "2024-01-02"
+        self.assertEqual(shard_set.pick(51).name, "a")
+        self.assertEqual(shard_set.status()[0]["used"], 0)
+
+
+    def test_processes_add_up_their_spend(self):
+        folder = tempfile.mkdtemp()
+        # two processes using the same ledger folder
+        shard_sets = [ShardSet(make_shards(["a"], folder=folder), clock=lambda: "2024-01-01") for _ in range(2)]
+        for shard_set in shard_sets:
+            shard_set.charge(shard_set.pick(40), 40)
+        for shard_set in shard_sets:
+            self.assertIsNone(shard_set.pick(21))
+            self.assertEqual(shard_set.status()[0]["used"], 80)
+        shard_sets[0].exhaust(shard_sets[0].shards[0])
+        self.assertIsNone(shard_sets[1].pick(1))
+
+
+class TestLoadCredentials(unittest.TestCase):
+    def test_threads_authorize_once(self):
+        folder = tempfile.mkdtemp()
+        flows = []
+
+        def authorize(port):
+            flows.append(port)
+            time.sleep(0.05)
+            return MagicMock(to_json=MagicMock(return_value="{}"))
+        flow = MagicMock(run_local_server=authorize)
+        with patch.object(shards.InstalledAppFlow, "from_client_secrets_file", return_value=flow), \
+                patch.object(shards.Credentials, "from_authorized_user_file", return_value=MagicMock(valid=True)):
+            threads = [threading.Thread(target=load_credentials, args=(folder, ["scope"])) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(flows), 1)
+
+
+class TestShardedClient(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeYouTube(FakeAccount.synthetic(playlists=3, items=50, seed=4), quota_limit=8)
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, names, policy=ROUND_ROBIN):
+        # the ledgers allow more than the server does, so the shards run into quotaExceeded and fail over
+        shard_set = ShardSet(make_shards(names, limit=1000), policy)
+
+        def build(shard):
+            return build_shard_youtube(shard, base_url=self.server.base_url)
+        return Client(youtube=ShardedYouTube(shard_set, build), page_size=5), shard_set
+
+    def test_spreads_and_fails_over(self):
+        client, shard_set = self.client(["p1", "p2", "p3", "p4", "p5"])
+        # spent by something the ledger does not know about
+        self.api.projects["p1"] = self.api.quota_limit - 1
+        playlists = list(client.playlists())
+        items = client.records([playlist.id for playlist in playlists])
+        self.assertEqual(len(items), sum(playlist.item_count for playlist in playlists))
+        projects = self.api.stats()["projects"]
+        self.assertGreater(sum(projects.values()), self.api.quota_limit)
+        self.assertTrue(all(units <= self.api.quota_limit for units in projects.values()))
+        self.assertEqual([status["exhausted"] for status in shard_set.status()], [True, False, False, False, False])
+
+    def test_all_exhausted(self):
+        client, _ = self.client(["p1"], LEAST_USED)
+        playlists = list(client.playlists())
+        with self.assertRaises(QuotaExhausted):
+            client.records([playlist.id for playlist in playlists])
+
+
+if __name__ == "__main__":
+    unittest.main()
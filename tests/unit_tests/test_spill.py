@@ -0,0 +1,88 @@
+"""
+test_spill.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pytubekit import journal
+from pytubekit.api import Client, natural_key
+from pytubekit.constants import BALANCE, CHAIN, MAX_PLAYLIST_ITEMS
+from pytubekit.fakeapi import FakeAccount, FakeApiServer, FakeYouTube
+from pytubekit.planner import pack
+
+
+class TestPack(unittest.TestCase):
+    def test_chain_and_balance(self):
+        full = MAX_PLAYLIST_ITEMS
+        self.assertEqual(pack([full - 3, full, full - 10], 8, CHAIN), [3, 0, 5])
+        self.assertEqual(pack([full - 3, full, full - 10], 20, CHAIN), [3, 0, 10])
+        self.assertEqual(pack([full - 3, full, full - 10], 8, BALANCE), [1, 0, 7])
+        self.assertEqual(pack([full - 4, full - 4], 5, BALANCE), [3, 2])
+        self.assertGreater(natural_key("Archive 10"), natural_key("Archive 2"))
+
+
+class TestSpill(unittest.TestCase):
+    def setUp(self):
+        self.account = FakeAccount()
+        self.inbox = self.account.add_playlist("Inbox")
+        self.archives = {count: self.account.add_playlist(f"Archive {count}") for count in (10, 2, 1)}
+        # Archive 1 has 4 free slots, Archive 2 has 3, Archive 10 has 20
+        for count, free in ((1, 4), (2, 3), (10, 20)):
+            self.archives[count].items = [[f"A{count}_{i}", f"a{count}_{i:08d}", "", "", ""] for i in range(MAX_PLAYLIST_ITEMS - free)]
+        self.videos = [f"i{i:010d}" for i in range(12)]
+        for video_id in self.videos + self.videos[:2]:
+            self.account.videos[video_id] = (video_id, "Channel", "public")
+            self.account.add_item(self.inbox, video_id)
+        self.api = FakeYouTube(self.account)
+        self.server = FakeApiServer(self.api)
+        self.server.start()
+        self.plan_path = os.path.join(tempfile.mkdtemp(), "plan.json")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def added(self, count):
+        return [item[1] for item in self.archives[count].items[MAX_PLAYLIST_ITEMS - {1: 4, 2: 3, 10: 20}[count]:]]
+
+    def test_chain_counts_destinations_without_reading_them(self):
+        client = Client(base_url=self.server.base_url)
+        result = client.spill("Inbox", [], pattern="Archive *", plan_path=self.plan_path)
+        self.assertTrue(result.executed)
+        self.assertEqual(self.added(1), self.videos[:4])
+        self.assertEqual(self.added(2), self.videos[4:7])
+        self.assertEqual(self.added(10), self.videos[7:])
+        self.assertEqual(self.inbox.items, [])
+        calls = self.api.stats()["calls"]
+        # only the source is read
+        self.assertEqual(calls["youtube.playlistItems.list"], 1)
+        self.assertFalse(os.path.exists(self.plan_path))
+
+    def test_balance_and_resume(self):
+        client = Client(base_url=self.server.base_url)
+        execute = journal.execute_operation
+        calls = []
+
+        def interrupted(*args):
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            calls.append(args)
+            execute(*args)
+
+        with patch.object(journal, "execute_operation", interrupted), self.assertRaises(KeyboardInterrupt):
+            client.spill("Inbox", ["Archive 1", "Archive 10"], packing=BALANCE, plan_path=self.plan_path)
+        self.assertTrue(os.path.exists(self.plan_path))
+        # the second run resumes the plan instead of planning against the half moved playlists
+        result = client.spill("Inbox", ["Archive 1", "Archive 10"], packing=BALANCE, plan_path=self.plan_path)
+        self.assertEqual(result.done, 14 + 12 - 5)
+        # Archive 10 has 16 more free slots than Archive 1, so balancing fills only it
+        self.assertEqual(self.added(10), self.videos)
+        self.assertEqual(self.added(1), [])
+        self.assertEqual(self.inbox.items, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+test_workqueue.py
+"""
+
+import csv
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from pytubekit.progress import Progress
+from pytubekit.workqueue import WorkQueue, merge_queue, run_worker
+
+
+def fetch(video_id):
+    return {"video_id": video_id, "title": video_id.upper()}
+
+
+def no_progress(total, label):
+    return Progress(total, label, interval=3600)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.queue = WorkQueue(os.path.join(self.folder, "queue.sqlite"), lease=10)
+
+    def test_fill_skips_queued(self):
+        self.assertEqual(self.queue.fill(["a", "b", "c", "b"], 2), 3)
+        self.assertEqual(self.queue.fill(["c", "d"], 2), 1)
+        status = self.queue.status()
+        self.assertEqual((status["batches"], status["pending"], status["ids"]), (3, 3, 4))
+        self.assertEqual(self.queue.claim("w", now=0).video_ids, ("a", "b"))
+
+    def test_expired_lease_commits_once(self):
+        self.queue.fill(["a", "b", "c"], 2)
+        first = self.queue.claim("w1", now=0)
+        self.assertEqual(self.queue.claim("w2", now=5).video_ids, ("c",))
+        self.assertTrue(self.queue.heartbeat(first, now=5))
+        self.assertIsNone(self.queue.claim("w2", now=14))
+        # w1 stops sending heartbeats, so w2 takes its batch over
+        second = self.queue.claim("w2", now=16)
+        self.assertEqual((second.batch_id, second.token), (first.batch_id, first.token + 1))
+        self.assertFalse(self.queue.heartbeat(first, now=17))
+        self.assertTrue(self.queue.commit(second, [fetch("a"), fetch("b")]))
+        # w1 comes back late
+        self.assertFalse(self.queue.commit(first, [fetch("a"), fetch("b")]))
+        self.assertEqual([row["video_id"] for row in self.queue.rows()], ["a", "b"])
+        self.assertEqual(self.queue.status(now=17)["done"], 1)
+
+    def test_release(self):
+        self.queue.fill(["a"], 1)
+        lease = self.queue.claim("w1", now=0)
+        self.queue.release(lease)
+        self.assertEqual(self.queue.claim("w2", now=1).token, lease.token + 1)
+
+    def test_heartbeat_keeps_lease(self):
+        queue = WorkQueue(self.queue.path, lease=0.2)
+        queue.fill(["a", "b", "c", "d"], 4)
+
+        def slow_fetch(video_id):
+            time.sleep(0.1)
+            return fetch(video_id)
+        # the batch takes twice the lease
+        self.assertEqual(run_worker(queue, slow_fetch, heartbeat_interval=0.05, progress_factory=no_progress), 1)
+        self.assertEqual(queue.status()["rows"], 4)
+
+    def test_workers_and_merge(self):
+        video_ids = [f"v{i:03d}" for i in range(200)]
+        self.queue.fill(video_ids, 7)
+        path = self.queue.path
+        committed = []
+
+        def work(name):
+            committed.append(run_worker(WorkQueue(path, lease=10), fetch, worker=name, progress_factory=no_progress))
+        threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(committed), 29)
+        output = os.path.join(self.folder, "out.csv")
+        self.assertEqual(merge_queue(self.queue, output, "csv"), 200)
+        with open(output, encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["video_id"] for row in rows], video_ids)
+        self.assertEqual(rows[0]["title"], "V000")
+
+
+if __name__ == "__main__":
+    unittest.main()